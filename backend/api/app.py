@@ -1,9 +1,18 @@
 # Startmechanismus der Web-App. Kommunikation Frontend- Backend. 
-from flask import Flask, render_template
+from flask import Flask, render_template, request, g, Response, jsonify
 from flask_cors import CORS
-from api.routes import detect_handler, censor_handler # Import der nötigen Methoden von Routes.py
+from api.routes import detect_handler, censor_handler, detect_raw_handler, censor_raw_handler, detect_batch_handler, cache_stats_handler
+from api.routes import submit_job_handler, job_status_handler, job_queue_stats_handler, anonymize_handler # Import der nötigen Methoden von Routes.py
+from api.routes import create_session_handler, session_info_handler, delete_session_handler, session_stats_handler
+from api.routes import session_detect_handler, session_censor_handler
+from api.routes import preview_handler, cached_preview_handler, session_preview_handler, preview_stats_handler, session_image_handler
+from engine.cache import detection_cache
+from engine.detector import warm_up, models_loaded, use_detector_pool
+from engine import timing
+from api import metrics
 import webbrowser
 import threading
+import multiprocessing
 import time
 import os
 import sys
@@ -28,16 +37,90 @@ app = Flask(
 #Erlaubt Cross-Origin- Requests (Website, die auf einen anderen server zugreift)
 CORS(app)
 
+#Maximale Größe eines Requests (Standard 100 MB, reicht auch für Batch-Requests), größere werden mit 413 abgelehnt
+app.config["MAX_CONTENT_LENGTH"] = int(float(os.environ.get("MAX_UPLOAD_MB", 100)) * 1024 * 1024)
+
+#Bereitschaft für /health: erst wenn die Modelle geladen sind. Beim Herunterfahren (api/serve.py) werden
+#neue Requests abgelehnt, laufende dürfen noch fertig werden.
+ready = threading.Event()
+shutting_down = threading.Event()
+_warm_up_started = threading.Event()
+_warm_up_lock = threading.Lock()                # gleichzeitige erste Requests starten nur einen Warm-up-Thread
+
+def warm_up_models():
+    """Modelle von face_recognition/ dlib laden, danach meldet /health "ok" """
+    _warm_up_started.set()
+    warm_up()
+    ready.set()
+
+def start_warm_up():
+    """Modelle im Hintergrund laden, falls das noch niemand getan hat. Läuft beim ersten Request, damit /health
+    unter jedem WSGI-Server (flask run, gunicorn, Test-Client) irgendwann bereit meldet, nicht nur über
+    __main__ bzw. api.serve."""
+    if _warm_up_started.is_set():
+        return
+    with _warm_up_lock:
+        if _warm_up_started.is_set():
+            return
+        _warm_up_started.set()
+    threading.Thread(target=warm_up_models, name="warm-up", daemon=True).start()
+
+#Erkennung im Prozess-Pool statt im Request-Thread: dlib hält beim Detektor den GIL, mit mehreren Threads würde
+#sonst trotzdem nur ein Kern erkennen. DETECTOR_POOL=0 erkennt im Request-Thread (z.B. bei wenig Speicher).
+use_detector_pool(os.environ.get("DETECTOR_POOL", "1") != "0")
+
+#Optional: Erkennungs-Cache zusätzlich in einer SQLite-Datei speichern, damit er einen Neustart überlebt
+if os.environ.get("DETECTION_CACHE_PATH"):
+    detection_cache.open(os.environ["DETECTION_CACHE_PATH"])
+
+#Zeitmessung pro Request: Schritte der Engine sammeln, danach als Server-Timing-Header und in /metrics ausgeben
+@app.before_request
+def start_timing():
+    g.request_started = time.perf_counter()
+    g.timing_token = timing.start_collecting()
+    start_warm_up()
+    if shutting_down.is_set() and request.path != "/health":
+        return jsonify({"status": "error", "message": "Server is shutting down"}), 503
+
+@app.errorhandler(413)
+def request_too_large(e):
+    limit = app.config["MAX_CONTENT_LENGTH"] // (1024 * 1024)
+    return jsonify({"status": "error", "message": f"Request too large (max {limit} MB)"}), 413
+
+@app.after_request
+def finish_timing(response):
+    total = time.perf_counter() - g.request_started
+    response.headers["Server-Timing"] = metrics.server_timing_header(timing.collected(), total)
+    response.headers["Timing-Allow-Origin"] = "*"      # sonst zeigt der Browser die Zeiten bei Cross-Origin-Requests nicht an
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.observe_request(endpoint, request.method, response.status_code, total)
+    return response
+
+@app.teardown_request
+def stop_timing(exc):
+    token = g.pop("timing_token", None)
+    if token is not None:
+        timing.stop_collecting(token)
+
 #Laden des html Dokumentes beim Öffnen der Seite
 @app.route("/")
 def index():
     return render_template("index.html")
 
-#Test-Punkt
+#Test-Punkt: 200 erst nach dem Laden der Modelle, 503 beim Start und beim Herunterfahren (für Load-Balancer)
 @app.route("/health", methods=["GET"])
 def health():
+    if shutting_down.is_set():
+        return "status shutting down", 503
+    if not ready.is_set() and not models_loaded():             # auch bereit, wenn ein Request die Modelle schon geladen hat
+        return "status warming up", 503
     return "status ok"
 
+#Kennzahlen im Prometheus-Textformat (Requests, Fehler, Dauer der einzelnen Schritte, Bildgrößen, gefundene Gesichter)
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 # Kommunikation mit Backend für Gesichtserkennung und Zensierung. 
 @app.route("/api/v1/detect", methods=["POST"])
 def detect():                           # Definieren einer detect-Methode, die auf detect_handler von routes.py basiert
@@ -47,6 +130,88 @@ def detect():                           # Definieren einer detect-Methode, die a
 def censor():                           # Definieren einer censor-Methode, die auf censor_handler von routes.py basiert
     return censor_handler()
 
+# Erkennen und Zensieren in einem Request (Bild wird nur einmal hochgeladen und decodiert)
+@app.route("/api/v1/anonymize", methods=["POST"])
+def anonymize():
+    return anonymize_handler()
+
+# Binär-Varianten: Bild als Multipart/ Request-Body statt Base64-Data-URL, censor antwortet direkt mit dem Bild
+@app.route("/api/v1/detect/raw", methods=["POST"])
+def detect_raw():
+    return detect_raw_handler()
+
+@app.route("/api/v1/censor/raw", methods=["POST"])
+def censor_raw():
+    return censor_raw_handler()
+
+# Viele Bilder in einem Request, Ergebnisse werden als NDJSON gestreamt, sobald ein Bild fertig ist
+@app.route("/api/v1/detect/batch", methods=["POST"])
+def detect_batch():
+    return detect_batch_handler()
+
+# Asynchrone Jobs: einreichen, Status abfragen (Long-Polling) und Auslastung der Warteschlange
+@app.route("/api/v1/jobs", methods=["POST"])
+def submit_job():
+    return submit_job_handler()
+
+@app.route("/api/v1/jobs", methods=["GET"])
+def job_queue_stats():
+    return job_queue_stats_handler()
+
+@app.route("/api/v1/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    return job_status_handler(job_id)
+
+# Bild-Sessions: Bild einmal hochladen, danach Erkennung und Zensur nur noch mit der Session-ID und den Boxen
+@app.route("/api/v1/sessions", methods=["POST"])
+def create_session():
+    return create_session_handler()
+
+@app.route("/api/v1/sessions", methods=["GET"])
+def session_stats():
+    return session_stats_handler()
+
+@app.route("/api/v1/sessions/<session_id>", methods=["GET"])
+def session_info(session_id):
+    return session_info_handler(session_id)
+
+@app.route("/api/v1/sessions/<session_id>", methods=["DELETE"])
+def delete_session(session_id):
+    return delete_session_handler(session_id)
+
+@app.route("/api/v1/sessions/<session_id>/detect", methods=["POST"])
+def session_detect(session_id):
+    return session_detect_handler(session_id)
+
+@app.route("/api/v1/sessions/<session_id>/censor", methods=["POST"])
+def session_censor(session_id):
+    return session_censor_handler(session_id)
+
+@app.route("/api/v1/sessions/<session_id>/preview", methods=["GET"])
+def session_preview(session_id):
+    return session_preview_handler(session_id)
+
+@app.route("/api/v1/sessions/<session_id>/image", methods=["GET"])
+def session_image(session_id):
+    return session_image_handler(session_id)
+
+# Verkleinerte Vorschauen (Thumbnails), gecacht nach Inhalts-Hash und Größe
+@app.route("/api/v1/preview", methods=["POST"])
+def preview():
+    return preview_handler()
+
+@app.route("/api/v1/preview", methods=["GET"])
+def preview_stats():
+    return preview_stats_handler()
+
+@app.route("/api/v1/preview/<source_hash>", methods=["GET"])
+def cached_preview(source_hash):
+    return cached_preview_handler(source_hash)
+
+@app.route("/api/v1/cache", methods=["GET"])
+def cache_stats():                      # Treffer/ Fehlschläge des Erkennungs-Caches
+    return cache_stats_handler()
+
 # Öffnet automatisch den Browser
 def open_browser():
     time.sleep(1)                       # Nach kurzer Verzögerung
@@ -54,9 +219,13 @@ def open_browser():
 
 # Öffnet den Server
 if __name__ == "__main__":
+    multiprocessing.freeze_support()    # nötig, damit Worker-Prozesse (Kachel-Modus) auch im PyInstaller-Executable starten
     print("Bild-Verpixelungs-App startet...")
     print("Backend-Server auf http://localhost:5001")
 
+    # Modelle im Hintergrund laden, während der Server startet und sich der Browser öffnet
+    start_warm_up()
+
     browser_thread = threading.Thread(target=open_browser)
     browser_thread.daemon = True
     browser_thread.start()
@@ -0,0 +1,64 @@
+# Batch-Erkennung: viele Bilder in einem Request, parallel in einem Pool aus Worker-Prozessen.
+# Prozesse statt Threads, weil dlib beim HOG-Detektor den GIL nicht freigibt. Die asynchronen Jobs (api.jobs)
+# laufen im selben Pool.
+import base64
+import io
+import os
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from PIL import Image
+
+from engine.censor import censor
+from engine.detector import detect_image, warm_up
+from engine.image_adapter import piltonp, nptopil, output_format, encode_image
+
+# Obergrenze an Bildern pro Batch-Request, damit ein einzelner Request den Server nicht blockiert
+MAX_BATCH_IMAGES = 100
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()                           # Job-Worker und Request-Threads legen den Pool sonst evtl. doppelt an
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Pool wird beim ersten Batch-Request angelegt und danach wiederverwendet (Modelle sind dann schon geladen)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = int(os.environ.get("BATCH_WORKERS", 0)) or os.cpu_count() or 1
+                _pool = ProcessPoolExecutor(max_workers=workers, initializer=warm_up)
+    return _pool
+
+
+@atexit.register
+def _shutdown_pool():
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+
+
+def detect_image_bytes(image_bytes: bytes, subject: str, options: Dict) -> Dict:
+    """Läuft im Worker: Bild decodieren und erkennen. options kommt aus routes.parse_detect_options."""
+    image = Image.open(io.BytesIO(image_bytes))              # decodiert wird erst in detect_image (ggf. verkleinert)
+    objects, scale = detect_image(image, subject, workers=1, **options)
+    return {"objects": objects, "scale": scale, "profile": options["profile"]}
+
+
+def censor_image_bytes(image_bytes: bytes, boxes: list, mode: str, blur_sigma=None, encode_request=None) -> Dict:
+    """
+    Läuft im Worker: Zensur aus rohen Bild-Bytes, Ergebnis wie bei censor_handler als Data-URL.
+    encode_request: {"format", "quality", "png_compress_level"}, schon geprüft (routes.parse_encode_options)
+    """
+    encode_request = encode_request or {}
+    pil_image = Image.open(io.BytesIO(image_bytes))
+    fmt = output_format(encode_request.get("format"), pil_image.format)
+    censored_np = censor(piltonp(pil_image), boxes, mode, blur_sigma=blur_sigma, inplace=True)
+    body, info = encode_image(nptopil(censored_np), fmt, encode_request.get("quality"),
+                              encode_request.get("png_compress_level"))
+    return {
+        "message": f"Censored {len(boxes)} regions",
+        "censored_image": f"data:{info['mime_type']};base64,{base64.b64encode(body).decode()}",
+        **info,
+    }
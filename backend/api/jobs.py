@@ -0,0 +1,192 @@
+# Asynchrone Jobs für Erkennung und Zensur mit Zugangskontrolle:
+# ein fester Pool an Worker-Threads arbeitet eine begrenzte Warteschlange ab. Ist die Warteschlange voll,
+# wird der Job abgelehnt (-> 503 mit Retry-After), statt den Server mit unbegrenzt vielen Anfragen zu überlasten.
+# Die Worker-Threads rechnen nicht selbst, sondern reichen den Job an einen Prozess-Pool weiter (wie bei der
+# Batch-Erkennung, api.batch), weil dlib beim HOG-Detektor den GIL nicht freigibt.
+# Fertige Jobs bleiben begrenzt: höchstens max_finished Stück, und das Ergebnis wird nach dem ersten Abruf freigegeben.
+import math
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Executor
+from typing import Callable, Dict, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Die Warteschlange ist voll, der Client soll es nach retry_after Sekunden erneut versuchen"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    """Ein eingereichter Auftrag: Status ist queued -> running -> done/ error"""
+
+    def __init__(self, kind: str, func: Callable, args: tuple):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.func = func
+        self.args = args
+        self.status = "queued"
+        self.result = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.collected = False                          # Ergebnis wurde schon abgeholt und freigegeben
+        self.done = threading.Event()
+        self.lock = threading.Lock()                    # Prüfen und Setzen von collected bei gleichzeitigen Abrufen
+
+    def to_dict(self) -> Dict:
+        data = {"job_id": self.id, "kind": self.kind, "status": self.status}
+        if self.status == "done" and not self.collected:
+            data["result"] = self.result
+        elif self.status == "error":
+            data["message"] = self.error
+        return data
+
+
+class JobQueue:
+    """
+    Feste Anzahl Worker-Threads hinter einer begrenzten Warteschlange.
+
+    Args:
+        executor: liefert den Pool, in dem die Jobs laufen (z.B. api.batch.get_pool), erst beim ersten Job
+            aufgerufen. None = direkt im Worker-Thread (nur für Funktionen, die den GIL freigeben)
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 16, ttl: float = 600, max_finished: int = 32,
+                 executor: Optional[Callable[[], Executor]] = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.ttl = ttl                                  # so lange bleiben fertige Jobs abrufbar (Sekunden)
+        self.max_finished = max_finished                # höchstens so viele fertige Jobs samt Ergebnis behalten
+        self.executor = executor
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max_queue)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._running = 0
+        self._avg_duration = 1.0                        # gleitender Mittelwert, für die Retry-After-Schätzung
+        self._threads = []
+
+    def start(self):
+        """Worker-Threads starten (erst beim ersten Job, damit z.B. die CLI keine Threads anlegt)"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, kind: str, func: Callable, *args) -> Job:
+        """Job einreihen, wirft QueueFullError wenn kein Platz mehr ist"""
+        self.start()
+        self._expire()
+        job = Job(kind, func, args)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFullError(self.retry_after())
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def collect(self, job: Job) -> Optional[Dict]:
+        """Status/ Ergebnis für einen Abruf. Ein fertiges Ergebnis wird genau einmal ausgeliefert und danach freigegeben
+        (None bei jedem weiteren Abruf), der Job bleibt mit Status bis zur TTL bekannt"""
+        with job.lock:
+            if job.collected:
+                return None
+            data = job.to_dict()
+            if job.status == "done":
+                job.collected = True
+                job.result = None
+            return data
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """Long-Polling: bis zu timeout Sekunden warten, bis der Job fertig ist"""
+        job = self.get(job_id)
+        if job is not None and timeout > 0:
+            job.done.wait(timeout)
+        return job
+
+    @property
+    def depth(self) -> int:
+        """Anzahl wartender (noch nicht gestarteter) Jobs"""
+        return self._queue.qsize()
+
+    def retry_after(self) -> int:
+        """Grobe Schätzung, wann wieder Platz ist: durchschnittliche Dauer * Jobs pro Worker"""
+        return max(1, math.ceil(self._avg_duration * (self.depth + 1) / self.workers))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "queue_depth": self.depth,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "workers": self.workers,
+                "jobs": len(self._jobs),
+                "avg_duration": round(self._avg_duration, 3),
+            }
+
+    def shutdown(self, timeout: float = 30):
+        """Worker nach den bereits eingereihten Jobs beenden"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:                             # Signal zum Beenden
+                break
+            with self._lock:
+                self._running += 1
+            job.status = "running"
+            started = time.perf_counter()
+            try:
+                if self.executor is None:
+                    job.result = job.func(*job.args)
+                else:
+                    job.result = self.executor().submit(job.func, *job.args).result()
+                job.status = "done"
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.kind}) fehlgeschlagen: {str(e)}")
+                job.error = str(e)
+                job.status = "error"
+            duration = time.perf_counter() - started
+            job.args = ()                               # Bilddaten freigeben, nur das Ergebnis bleibt
+            job.finished = time.time()
+            with self._lock:
+                self._running -= 1
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+            job.done.set()
+            self._expire()
+
+    def _expire(self):
+        """Fertige Jobs nach Ablauf der TTL vergessen, und die ältesten, wenn es mehr als max_finished sind"""
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished and now - job.finished > self.ttl]
+            for job_id in expired:
+                del self._jobs[job_id]
+            finished = [job for job in self._jobs.values() if job.finished]
+            if len(finished) > self.max_finished:
+                finished.sort(key=lambda job: job.finished)
+                for job in finished[:len(finished) - self.max_finished]:
+                    del self._jobs[job.id]
@@ -0,0 +1,119 @@
+# Kennzahlen des Servers im Prometheus-Textformat (GET /metrics): Requests, Fehler, Dauer pro Endpoint,
+# Dauer der einzelnen Verarbeitungsschritte (aus engine.timing), Bildgröße und gefundene Gesichter/ Augen.
+# Bewusst ohne prometheus_client, die paar Zähler und Histogramme sind schnell selbst geschrieben.
+import bisect
+import threading
+from typing import Dict, List, Tuple
+
+from engine import timing
+
+# Obergrenzen der Histogramm-Buckets
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MEGAPIXEL_BUCKETS = (0.1, 0.3, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0)
+
+_PREFIX = "bildverpixelung_"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = _PREFIX + name
+        self.help_text = help_text
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = SECONDS_BUCKETS):
+        self.name = _PREFIX + name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._values: Dict[Tuple, Dict] = {}     # Labels -> {"counts": [...], "sum": ..., "count": ...}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            entry = self._values.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry["counts"][index] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, entry in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry["counts"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_label_text(labels + (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_label_text(labels + (('le', '+Inf'),))} {entry['count']}")
+                lines.append(f"{self.name}_sum{_label_text(labels)} {entry['sum']:g}")
+                lines.append(f"{self.name}_count{_label_text(labels)} {entry['count']}")
+        return lines
+
+
+requests_total = Counter("requests_total", "HTTP requests by endpoint and status code")
+errors_total = Counter("errors_total", "HTTP requests answered with a 5xx status")
+request_seconds = Histogram("request_duration_seconds", "Request duration by endpoint")
+stage_seconds = Histogram("stage_duration_seconds", "Duration of processing stages (decode, hog, landmarks, censor, encode, ...)")
+image_megapixels = Histogram("image_megapixels", "Size of processed images in megapixels", MEGAPIXEL_BUCKETS)
+objects_found_total = Counter("objects_found_total", "Detected faces and eyes")
+
+_METRICS = (requests_total, errors_total, request_seconds, stage_seconds, image_megapixels, objects_found_total)
+
+# Jeder Schritt der Engine landet automatisch im Histogramm
+timing.add_listener(lambda name, seconds: stage_seconds.observe(seconds, stage=name))
+
+
+def observe_request(endpoint: str, method: str, status: int, seconds: float):
+    requests_total.inc(endpoint=endpoint, method=method, status=str(status))
+    request_seconds.observe(seconds, endpoint=endpoint)
+    if status >= 500:
+        errors_total.inc(endpoint=endpoint)
+
+
+def observe_image(shape):
+    image_megapixels.observe(shape[0] * shape[1] / 1e6)
+
+
+def observe_objects(objects: List[Dict]):
+    for obj in objects:
+        objects_found_total.inc(type=obj.get("type", "face"))
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def server_timing_header(timings: Dict[str, float], total: float) -> str:
+    """Server-Timing-Header (Dauer in ms), im Browser unter Netzwerk -> Timing zu sehen"""
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,127 @@
+# Verkleinerte Vorschauen (Thumbnails) von Originalen und zensierten Bildern für Galerie und Lightbox.
+# Das Frontend lädt zuerst die kleinen Bilder und holt die volle Auflösung erst bei Bedarf.
+# Fertig kodierte Vorschauen landen in einem LRU-Cache (begrenzt über die Bytes), der Schlüssel ist der Hash des
+# Bildinhalts plus Größe und Format: dasselbe Bild wird also nur einmal verkleinert und kodiert, auch wenn es
+# mehrfach hochgeladen wird.
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+from engine.image_adapter import preview_array, nptopil, encode_image, OUTPUT_FORMATS
+
+# Erlaubte Vorschau-Größen (längere Seite in Pixeln) und Standard-Qualität für JPEG/ WebP
+MIN_PREVIEW_SIZE = 16
+MAX_PREVIEW_SIZE = 2048
+PREVIEW_QUALITY = 80
+
+
+def content_hash(data: bytes) -> str:
+    """Hash der Bilddatei (kodierte Bytes), wie beim Erkennungs-Cache blake2b"""
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def preview_key(source_hash: str, size: int, fmt: Optional[str] = None) -> str:
+    """Cache-Schlüssel einer Vorschau (fmt aus parse_preview_format)"""
+    return f"{source_hash}-{size}-{fmt or 'auto'}"
+
+
+def parse_preview_size(value) -> int:
+    size = int(value)
+    if not MIN_PREVIEW_SIZE <= size <= MAX_PREVIEW_SIZE:
+        raise ValueError(f"size must be between {MIN_PREVIEW_SIZE} and {MAX_PREVIEW_SIZE}")
+    return size
+
+
+def parse_preview_format(requested: Optional[str]) -> Optional[str]:
+    """Angefordertes Vorschau-Format prüfen ("jpg" = "jpeg"), None = automatisch (siehe render_preview)"""
+    if not requested:
+        return None
+    name = requested.lower().replace("jpg", "jpeg")
+    if name not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown preview format: {requested}")
+    return name
+
+
+def open_image(image_bytes: bytes) -> Image.Image:
+    """Bild nur öffnen (Header lesen), dekodiert wird erst in render_preview, bei JPEGs gleich verkleinert"""
+    return Image.open(io.BytesIO(image_bytes))
+
+
+def render_preview(image, size: int, fmt: Optional[str] = None) -> Tuple[bytes, Dict]:
+    """
+    Vorschau erzeugen und kodieren. 'image' ist ein noch nicht dekodiertes PIL-Bild oder ein NumPy-Array.
+    Ohne fmt wird JPEG kodiert, bei Transparenz PNG (JPEG kann keinen Alpha-Kanal).
+
+    Returns:
+        (Bytes, Infos wie bei encode_image plus "width"/ "height" der Vorschau)
+    """
+    small = nptopil(preview_array(image, size))
+    body, info = encode_image(small, fmt or ("png" if small.mode == "RGBA" else "jpeg"),
+                              quality=PREVIEW_QUALITY)
+    return body, {**info, "width": small.width, "height": small.height}
+
+
+class PreviewCache:
+    """Kodierte Vorschauen nach Schlüssel (preview_key), LRU mit Obergrenze für die Bytes aller Einträge"""
+
+    def __init__(self, max_bytes: int = 64 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, Dict]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, body: bytes, info: Dict):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (body, info)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get_or_render(self, key: str, image_factory, size: int, fmt: Optional[str] = None) -> Tuple[bytes, Dict, bool]:
+        """
+        Vorschau aus dem Cache oder neu erzeugen. image_factory liefert das Bild erst bei einem Fehlschlag,
+        bei einem Treffer wird also gar nicht dekodiert.
+
+        Returns:
+            (Bytes, Infos, Cache-Treffer ja/ nein)
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry[0], entry[1], True
+        body, info = render_preview(image_factory(), size, fmt)
+        self.put(key, body, info)
+        return body, info, False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -2,24 +2,64 @@
 # Dafür verantwortlich, die Methoden zu definieren, die zu Requests mit Ursprungsbildern im Base64- Format diese Anonymisiert zurückgeben
 
 # Import von Bibliotheken
-from flask import request, jsonify
+from flask import request, jsonify, Response
+from concurrent.futures import as_completed
 import base64
 import io
+import json
+import math
+import os
 from PIL import Image
 import logging
 
 # Import von Modulen des eigenen Projektes
-from engine.image_adapter import piltonp, nptopil
-from engine.detector import detect
-from engine.censor import censor
+from engine.image_adapter import piltonp, nptopil, output_format, encode_image, preview_array, OUTPUT_FORMATS
+from engine.detector import detect, detect_image, detection_scale, detection_profile, check_tiling, DEFAULT_PROFILE, TILE_OVERLAP
+from engine.censor import censor, censor_patches
+from engine.cache import detection_cache
+from engine.boxes import auto_select_subject, censor_boxes_for_mode
+from engine.timing import stage
 from api.schemas import CensorMode
+from api.batch import get_pool, detect_image_bytes, censor_image_bytes, MAX_BATCH_IMAGES
+from api.jobs import JobQueue, QueueFullError
+from api.sessions import SessionStore, SessionTooLargeError
+from api.previews import PreviewCache, content_hash, preview_key, parse_preview_size, parse_preview_format, open_image
+from api import metrics
 
 # Logging einrichten 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-#Konvertiert Data-URL zu PIL Image und loggt Details
-def decode_data_url(data_url: str) -> Image.Image:
+# Warteschlange für asynchrone Jobs (/api/v1/jobs): feste Anzahl Worker, begrenzte Länge
+job_queue = JobQueue(
+    workers=int(os.environ.get("JOB_WORKERS", 0)) or os.cpu_count() or 1,
+    max_queue=int(os.environ.get("JOB_QUEUE_SIZE", 16)),
+    max_finished=int(os.environ.get("JOB_MAX_FINISHED", 32)),
+    executor=get_pool,                          # gleicher Prozess-Pool wie die Batch-Erkennung
+)
+# Maximale Wartezeit beim Long-Polling eines Jobs (Sekunden)
+MAX_JOB_WAIT = 30
+
+# Bild-Sessions (/api/v1/sessions): Speicher für alle Sessions zusammen und Lebensdauer seit dem letzten Zugriff
+session_store = SessionStore(
+    max_bytes=int(float(os.environ.get("SESSION_MAX_MB", 512)) * 1024 * 1024),
+    ttl=float(os.environ.get("SESSION_TTL", 1800)),
+)
+
+# Vorschauen (/api/v1/preview): kodierte Thumbnails nach Inhalts-Hash und Größe, Obergrenze für alle zusammen
+preview_cache = PreviewCache(max_bytes=int(float(os.environ.get("PREVIEW_CACHE_MB", 64)) * 1024 * 1024))
+# Höchstens so viele Größen pro Request (z.B. Galerie-Thumbnail und Lightbox-Vorschau)
+MAX_PREVIEW_SIZES = 8
+
+#Konvertiert Data-URL zu PIL Image und loggt Details (load=False: siehe decode_image_bytes)
+def decode_data_url(data_url: str, load: bool = True) -> Image.Image:
+    image_bytes = data_url_to_bytes(data_url)
+
+    data = request.get_json(silent=True) or {}
+    return decode_image_bytes(image_bytes, data.get('filename', 'unknown'), data.get('subject', 'unknown'), data.get('type', 'unknown'), load)
+
+#Trennt den Präfix einer Data-URL ab und decodiert den Base64-Teil zu Bytes
+def data_url_to_bytes(data_url: str) -> bytes:
     # Trennt "Metadaten"/ Präfix des Bildes von Daten
     if "," not in data_url:
         raise ValueError("Invalid data URL: missing comma separator")
@@ -33,21 +73,162 @@ def decode_data_url(data_url: str) -> Image.Image:
         raise ValueError(f"Invalid data URL prefix: {prefix}")
 
     # Base64 decodieren (zu Bytes)
-    image_bytes = base64.b64decode(b64_data)
+    with stage("base64_decode"):
+        return base64.b64decode(b64_data)
+
+#Konvertiert rohe Bild-Bytes (z.B. aus einem Multipart-Upload) zu PIL Image und loggt Details.
+#Mit load=False wird nur der Header gelesen: ein JPEG kann dann für die Erkennung gleich verkleinert
+#decodiert werden (siehe detect_image), kaputte Bilddaten fallen aber erst später auf.
+def decode_image_bytes(image_bytes: bytes, filename: str = "unknown", subject: str = "unknown", mime: str = "unknown",
+                       load: bool = True) -> Image.Image:
     logger.info(f"Bildgröße (bytes): {len(image_bytes)}")
 
     # Bytes wieder zu PIL Image konvertieren, Größe speichern
-    image = Image.open(io.BytesIO(image_bytes))
+    with stage("decode"):
+        image = Image.open(io.BytesIO(image_bytes))
+        if load:
+            image.load()                            # Pillow decodiert erst beim ersten Zugriff, hier mitmessen
     width, height = image.size
+    metrics.observe_image((height, width))
 
     #Logging
-    logger.info(f"BILD EMPFANGEN: {request.json.get('filename', 'unknown')} | "
+    logger.info(f"BILD EMPFANGEN: {filename} | "
                 f"Größe: {width}x{height} | "
-                f"Subject: {request.json.get('subject', 'unknown')} | "
-                f"MIME: {request.json.get('type', 'unknown')}")
+                f"Subject: {subject} | "
+                f"MIME: {mime}")
 
     return image
 
+#Liest die Bytes eines Binär-Requests: entweder Multipart-Feld "image" oder der komplette Request-Body
+def read_uploaded_bytes():
+    params = request.values
+    upload = request.files.get("image")
+    if upload is not None:
+        image_bytes = upload.read()
+        filename = upload.filename or params.get("filename", "unknown")
+        mime = upload.mimetype
+    else:
+        image_bytes = request.get_data()
+        filename = params.get("filename", "unknown")
+        mime = request.mimetype
+    if not image_bytes:
+        raise ValueError("No image data in request")
+    return image_bytes, filename, mime
+
+#Liest das Bild eines Binär-Requests als PIL Image (load=False: siehe decode_image_bytes)
+def read_uploaded_image(load: bool = True) -> Image.Image:
+    image_bytes, filename, mime = read_uploaded_bytes()
+    return decode_image_bytes(image_bytes, filename, request.values.get("subject", "unknown"), mime, load)
+
+#Liest ein optionales, positives Integer-Feld aus dem Request (None wenn nicht angegeben)
+def optional_positive_int(data: dict, field: str):
+    value = data.get(field)
+    if value in (None, ""):
+        return None
+    value = int(value)
+    if value <= 0:
+        raise ValueError(f"{field} must be positive")
+    return value
+
+#Optionale Stärke des Weichzeichners (blur_sigma) als positive Zahl, None wenn nicht angegeben
+def optional_blur_sigma(data) -> float | None:
+    value = data.get("blur_sigma")
+    if value in (None, ""):
+        return None
+    try:
+        sigma = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("blur_sigma must be a number")
+    if not math.isfinite(sigma) or sigma <= 0:
+        raise ValueError("blur_sigma must be positive")
+    return sigma
+
+#Optionale Erkennungs-Parameter aus einem Request lesen (ValueError bei ungültigen Werten)
+def parse_detect_options(data) -> dict:
+    try:
+        options = {
+            "max_side": optional_positive_int(data, "max_side"),
+            "min_face_size": optional_positive_int(data, "min_face_size"),
+            "tile_size": optional_positive_int(data, "tile_size"),           # Kachel-Modus für sehr große Bilder
+            "tile_overlap": optional_positive_int(data, "tile_overlap") or TILE_OVERLAP,
+        }
+        check_tiling(options["tile_size"], options["tile_overlap"])
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid detection size: {e}")
+    # Erkennungs-Profil (fast/ balanced/ thorough), wird in der Antwort als "profile" zurückgegeben
+    options["profile"] = str(data.get("profile") or DEFAULT_PROFILE).strip().lower()
+    detection_profile(options["profile"])                              # ValueError bei unbekanntem Profil
+    return options
+
+#Erkennung mit den Optionen aus parse_detect_options, die Boxen beziehen sich immer auf das Originalbild.
+#Bekommt das noch nicht decodierte PIL Image: mit max_side/ min_face_size wird ein JPEG gleich verkleinert
+#decodiert, danach ist pil_image ggf. nur noch in der kleinen Größe verfügbar.
+def run_detect(pil_image: Image.Image, subject: str, options: dict):
+    objects, scale = detect_image(pil_image, subject, **options)
+    metrics.observe_objects(objects)
+    return objects, scale
+
+#Ausgabe-Parameter aus einem Request lesen: "format" (original/png/jpeg/webp), "quality" (JPEG/WebP, 1-100)
+#und "png_compress_level" (0-9). Standard: Format des Eingabebildes.
+def parse_encode_options(data, source_format: str | None) -> dict:
+    quality = data.get("quality")
+    png_compress_level = data.get("png_compress_level")
+    options = {
+        "fmt": output_format(data.get("format"), source_format),
+        "quality": int(quality) if quality not in (None, "") else None,
+        "png_compress_level": int(png_compress_level) if png_compress_level not in (None, "") else None,
+    }
+    if options["quality"] is not None and not 1 <= options["quality"] <= 100:
+        raise ValueError("quality must be between 1 and 100")
+    if options["png_compress_level"] is not None and not 0 <= options["png_compress_level"] <= 9:
+        raise ValueError("png_compress_level must be between 0 and 9")
+    return options
+
+#Bild kodieren und als Data-URL zurückgeben, dazu die Infos aus encode_image (Format, Dauer, Größe)
+def encode_data_url(pil_image: Image.Image, encode_options: dict):
+    body, info = encode_image(pil_image, **encode_options)
+    with stage("base64_encode"):
+        img_str = base64.b64encode(body).decode()                   # Bild wieder zu base64 umwandeln
+    return f"data:{info['mime_type']};base64,{img_str}", info       # ... mit dem richtigen Präfix
+
+#"response": "image" (Standard, ganzes Bild) oder "patches" (nur die zensierten Ausschnitte)
+def wants_patches(data) -> bool:
+    response = data.get("response") or "image"
+    if response not in ("image", "patches"):
+        raise ValueError("response must be 'image' or 'patches'")
+    return response == "patches"
+
+#Nur die veränderten Ausschnitte zensieren und einzeln kodieren, das Frontend legt sie per Canvas auf das Original.
+#Spart bei wenigen Gesichtern fast die ganze Antwortgröße und die Kopie des ganzen Bildes auf dem Server.
+def patches_payload(np_image, boxes: list, mode: str, blur_sigma, encode_options: dict) -> dict:
+    patches = []
+    encode_ms = 0.0
+    output_bytes = 0
+    for left, up, patch in censor_patches(np_image, boxes, mode, blur_sigma=blur_sigma):
+        data_url, info = encode_data_url(nptopil(patch), encode_options)
+        patches.append({"x": left, "y": up, "w": patch.shape[1], "h": patch.shape[0], "image": data_url})
+        encode_ms += info["encode_ms"]
+        output_bytes += info["output_bytes"]
+    return {
+        "width": np_image.shape[1],
+        "height": np_image.shape[0],
+        "patches": patches,
+        "format": encode_options["fmt"],
+        "mime_type": OUTPUT_FORMATS[encode_options["fmt"]][1],
+        "encode_ms": round(encode_ms, 1),
+        "output_bytes": output_bytes,
+    }
+
+#Binäre Bild-Antwort mit passendem Content-Type und Kodier-Infos im Header
+def image_response(body: bytes, info: dict, regions: int, profile: str | None = None) -> Response:
+    headers = {
+        "X-Censored-Regions": str(regions),
+        "X-Encode-Ms": str(info["encode_ms"]),
+    }
+    if profile:
+        headers["X-Detection-Profile"] = profile                    # nur wenn erkannt wurde (anonymize)
+    return Response(body, mimetype=info["mime_type"], headers=headers)
+
 def detect_handler():
     """Haupt-Handler für /api/v1/detect"""
 
@@ -68,21 +249,29 @@ def detect_handler():
     filename = data["filename"]
     image_data_url = data["image"]
 
+    # Optional: Erkennung auf verkleinertem Bild (maximale Seitenlänge bzw. kleinste gesuchte Gesichtsgröße)
+    try:
+        options = parse_detect_options(data)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
     logger.info(f"Neuer Request: {filename} | Subject: {subject}")
 
     try:
         # 1. Bild decodieren
-        image = decode_data_url(image_data_url)             # PIL image erstellen
-        np_img = piltonp(image)                             # in numpy array umwandeln 
+        image = decode_data_url(image_data_url, load=False)   # PIL image erstellen, decodiert wird erst in run_detect
 
         # 2. Detection/ Erkennung von Gesichtern bzw. Augen durchführen (nutzen der detect methode von engine.detector)
-        objects = detect(np_img, subject)
+        #    Die Boxen beziehen sich immer auf das Originalbild, auch wenn verkleinert erkannt wurde
+        objects, scale = run_detect(image, subject, options)
 
         # 3. Erfolgreiche Response
         response = {
             "status": "success",
             "message": f"Detection complete for {filename}, {len(objects)} objects found",
             "objects": objects,
+            "scale": scale,
+            "profile": options["profile"],
         }
 
         logger.info(f"SUCCESS: {len(objects)} Objekte für {filename}")  # Logging
@@ -105,23 +294,590 @@ def censor_handler():
     missing = [f for f in required if not data.get(f)]
     if missing:
         return jsonify({"status": "error", "message": f"Missing: {', '.join(missing)}"}), 400
+    try:
+        mode = CensorMode(data["mode"])                                 # Nur bekannte Modi zulassen
+    except ValueError:
+        return jsonify({"status": "error", "message": f"Unknown mode: {data['mode']}"}), 400
     try:
         pil_image = decode_data_url(data["image"])                      # Umwandlung der Bilddaten in Request in pil
+        encode_options = parse_encode_options(data, pil_image.format)   # Ausgabeformat, standardmäßig wie das Eingabebild
+        patches = wants_patches(data)
+        blur_sigma = optional_blur_sigma(data)
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Invalid request: {str(e)}"}), 400
+    try:
         np_image = piltonp(pil_image)                                   # ... und dann zu numpy array
-        censored_np = censor(np_image, data["boxes"], data["mode"])     # Aufruf der censor- Methode, speichern des anonymisierten Bildes
+        del pil_image                                                   # decodiertes PIL-Bild wird nicht mehr gebraucht
+        if patches:                                                     # nur die zensierten Ausschnitte zurückgeben
+            return jsonify({
+                "status": "success",
+                "message": f"Censored {len(data['boxes'])} regions",
+                **patches_payload(np_image, data["boxes"], mode.value, blur_sigma, encode_options),
+            })
+        censored_np = censor(np_image, data["boxes"], mode.value,       # Aufruf der censor- Methode, speichern des anonymisierten Bildes
+                             blur_sigma=blur_sigma, inplace=True)               # np_image gehört uns, keine Kopie nötig
         censored_pil = nptopil(censored_np)                             # ... und Umwandlung in ein pil
 
-        buffer = io.BytesIO()                                           
-        censored_pil.save(buffer, format="PNG", optimize=True)          # Bild als PNG im RAM speichern
-        img_str = base64.b64encode(buffer.getvalue()).decode()          # Bild wieder zu base64 umwandeln
-        data_url = f"data:image/png;base64,{img_str}"                   # ... mit dem richtigen Präfix
+        data_url, info = encode_data_url(censored_pil, encode_options)  # Bild kodieren und zu base64 umwandeln
 
         return jsonify({                                                # Response senden 
             "status": "success",
             "message": f"Censored {len(data['boxes'])} regions",
-            "censored_image": data_url
+            "censored_image": data_url,
+            **info,
         })
     
     except Exception as e:                                              #Error handling aller anderen Fehler 
         logger.error(f"Censor error: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500     # Fehlermeldung, die für "internal server error" steht
+
+# Binär-Variante von /api/v1/detect: Bild als Multipart-Feld "image" oder als Request-Body (kein Base64),
+# Parameter (subject, max_side, ...) als Formular-Felder oder Query-Parameter. Antwort wie bei detect_handler.
+def detect_raw_handler():
+    params = request.values
+    subject = params.get("subject", "face")
+    try:
+        options = parse_detect_options(params)
+        image = read_uploaded_image(load=False)
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e), "objects": []}), 400
+    try:
+        objects, scale = run_detect(image, subject, options)
+        return jsonify({
+            "status": "success",
+            "message": f"Detection complete, {len(objects)} objects found",
+            "objects": objects,
+            "scale": scale,
+            "profile": options["profile"],
+        })
+    except Exception as e:
+        logger.error(f"FEHLER bei Detect (binär): {str(e)}")
+        return jsonify({"status": "error", "message": f"Processing failed: {str(e)}", "objects": []}), 500
+
+# Binär-Variante von /api/v1/censor: Bild wie bei detect_raw_handler, "boxes" als JSON-Text, "mode" wie gewohnt.
+# Die Antwort ist direkt das kodierte Bild (Content-Type passend zum Format), nicht in JSON/ Base64 verpackt
+# (außer bei "response": "patches").
+def censor_raw_handler():
+    params = request.values
+    try:
+        boxes = json.loads(params.get("boxes", ""))
+        mode = CensorMode(params.get("mode", ""))
+        blur_sigma = optional_blur_sigma(params)
+        image = read_uploaded_image()
+        encode_options = parse_encode_options(params, image.format)
+        patches = wants_patches(params)
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Invalid request: {str(e)}"}), 400
+    try:
+        np_image = piltonp(image)
+        del image
+        if patches:                                                     # Ausschnitte kommen immer als JSON
+            return jsonify({
+                "status": "success",
+                "message": f"Censored {len(boxes)} regions",
+                **patches_payload(np_image, boxes, mode.value, blur_sigma, encode_options),
+            })
+        censored_np = censor(np_image, boxes, mode.value, blur_sigma=blur_sigma, inplace=True)
+        body, info = encode_image(nptopil(censored_np), **encode_options)
+        return image_response(body, info, len(boxes))
+    except Exception as e:
+        logger.error(f"Censor error (binär): {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# Batch-Erkennung: viele Bilder in einem Request, parallel im Worker-Pool (api/batch.py).
+# JSON: {"subject": ..., "images": [{"image": <data-url>, "filename": ...}, ...], optionale Erkennungs-Parameter}
+# oder Multipart mit mehreren Feldern "image". Standardmäßig wird NDJSON gestreamt (eine Zeile pro fertigem Bild,
+# in der Reihenfolge, in der die Bilder fertig werden), mit stream=false kommt eine JSON-Antwort in Eingabe-Reihenfolge.
+def detect_batch_handler():
+    if request.files:
+        params = request.values
+        uploads = request.files.getlist("image")
+        items = [(upload.filename or f"image_{i}", upload.read(), None) for i, upload in enumerate(uploads)]
+    else:
+        params = request.get_json(silent=True) or {}
+        items = []
+        for i, entry in enumerate(params.get("images") or []):
+            filename = entry.get("filename") or f"image_{i}"
+            try:
+                items.append((filename, data_url_to_bytes(entry.get("image") or ""), None))
+            except Exception as e:                                      # Fehler betrifft nur dieses Bild
+                items.append((filename, None, f"Invalid image: {str(e)}"))
+
+    if not items:
+        return jsonify({"status": "error", "message": "No images in request"}), 400
+    if len(items) > MAX_BATCH_IMAGES:
+        return jsonify({"status": "error", "message": f"Too many images (max {MAX_BATCH_IMAGES})"}), 400
+    try:
+        options = parse_detect_options(params)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    subject = params.get("subject", "face")
+    stream = str(params.get("stream", "true")).lower() not in ("false", "0", "no")
+
+    logger.info(f"Batch-Request: {len(items)} Bilder | Subject: {subject}")
+
+    # Alle Bilder sofort an den Pool geben, Fehler beim Decodieren der Data-URL direkt als Ergebnis
+    pool = get_pool()
+    futures = {}
+    early_results = []
+    for index, (filename, image_bytes, error) in enumerate(items):
+        if error:
+            early_results.append({"index": index, "filename": filename, "status": "error", "message": error, "objects": []})
+        else:
+            futures[pool.submit(detect_image_bytes, image_bytes, subject, options)] = (index, filename)
+
+    def results():
+        yield from early_results
+        for future in as_completed(futures):
+            index, filename = futures[future]
+            try:
+                result = future.result()
+                yield {"index": index, "filename": filename, "status": "success", **result}
+            except Exception as e:
+                logger.error(f"FEHLER bei {filename} (Batch): {str(e)}")
+                yield {"index": index, "filename": filename, "status": "error",
+                       "message": f"Processing failed: {str(e)}", "objects": []}
+
+    if stream:
+        return Response((json.dumps(result) + "\n" for result in results()), mimetype="application/x-ndjson")
+
+    ordered = sorted(results(), key=lambda result: result["index"])
+    failed = sum(1 for result in ordered if result["status"] == "error")
+    return jsonify({
+        "status": "success",
+        "message": f"Batch complete, {len(ordered) - failed} of {len(ordered)} images processed",
+        "results": ordered,
+    })
+
+# Job einreichen: gleicher Body wie bei /api/v1/detect bzw. /api/v1/censor, zusätzlich "kind": "detect"/"censor".
+# Antwortet sofort mit der Job-ID (202). Ist die Warteschlange voll: 503 mit Retry-After-Header.
+def submit_job_handler():
+    data = request.get_json(silent=True) or {}
+    kind = data.get("kind")
+
+    try:
+        if kind == "detect":
+            missing = [f for f in ["subject", "image"] if not data.get(f)]
+            if missing:
+                return jsonify({"status": "error", "message": f"Missing: {', '.join(missing)}"}), 400
+            args = (data_url_to_bytes(data["image"]), data["subject"], parse_detect_options(data))
+            func = detect_image_bytes
+        elif kind == "censor":
+            missing = [f for f in ["image", "boxes", "mode"] if not data.get(f)]
+            if missing:
+                return jsonify({"status": "error", "message": f"Missing: {', '.join(missing)}"}), 400
+            encode_options = parse_encode_options(data, None)           # nur prüfen, Format kennt erst der Worker
+            encode_request = {"format": data.get("format"), "quality": encode_options["quality"],
+                              "png_compress_level": encode_options["png_compress_level"]}
+            args = (data_url_to_bytes(data["image"]), data["boxes"], CensorMode(data["mode"]).value,
+                    optional_blur_sigma(data), encode_request)
+            func = censor_image_bytes
+        else:
+            return jsonify({"status": "error", "message": "kind must be 'detect' or 'censor'"}), 400
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    try:
+        job = job_queue.submit(kind, func, *args)
+    except QueueFullError as e:
+        logger.warning(f"Job abgelehnt, Warteschlange voll ({job_queue.depth})")
+        response = jsonify({"status": "error", "message": str(e), "queue_depth": job_queue.depth})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 503                                            # "service unavailable", später nochmal versuchen
+
+    logger.info(f"Job {job.id} ({kind}) eingereiht, Warteschlange: {job_queue.depth}")
+    return jsonify({"status": "success", "job_id": job.id, "job_status": job.status, "queue_depth": job_queue.depth}), 202
+
+# Status/ Ergebnis eines Jobs. Mit ?wait=<sekunden> wird gewartet, bis der Job fertig ist (Long-Polling, max. 30 s).
+def job_status_handler(job_id: str):
+    try:
+        wait = min(float(request.args.get("wait", 0)), MAX_JOB_WAIT)
+    except ValueError:
+        return jsonify({"status": "error", "message": "wait must be a number"}), 400
+    job = job_queue.wait(job_id, wait)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Unknown job: {job_id}"}), 404
+    data = job_queue.collect(job)                                       # Ergebnis nur einmal ausliefern, danach Speicher freigeben
+    if data is None:                                                    # Ergebnis schon abgeholt und freigegeben
+        return jsonify({"status": "error", "job_id": job.id, "message": "Result was already fetched"}), 410
+    return jsonify({"status": "success", **data, "queue_depth": job_queue.depth})
+
+# Auslastung der Job-Warteschlange
+def job_queue_stats_handler():
+    return jsonify({"status": "success", **job_queue.stats()})
+
+#Prüft eine Liste von Boxen im Erkennungs-Format ({x, y, w, h}, Mittelpunkt + volle Breite/Höhe)
+def parse_detection_boxes(value, default_type: str) -> list:
+    if isinstance(value, str):                                          # bei Multipart kommen die Boxen als JSON-Text
+        value = json.loads(value)
+    if not isinstance(value, list):
+        raise ValueError("boxes must be a list")
+    boxes = []
+    for box in value:
+        boxes.append({
+            "type": box.get("type", default_type),
+            "x": int(box["x"]), "y": int(box["y"]), "w": int(box["w"]), "h": int(box["h"]),
+        })
+    return boxes
+
+# Ein-Schritt-Anonymisierung: decodieren, erkennen, Boxen umwandeln (inkl. Augenpaare) und zensieren in einem Request.
+# JSON mit Data-URL -> JSON-Antwort mit Data-URL; Multipart/ Request-Body -> Antwort ist direkt das kodierte Bild.
+# Optional: "boxes" ersetzt die Erkennung komplett, "extra_boxes" wird zu den erkannten Boxen hinzugefügt
+# (beides im Erkennungs-Format {x, y, w, h}).
+def anonymize_handler():
+    binary = not request.is_json
+    data = request.values if binary else (request.get_json(silent=True) or {})
+
+    if not data.get("mode"):
+        return jsonify({"status": "error", "message": "Missing: mode"}), 400
+    try:
+        mode = CensorMode(data["mode"])
+        expected_subject = auto_select_subject(mode.value)
+        subject = data.get("subject") or expected_subject
+        box_type = "eye" if subject in ("eye", "eyes") else "face"
+        # eyeBar braucht Augen(-paare), pixel/ blur Gesichter: ein anderes subject würde falsch zensieren
+        if box_type != ("eye" if expected_subject == "eyes" else "face"):
+            raise ValueError(f"subject '{subject}' does not fit mode '{mode.value}' "
+                             f"(expected '{expected_subject}', or leave subject out)")
+        override = parse_detection_boxes(data["boxes"], box_type) if data.get("boxes") else None
+        extra = parse_detection_boxes(data["extra_boxes"], box_type) if data.get("extra_boxes") else []
+        options = parse_detect_options(data)
+        blur_sigma = optional_blur_sigma(data)
+        if binary:
+            image_bytes, filename, mime = read_uploaded_bytes()
+        else:
+            if not data.get("image"):
+                return jsonify({"status": "error", "message": "Missing: image"}), 400
+            image_bytes = data_url_to_bytes(data["image"])
+            filename, mime = data.get("filename", "unknown"), data.get("type", "unknown")
+        # Mit Erkennung noch nicht decodieren, siehe run_detect
+        pil_image = decode_image_bytes(image_bytes, filename, subject, mime, load=override is not None)
+        full_size = pil_image.size
+        encode_options = parse_encode_options(data, pil_image.format)
+        patches = wants_patches(data)
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Invalid request: {str(e)}"}), 400
+
+    try:
+        scale, profile = 1.0, None
+        if override is not None:
+            objects = override                                          # Boxen vom Client, keine Erkennung
+        else:
+            objects, scale = run_detect(pil_image, subject, options)
+            profile = options["profile"]
+        objects = objects + extra
+
+        if pil_image.size != full_size:                                 # für die Erkennung verkleinert decodiert,
+            pil_image = Image.open(io.BytesIO(image_bytes))             # zum Zensieren in voller Auflösung
+        np_image = piltonp(pil_image)                                   # (sonst wird nur einmal decodiert)
+        del pil_image
+
+        censor_boxes = censor_boxes_for_mode(objects, mode.value)
+        if patches:
+            logger.info(f"Anonymisiert: {len(objects)} Bereiche ({mode.value}, nur Ausschnitte)")
+            return jsonify({
+                "status": "success",
+                "message": f"Anonymized {len(objects)} regions",
+                "objects": objects,
+                "scale": scale,
+                "profile": profile,
+                **patches_payload(np_image, censor_boxes, mode.value, blur_sigma, encode_options),
+            })
+        censored_np = censor(np_image, censor_boxes, mode.value, blur_sigma=blur_sigma, inplace=True)
+        body, info = encode_image(nptopil(censored_np), **encode_options)
+        logger.info(f"Anonymisiert: {len(objects)} Bereiche ({mode.value})")
+
+        if binary:
+            return image_response(body, info, len(objects), profile)
+        return jsonify({
+            "status": "success",
+            "message": f"Anonymized {len(objects)} regions",
+            "objects": objects,
+            "scale": scale,
+            "profile": profile,
+            "censored_image": f"data:{info['mime_type']};base64,{base64.b64encode(body).decode()}",
+            **info,
+        })
+    except Exception as e:
+        logger.error(f"Anonymize error: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# Trefferquote des Erkennungs-Caches (für Monitoring/ Debugging)
+def cache_stats_handler():
+    return jsonify({"status": "success", "cache": detection_cache.stats()})
+
+# Bild-Session anlegen: Bild wie bei detect/ censor als Data-URL ({"image", "filename", "type"}) oder binär
+# (Multipart-Feld "image"/ Request-Body). Das Bild wird einmal decodiert und bleibt auf dem Server, die Antwort
+# enthält die Session-ID für /api/v1/sessions/<id>/detect und /censor.
+def create_session_handler():
+    try:
+        if request.is_json:
+            data = request.get_json(silent=True) or {}
+            if not data.get("image"):
+                return jsonify({"status": "error", "message": "Missing: image"}), 400
+            filename = data.get("filename", "unknown")
+            pil_image = decode_data_url(data["image"])
+        else:
+            image_bytes, filename, mime = read_uploaded_bytes()
+            pil_image = decode_image_bytes(image_bytes, filename, "session", mime)
+        source_format = pil_image.format
+        np_image = piltonp(pil_image)
+        del pil_image
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Invalid image: {str(e)}"}), 400
+    try:
+        session = session_store.create(np_image, source_format, filename)
+    except SessionTooLargeError as e:
+        return jsonify({"status": "error", "message": str(e)}), 413
+    logger.info(f"Session {session.id} angelegt: {filename} ({np_image.shape[1]}x{np_image.shape[0]})")
+    return jsonify({"status": "success", **session.to_dict(session_store.ttl)}), 201
+
+def unknown_session(session_id: str):
+    return jsonify({"status": "error", "message": f"Unknown or expired session: {session_id}"}), 404
+
+# Infos zu einer Session (Größe, aktuelle Boxen und Modus, verbleibende Lebensdauer)
+def session_info_handler(session_id: str):
+    session = session_store.get(session_id)
+    if session is None:
+        return unknown_session(session_id)
+    return jsonify({"status": "success", **session.to_dict(session_store.ttl)})
+
+def delete_session_handler(session_id: str):
+    if not session_store.delete(session_id):
+        return unknown_session(session_id)
+    return jsonify({"status": "success", "message": f"Session {session_id} deleted"})
+
+# Belegung des Session-Speichers
+def session_stats_handler():
+    return jsonify({"status": "success", **session_store.stats()})
+
+# Erkennung auf dem Bild einer Session: Body wie bei /api/v1/detect, nur ohne Bild. Antwort wie bei detect_handler.
+def session_detect_handler(session_id: str):
+    session = session_store.get(session_id)
+    if session is None:
+        return unknown_session(session_id)
+    data = request.get_json(silent=True) or {}
+    try:
+        options = parse_detect_options(data)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    subject = data.get("subject", "face")
+    try:
+        scale = detection_scale(session.image.shape, options["max_side"], options["min_face_size"], options["profile"])
+        objects = detect(session.image, subject, scale=scale, tile_size=options["tile_size"],
+                         tile_overlap=options["tile_overlap"], profile=options["profile"])
+        metrics.observe_objects(objects)
+        return jsonify({
+            "status": "success",
+            "message": f"Detection complete for {session.filename}, {len(objects)} objects found",
+            "objects": objects,
+            "scale": scale,
+            "profile": options["profile"],
+        })
+    except Exception as e:
+        logger.error(f"FEHLER bei Session-Detect {session_id}: {str(e)}")
+        return jsonify({"status": "error", "message": f"Processing failed: {str(e)}", "objects": []}), 500
+
+# Zensur des Session-Bildes. Entweder alle Boxen ("boxes", ersetzt die bisherigen) oder nur die Änderungen
+# ("add"/ "remove", "remove" nach Wert) im Format von /api/v1/censor, dazu "mode" und optional "blur_sigma".
+# Neu berechnet werden nur die Regionen, die sich geändert haben. Antwort wie bei censor_handler: das ganze Bild,
+# oder mit "response": "patches" nur die geänderten Ausschnitte (inkl. wiederhergestellter Stellen entfernter Boxen).
+def session_censor_handler(session_id: str):
+    session = session_store.get(session_id)
+    if session is None:
+        return unknown_session(session_id)
+    data = request.get_json(silent=True) or {}
+    try:
+        mode = CensorMode(data.get("mode") or session.mode or "")
+        blur_sigma = optional_blur_sigma(data)
+        encode_options = parse_encode_options(data, session.source_format)
+        patches = wants_patches(data)
+        for field in ("boxes", "add", "remove"):
+            if not isinstance(data.get(field, []), list):
+                raise ValueError(f"{field} must be a list")
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Invalid request: {str(e)}"}), 400
+
+    with session.lock:                          # gleichzeitige Änderungen an derselben Session nacheinander
+        try:
+            if "boxes" in data:
+                boxes = data["boxes"]
+            else:
+                boxes = session.changed_boxes(data.get("add", []), data.get("remove", []))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        try:
+            changed = session.render(boxes, mode.value, blur_sigma)
+            result = {
+                "status": "success",
+                "message": f"Censored {len(boxes)} regions, {len(changed)} changed",
+                "session_id": session.id,
+                "boxes": len(boxes),
+                "changed_regions": len(changed),
+            }
+            if patches:
+                rendered = session.rendered
+                encoded = []
+                encode_ms, output_bytes = 0.0, 0
+                for left, up, right, down in changed:
+                    data_url, info = encode_data_url(nptopil(rendered[up:down, left:right]), encode_options)
+                    encoded.append({"x": left, "y": up, "w": right - left, "h": down - up, "image": data_url})
+                    encode_ms += info["encode_ms"]
+                    output_bytes += info["output_bytes"]
+                return jsonify({
+                    **result,
+                    "width": rendered.shape[1],
+                    "height": rendered.shape[0],
+                    "patches": encoded,
+                    "format": encode_options["fmt"],
+                    "mime_type": OUTPUT_FORMATS[encode_options["fmt"]][1],
+                    "encode_ms": round(encode_ms, 1),
+                    "output_bytes": output_bytes,
+                })
+            data_url, info = encode_data_url(nptopil(session.rendered), encode_options)
+            return jsonify({**result, "censored_image": data_url, **info})
+        except Exception as e:
+            logger.error(f"Censor error (Session {session_id}): {str(e)}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+
+#Vorschau-Größen aus einem Request: "sizes" (Liste) oder "size" (eine Zahl), Standard 256
+def parse_preview_sizes(data) -> list:
+    sizes = data.get("sizes")
+    if sizes is None:
+        sizes = [data.get("size") or 256]
+    elif isinstance(sizes, str):
+        sizes = sizes.split(",")
+    elif not isinstance(sizes, list):
+        raise ValueError("sizes must be a list")
+    if not 1 <= len(sizes) <= MAX_PREVIEW_SIZES:
+        raise ValueError(f"Between 1 and {MAX_PREVIEW_SIZES} sizes allowed")
+    return [parse_preview_size(size) for size in sizes]
+
+#Binäre Vorschau-Antwort. Der Cache-Schlüssel ist zugleich das ETag: gleicher Inhalt, gleiche Größe -> gleiche Bytes.
+def preview_response(body: bytes, info: dict, key: str, hit: bool, cache_control: str) -> Response:
+    response = Response(body, mimetype=info["mime_type"], headers={
+        "Cache-Control": cache_control,
+        "X-Preview-Cache": "hit" if hit else "miss",
+        "X-Preview-Size": f"{info['width']}x{info['height']}",
+    })
+    response.set_etag(key)
+    return response
+
+# Verkleinerte Vorschau eines Bildes, damit das Frontend Galerie und Vorschau mit kleinen Bildern aufbauen kann und die
+# volle Auflösung erst bei Bedarf lädt. JSON: {"image": Data-URL, "sizes": [...] oder "size", "format"} -> Hash und
+# je Größe eine Vorschau als Data-URL. Binär (Multipart-Feld "image"/ Request-Body, ?size=&format=) -> Bild-Bytes.
+# Gecacht wird nach Hash der Bilddatei und Größe: ein schon bekanntes Bild wird gar nicht erst dekodiert.
+def preview_handler():
+    try:
+        if request.is_json:
+            data = request.get_json(silent=True) or {}
+            if not data.get("image"):
+                return jsonify({"status": "error", "message": "Missing: image"}), 400
+            image_bytes = data_url_to_bytes(data["image"])
+        else:
+            data = request.values
+            image_bytes, _, _ = read_uploaded_bytes()
+        sizes = parse_preview_sizes(data)
+        fmt = parse_preview_format(data.get("format"))
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Invalid request: {str(e)}"}), 400
+
+    source_hash = content_hash(image_bytes)
+    decoded = []
+    def source():                               # erst bei einem Fehlschlag, und nur einmal für alle Größen dekodieren
+        if not decoded:
+            decoded.append(preview_array(open_image(image_bytes), max(sizes)))
+        return decoded[0]
+    try:
+        previews = []
+        for size in sizes:
+            key = preview_key(source_hash, size, fmt)
+            body, info, hit = preview_cache.get_or_render(key, source, size, fmt)
+            previews.append((size, key, body, info, hit))
+    except Exception as e:
+        logger.error(f"Preview error: {str(e)}")
+        return jsonify({"status": "error", "message": f"Invalid image: {str(e)}"}), 400
+
+    if not request.is_json:
+        _, key, body, info, hit = previews[0]
+        return preview_response(body, info, key, hit, "public, max-age=86400, immutable")
+    return jsonify({
+        "status": "success",
+        "hash": source_hash,
+        "previews": [{
+            "size": size,
+            "width": info["width"],
+            "height": info["height"],
+            "format": info["format"],
+            "output_bytes": info["output_bytes"],
+            "image": f"data:{info['mime_type']};base64,{base64.b64encode(body).decode()}",
+        } for size, _, body, info, _ in previews],
+    })
+
+# Schon erzeugte Vorschau über den Hash aus /api/v1/preview abrufen (?size=&format=), ohne das Bild erneut zu schicken.
+# Nur aus dem Cache: ist die Vorschau verdrängt, kommt 404 und das Frontend schickt das Bild noch einmal.
+def cached_preview_handler(source_hash: str):
+    try:
+        size = parse_preview_size(request.args.get("size", 256))
+        fmt = parse_preview_format(request.args.get("format"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    key = preview_key(source_hash, size, fmt)
+    if key in request.if_none_match:
+        return Response(status=304, headers={"ETag": f'"{key}"'})
+    entry = preview_cache.get(key)
+    if entry is None:
+        return jsonify({"status": "error", "message": f"Preview not cached: {source_hash} ({size})"}), 404
+    body, info = entry
+    return preview_response(body, info, key, True, "public, max-age=86400, immutable")
+
+# Vorschau des Session-Bildes (?size=&format=&view=original|censored). Der Hash ändert sich mit jeder anderen Zensur,
+# das ETag ebenso; mit If-None-Match kommt 304, solange sich nichts geändert hat.
+def session_preview_handler(session_id: str):
+    session = session_store.get(session_id)
+    if session is None:
+        return unknown_session(session_id)
+    view = request.args.get("view", "original")
+    try:
+        size = parse_preview_size(request.args.get("size", 256))
+        fmt = parse_preview_format(request.args.get("format"))
+        if view not in ("original", "censored"):
+            raise ValueError("view must be 'original' or 'censored'")
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    with session.lock:                          # nicht während einer Zensur das halb fertige Bild verkleinern
+        if view == "censored" and session.rendered is None:
+            return jsonify({"status": "error", "message": "Session has not been censored yet"}), 404
+        key = preview_key(session.content_hash(view), size, fmt)
+        if key in request.if_none_match:
+            return Response(status=304, headers={"ETag": f'"{key}"', "Cache-Control": "no-cache"})
+        image = session.image if view == "original" else session.rendered
+        body, info, hit = preview_cache.get_or_render(key, lambda: image, size, fmt)
+    return preview_response(body, info, key, hit, "no-cache")
+
+# Session-Bild in voller Auflösung (?view=original|censored&format=&quality=), für Lightbox und Download. Das Frontend
+# hält selbst nur Thumbnail und Session-ID. Ohne format wird wie beim Zensieren im Format des hochgeladenen Bildes kodiert.
+def session_image_handler(session_id: str):
+    session = session_store.get(session_id)
+    if session is None:
+        return unknown_session(session_id)
+    view = request.args.get("view", "original")
+    try:
+        if view not in ("original", "censored"):
+            raise ValueError("view must be 'original' or 'censored'")
+        encode_options = parse_encode_options(request.args, session.source_format)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    with session.lock:                          # nicht während einer Zensur das halb fertige Bild kodieren
+        if view == "censored" and session.rendered is None:
+            return jsonify({"status": "error", "message": "Session has not been censored yet"}), 404
+        image = session.image if view == "original" else session.rendered
+        body, info = encode_image(nptopil(image), **encode_options)
+        regions = len(session.boxes) if view == "censored" else 0
+    return image_response(body, info, regions)
+
+# Belegung und Trefferquote des Vorschau-Caches
+def preview_stats_handler():
+    return jsonify({"status": "success", "cache": preview_cache.stats()})
@@ -44,24 +44,25 @@ class DetectionResult(Dict[str, Any]):
 
 # === CENSORING ENGINE INPUT/OUTPUT ===
 class CensorMode(str, Enum):
-    """Censoring styles the frontend will select later."""
-    PIXELATE = "pixelate"    # Downsample + upsample (mosaic effect)
-    BLACK_BAR = "black_bar"  # Solid black rectangle
-    BLUR = "blur"            # Gaussian blur
+    """Censoring styles supported by censor.py (values are what the frontend sends as "mode")."""
+    PIXELATE = "pixel"       # Block means over a 7x7 grid (mosaic effect)
+    BLUR = "blur"            # Gaussian blur (repeated box blur, strength via "blur_sigma")
+    EYE_BAR = "eyeBar"       # Solid black bar over each eye pair
 
 
 def censor_input_schema():
     """What censor.py should expect."""
     return {
-        "image": np.ndarray,           # HxWx3 RGB uint8 (from piltonp())
+        "image": np.ndarray,           # HxWx3 RGB, HxWx4 RGBA or HxW gray, uint8 (from piltonp())
         "boxes": List[DetectionBox],   # List from detector.detect()
         "mode": CensorMode,            # How to censor each box
+        "blur_sigma": float,           # Optional: blur strength in pixels (only for CensorMode.BLUR)
     }
 
 
 def censor_output_schema():
     """What censor.py must return."""
-    return np.ndarray  # HxWx3 RGB uint8 (input shape, censored regions applied)
+    return np.ndarray  # uint8, same shape as the input, censored regions applied
 
 
 # === USAGE EXAMPLES ===
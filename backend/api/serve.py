@@ -0,0 +1,92 @@
+# Produktiv-Start des Servers mit waitress statt des Flask-Entwicklungsservers.
+# waitress läuft auf Windows, macOS und Linux, arbeitet mit einem Thread-Pool (Standard: ein Thread pro Kern)
+# und lädt die Modelle, bevor der erste Request angenommen wird. Die Erkennung selbst läuft nicht in diesen Threads
+# (dlib hält den GIL), sondern im Prozess-Pool des Detektors, siehe engine.detector.use_detector_pool.
+#
+# Aufruf aus backend/:
+#   python -m api.serve [--host 0.0.0.0] [--port 5001] [--threads N] [--max-upload-mb 100]
+import _thread
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from waitress import create_server
+
+from api.app import app, warm_up_models, ready, shutting_down
+from api.routes import job_queue
+
+logger = logging.getLogger(__name__)
+
+# So lange dürfen laufende Requests und Jobs beim Herunterfahren noch fertig werden (Sekunden)
+SHUTDOWN_TIMEOUT = 30
+
+
+def _idle(server) -> bool:
+    """Keine Requests in Bearbeitung oder Warteschlange, keine laufenden oder wartenden Jobs"""
+    dispatcher = server.task_dispatcher
+    return (dispatcher.active_count == 0 and not dispatcher.queue
+            and job_queue.depth == 0 and job_queue.stats()["running"] == 0)
+
+
+def _drain(server, timeout: float):
+    """Auf laufende Requests und Jobs warten (neue werden schon mit 503 abgelehnt), dann waitress beenden"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not _idle(server):
+        time.sleep(0.1)
+    if not _idle(server):
+        logger.warning("Timeout beim Herunterfahren, laufende Requests werden abgebrochen")
+    _thread.interrupt_main()                            # -> handle_signal im Haupt-Thread, siehe dort
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Production server for the Bild-Verpixelung API")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5001)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("SERVE_THREADS", 0)) or os.cpu_count() or 1,
+                        help="Worker threads (default: number of CPU cores)")
+    parser.add_argument("--max-upload-mb", type=float, default=float(os.environ.get("MAX_UPLOAD_MB", 100)),
+                        help="Reject request bodies larger than this (HTTP 413)")
+    parser.add_argument("--shutdown-timeout", type=float, default=SHUTDOWN_TIMEOUT,
+                        help="Seconds to let running requests and jobs finish on SIGTERM/ Ctrl+C")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    max_body = int(args.max_upload_mb * 1024 * 1024)
+    app.config["MAX_CONTENT_LENGTH"] = max_body
+
+    # Modelle laden, bevor der Port geöffnet wird: der erste Request muss nicht mehr darauf warten
+    started = time.perf_counter()
+    warm_up_models()
+    logger.info(f"Modelle geladen in {time.perf_counter() - started:.1f}s")
+
+    server = create_server(app, host=args.host, port=args.port, threads=args.threads, max_request_body_size=max_body)
+
+    def handle_signal(signum, frame):
+        # Zweites Signal (von _drain nach dem Warten oder ein zweites Ctrl+C): KeyboardInterrupt beendet server.run(),
+        # waitress fährt dann seine Threads herunter
+        if shutting_down.is_set():
+            raise KeyboardInterrupt
+        logger.info(f"Signal {signum} empfangen, fahre herunter (max. {args.shutdown_timeout:.0f}s)")
+        shutting_down.set()
+        ready.clear()
+        threading.Thread(target=_drain, args=(server, args.shutdown_timeout), daemon=True).start()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    logger.info(f"Server läuft auf http://{args.host}:{args.port} mit {args.threads} Threads")
+    try:
+        server.run()
+    finally:
+        job_queue.shutdown(timeout=args.shutdown_timeout)
+        logger.info("Server beendet")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    raise SystemExit(main())
@@ -0,0 +1,174 @@
+# Bild-Sessions für die Web-Oberfläche: das Bild wird einmal hochgeladen und decodiert, danach beziehen sich
+# Erkennung und Zensur nur noch auf die Session-ID und schicken die geänderten Boxen. Der Server hält das decodierte
+# Original und das zuletzt zensierte Bild im Speicher und berechnet bei einer Änderung nur die betroffenen Regionen neu
+# (engine.censor.censor_update).
+# Begrenzt wird über den Speicher aller Sessions (älteste zuerst verdrängt, LRU) und eine TTL seit dem letzten Zugriff.
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from engine.cache import DetectionCache
+from engine.censor import censor_update, box_key
+from engine.regions import Rect, RegionSet
+
+
+class SessionTooLargeError(Exception):
+    """Das Bild passt (samt zensierter Kopie) nicht in den Speicher, der für alle Sessions zusammen vorgesehen ist"""
+
+    def __init__(self, needed: int, limit: int):
+        super().__init__(f"Image needs {needed / 2 ** 20:.0f} MB, session memory limit is {limit / 2 ** 20:.0f} MB")
+
+
+class ImageSession:
+    """Ein hochgeladenes Bild: Original (unverändert), zensierte Fassung und die Zensur, die darauf angewendet ist"""
+
+    def __init__(self, image: np.ndarray, source_format: Optional[str], filename: str):
+        self.id = uuid.uuid4().hex
+        self.image = image
+        self.image.flags.writeable = False              # das Original wird nie verändert
+        self.rendered: Optional[np.ndarray] = None      # zensiertes Bild, erst beim ersten Zensieren angelegt
+        self.boxes: List = []
+        self.mode: Optional[str] = None
+        self.blur_sigma: Optional[float] = None
+        self.source_format = source_format
+        self.filename = filename
+        self.last_used = time.time()
+        self.lock = threading.Lock()                    # ein Request zur Zeit rendert/ kodiert diese Session
+        self._image_hash: Optional[str] = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.image.nbytes + (self.rendered.nbytes if self.rendered is not None else 0)
+
+    def changed_boxes(self, add: List, remove: List) -> List:
+        """Aktuelle Boxen mit den Änderungen eines Requests: 'remove' raus (nach Wert), 'add' dazu"""
+        boxes = list(self.boxes)
+        keys = [box_key(box) for box in boxes]
+        for box in remove:
+            key = box_key(box)
+            if key not in keys:
+                raise ValueError(f"Box to remove is not in the session: {box}")
+            index = keys.index(key)
+            del boxes[index], keys[index]
+        return boxes + list(add)
+
+    def render(self, boxes: List, mode: str, blur_sigma: Optional[float] = None) -> List[Rect]:
+        """
+        Zensur auf 'boxes' umstellen. Neu berechnet werden nur Regionen, die sich geändert haben; bei einem anderen
+        Modus bzw. blur_sigma werden erst alle alten Regionen zurückgesetzt.
+
+        Returns:
+            geänderte Rechtecke (left, up, right, down) in self.rendered, ohne Überlappung
+        """
+        if self.rendered is None:
+            self.rendered = self.image.copy()
+        changed = []
+        if self.mode is not None and (mode, blur_sigma) != (self.mode, self.blur_sigma):
+            changed += censor_update(self.image, self.rendered, self.boxes, [], self.mode, blur_sigma=self.blur_sigma)
+            self.boxes = []
+        changed += censor_update(self.image, self.rendered, self.boxes, boxes, mode, blur_sigma=blur_sigma)
+        self.boxes, self.mode, self.blur_sigma = list(boxes), mode, blur_sigma
+        return [region.rect for region in RegionSet(changed)]
+
+    def content_hash(self, view: str = "original") -> str:
+        """
+        Hash des Bildinhalts für Vorschau-Cache und ETag. "original": Hash der Pixel (einmal berechnet, gleiche Bilder
+        in verschiedenen Sessions teilen sich damit die Vorschauen); "censored": aus dem Original-Hash und der
+        angewendeten Zensur abgeleitet, ändert sich also bei jedem render() mit anderen Boxen, ohne das zensierte Bild
+        neu zu hashen.
+        """
+        if self._image_hash is None:
+            self._image_hash = DetectionCache.key(self.image)
+        if view == "original":
+            return self._image_hash
+        censor = repr((self.mode, self.blur_sigma, sorted(box_key(box) for box in self.boxes)))
+        return hashlib.blake2b(f"{self._image_hash}:{censor}".encode(), digest_size=20).hexdigest()
+
+    def to_dict(self, ttl: float) -> Dict:
+        return {
+            "session_id": self.id,
+            "filename": self.filename,
+            "width": self.image.shape[1],
+            "height": self.image.shape[0],
+            "format": self.source_format,
+            "mode": self.mode,
+            "boxes": self.boxes,
+            "bytes": self.nbytes,
+            "expires_in": max(0, round(self.last_used + ttl - time.time())),
+        }
+
+
+class SessionStore:
+    """Sessions nach ID, LRU mit Obergrenze für den Speicher aller Bilder zusammen und TTL seit dem letzten Zugriff"""
+
+    def __init__(self, max_bytes: int = 512 * 2 ** 20, ttl: float = 1800):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, ImageSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+
+    def create(self, image: np.ndarray, source_format: Optional[str] = None, filename: str = "unknown") -> ImageSession:
+        """Neue Session anlegen; wirft SessionTooLargeError, wenn Original und zensierte Kopie nicht hineinpassen"""
+        needed = 2 * image.nbytes
+        if needed > self.max_bytes:
+            raise SessionTooLargeError(needed, self.max_bytes)
+        session = ImageSession(image, source_format, filename)
+        with self._lock:
+            self._expire()
+            self._sessions[session.id] = session
+            self._evict(session, needed)
+        return session
+
+    def get(self, session_id: str) -> Optional[ImageSession]:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.last_used = time.time()
+                # für die zensierte Kopie schon jetzt Platz schaffen, sie wird beim ersten Zensieren angelegt
+                self._evict(session, 2 * session.image.nbytes)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": sum(session.nbytes for session in self._sessions.values()),
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "evicted": self.evicted,
+                "expired": self.expired,
+            }
+
+    def _evict(self, keep: ImageSession, keep_bytes: int):
+        """Älteste Sessions verdrängen, bis alle zusammen (keep mit keep_bytes gerechnet) ins Limit passen"""
+        used = sum(session.nbytes for session in self._sessions.values() if session is not keep) + keep_bytes
+        for session_id in list(self._sessions):
+            if used <= self.max_bytes:
+                break
+            session = self._sessions[session_id]
+            if session is keep:
+                continue
+            used -= session.nbytes
+            del self._sessions[session_id]
+            self.evicted += 1
+
+    def _expire(self):
+        """Sessions vergessen, auf die länger als die TTL nicht zugegriffen wurde"""
+        deadline = time.time() - self.ttl
+        expired = [session_id for session_id, session in self._sessions.items() if session.last_used < deadline]
+        for session_id in expired:
+            del self._sessions[session_id]
+        self.expired += len(expired)
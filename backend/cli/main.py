@@ -1,86 +1,307 @@
 import argparse
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from typing import List, Dict, Tuple
-from engine.detector import detect
+from engine.detector import detect, detect_image, detection_scale, warm_up, check_tiling, TILE_OVERLAP, PROFILES, DEFAULT_PROFILE
+from engine.cache import detection_cache
 from engine.censor import censor
-from engine.image_adapter import piltonp, nptopil
+from engine.image_adapter import piltonp, nptopil, output_format, encode_image, OUTPUT_FORMATS
+from engine.boxes import auto_select_subject, censor_boxes_for_mode
+from engine.frames import is_multiframe, iter_frames, track_detections, save_frames, check_buffered, FrameBufferError
+from engine.frames import KEYFRAME_INTERVAL, SCENE_CHANGE_THRESHOLD, MAX_BUFFERED_MB
 from PIL import Image
 
-#Umformatierung vom Dict zu Tuplen. Diese Methode wird hier implementiert, da das Konvertieren bei Verwendung des Frontends vom Frontend übernommen wird, auf dieses in diesem Fall kein Zugriff ist.
-def dicts_to_censor_tuples(boxes: List[Dict]) -> List[Tuple[int, int, int, int]]:
-    """Konvertieren: detector dicts → censor tuples (x,y,half_w,half_h)"""
-    return [(box['x'], box['y'], box['w']//2, box['h']//2) for box in boxes]
-
-def group_eyes_into_pairs(eye_boxes: List[Tuple[int, int, int, int]]) -> List[List[Tuple[int, int, int, int]]]:
-    """Augenpaare gruppieren für Balkne-Zensur"""
-    if len(eye_boxes) % 2 != 0:
-        print(f"Warning: {len(eye_boxes)} eyes (odd number) - ignoring last eye")
-        eye_boxes = eye_boxes[:-1]
-
-    pairs = []
-    for i in range(0, len(eye_boxes), 2):
-        left_eye = min(eye_boxes[i:i+2], key=lambda b: b[0])
-        right_eye = max(eye_boxes[i:i+2], key=lambda b: b[0])
-        pairs.append([left_eye, right_eye])
-    return pairs
-
-def auto_select_subject(censor_mode: str) -> str:
-    """Merkmal (Gesicht oder Augen) je nach Zensur-Modus bestimmen"""
-    if censor_mode == "eyeBar":
-        return "eyes"
-    return "face"  # pixel/blur → faces
-
-def process_image(filepath: str, mode: str, censor_mode: str, output_dir: str | None = None):
+def process_image(filepath: str, mode: str, censor_mode: str, output_dir: str | None = None, blur_sigma: float | None = None,
+                  max_side: int | None = None, min_face_size: int | None = None,
+                  tile_size: int | None = None, tile_overlap: int = TILE_OVERLAP, tile_workers: int | None = None,
+                  output_fmt: str | None = None, quality: int | None = None, png_compress_level: int | None = None,
+                  keyframe_interval: int = KEYFRAME_INTERVAL, scene_threshold: float = SCENE_CHANGE_THRESHOLD,
+                  profile: str = DEFAULT_PROFILE, max_frame_mb: float = MAX_BUFFERED_MB):
     #Merkmal automatisch wählen
     subject = auto_select_subject(censor_mode)
     #print(f"Auto-selected subject: {subject} for mode: {censor_mode}")
 
-    image = Image.open(filepath).convert("RGB")
-    np_img = piltonp(image)
+    image = Image.open(filepath)
+    source_format = image.format
+    if is_multiframe(image):
+        return process_frames(image, filepath, mode, censor_mode, subject, output_dir, blur_sigma,
+                              keyframe_interval, scene_threshold, max_side=max_side, min_face_size=min_face_size,
+                              tile_size=tile_size, tile_overlap=tile_overlap, tile_workers=tile_workers,
+                              profile=profile, max_frame_mb=max_frame_mb)
+    full_size = image.size
 
-    detections = detect(np_img, subject)
+    # Erkennung ggf. auf verkleinertem Bild (JPEGs werden dafür gleich verkleinert decodiert),
+    # zensiert wird trotzdem in voller Auflösung
+    detections, scale = detect_image(image, subject, max_side=max_side, min_face_size=min_face_size,
+                                     tile_size=tile_size, tile_overlap=tile_overlap, workers=tile_workers,
+                                     profile=profile)
 
     #detect mode (gibt boxen zurück
     if mode == "detect":
-        print(f"Detected {len(detections)} {subject} in {filepath}:")
+        print(f"Detected {len(detections)} {subject} in {filepath} (scale {scale:.3f}, profile {profile}):")
         for d in detections:
             print(d)
         return
 
     #censor mode (gibt zensierte Bilder zurück)
     if mode == "censor":
-        if censor_mode == "eyeBar":
-            eye_tuples = dicts_to_censor_tuples(detections)
-            eye_pairs = group_eyes_into_pairs(eye_tuples)
-            censored = censor(np_img, eye_pairs, censor_mode)
-        else:
-            censor_boxes = dicts_to_censor_tuples(detections)
-            censored = censor(np_img, censor_boxes, censor_mode)
+        censor_boxes = censor_boxes_for_mode(detections, censor_mode)     # bei eyeBar: Augenpaare
+        if image.size != full_size:                                       # verkleinert decodiert: neu öffnen
+            image = Image.open(filepath)
+        np_img = piltonp(image)
+        censored = censor(np_img, censor_boxes, censor_mode, blur_sigma=blur_sigma, inplace=True)
 
         out_image = nptopil(censored)
+        outdir = output_dir or os.path.dirname(filepath) or "."
+        os.makedirs(outdir, exist_ok=True)
+        # Standardmäßig im Format des Eingabebildes speichern, sonst Dateiendung an das gewählte Format anpassen
+        fmt = output_format(output_fmt, source_format)
+        name, ext = os.path.splitext(os.path.basename(filepath))
+        if output_format("original", source_format) != fmt:
+            ext = OUTPUT_FORMATS[fmt][2]
+        outpath = os.path.join(outdir, f"censored_{censor_mode}_{name}{ext}")
+        body, info = encode_image(out_image, fmt, quality=quality, png_compress_level=png_compress_level)
+        with open(outpath, "wb") as f:
+            f.write(body)
+        print(f"Censored image saved: {outpath} ({info['output_bytes']} bytes, encoded in {info['encode_ms']} ms)")
+
+def process_frames(image: Image.Image, filepath: str, mode: str, censor_mode: str, subject: str, output_dir: str | None,
+                   blur_sigma: float | None, keyframe_interval: int, scene_threshold: float,
+                   max_side: int | None = None, min_face_size: int | None = None,
+                   tile_size: int | None = None, tile_overlap: int = TILE_OVERLAP, tile_workers: int | None = None,
+                   profile: str = DEFAULT_PROFILE, max_frame_mb: float = MAX_BUFFERED_MB):
+    """Animiertes GIF/ APNG/ WebP oder mehrseitiges TIFF Frame für Frame, Erkennung nur auf Keyframes.
+    Gespeichert wird immer im Format der Eingabe. APNG/ TIFF/ WebP sammeln dabei alle Frames im Speicher,
+    mehr als max_frame_mb wird vorab abgelehnt (GIF wird gestreamt, ohne Limit)."""
+    def detect_frame(np_img):
+        scale = detection_scale(np_img.shape, max_side, min_face_size, profile)
+        return detect(np_img, subject, scale=scale, tile_size=tile_size, tile_overlap=tile_overlap, workers=tile_workers,
+                      profile=profile)
+
+    tracked = track_detections(iter_frames(image), detect_frame, keyframe_interval, scene_threshold)
+    stats = {"frames": 0, "keyframes": 0}
+
+    #detect mode: Boxen pro Frame ausgeben
+    if mode == "detect":
+        for index, (_, _, detections, is_key) in enumerate(tracked):
+            stats["frames"] += 1
+            stats["keyframes"] += is_key
+            print(f"Frame {index}{' (keyframe)' if is_key else ''}: {len(detections)} {subject}")
+            for d in detections:
+                print(d)
+        print(f"{filepath}: {stats['frames']} frames, detection on {stats['keyframes']} keyframes (profile {profile})")
+        return
+
+    #censor mode: zensierte Frames direkt an den Writer weiterreichen
+    if mode == "censor":
+        max_bytes = int(max_frame_mb * 2 ** 20)
+        check_buffered(image, max_bytes)                # lieber sofort abbrechen als nach allen Frames
+        def censored_frames():
+            for np_img, info, detections, is_key in tracked:
+                stats["frames"] += 1
+                stats["keyframes"] += is_key
+                censored = censor(np_img, censor_boxes_for_mode(detections, censor_mode), censor_mode,
+                                  blur_sigma=blur_sigma, inplace=True)
+                yield nptopil(censored), info
+
         outdir = output_dir or os.path.dirname(filepath) or "."
         os.makedirs(outdir, exist_ok=True)
         outpath = os.path.join(outdir, f"censored_{censor_mode}_{os.path.basename(filepath)}")
-        out_image.save(outpath)
-        print(f"Censored image saved: {outpath}")
+        save_frames(censored_frames(), outpath, image.format, max_bytes)
+        print(f"Censored animation saved: {outpath} ({stats['frames']} frames, "
+              f"detection on {stats['keyframes']} keyframes)")
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".tif", ".tiff")
+
+def collect_images(input_path: str, recursive: bool = False) -> List[str]:
+    """Alle Bilddateien in einem Ordner (optional inkl. Unterordnern), sortiert"""
+    if not recursive:
+        return sorted(os.path.join(input_path, fn) for fn in os.listdir(input_path)
+                      if fn.lower().endswith(IMAGE_EXTENSIONS))
+    files = []
+    for root, _, filenames in os.walk(input_path):
+        files.extend(os.path.join(root, fn) for fn in filenames if fn.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(files)
+
+def output_dir_for(filepath: str, input_root: str, output_dir: str | None) -> str | None:
+    """Beim rekursiven Verarbeiten bleibt die Ordnerstruktur im Ausgabeordner erhalten"""
+    if output_dir is None:
+        return None
+    relative = os.path.relpath(os.path.dirname(filepath), input_root)
+    return os.path.normpath(os.path.join(output_dir, relative))
+
+def _init_worker(cache_path: str | None = None):
+    """Jeder Worker lädt die Modelle einmal beim Start, nicht beim ersten Bild"""
+    if cache_path:
+        detection_cache.open(cache_path)
+    warm_up()
 
-def main():
+def _process_safe(filepath: str, options: Dict) -> Tuple[str | None, int, int]:
+    """process_image ausführen, Fehler als Text zurückgeben statt den ganzen Lauf abzubrechen.
+    Zusätzlich Cache-Treffer/-Fehlschläge dieses Bildes, damit sie auch aus Worker-Prozessen gezählt werden."""
+    hits, misses = detection_cache.hits, detection_cache.misses
+    try:
+        process_image(filepath, **options)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return error, detection_cache.hits - hits, detection_cache.misses - misses
+
+def _report_progress(done: int, total: int, filepath: str, started: float):
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"[{done}/{total}] {filepath} ({rate:.2f} images/s)")
+
+def run_batch(files: List[str], input_root: str, options: Dict, jobs: int = 1, cache_path: str | None = None) -> Dict[str, str]:
+    """
+    Verarbeitet viele Bilder, bei jobs > 1 verteilt auf einen Prozess-Pool.
+    Es sind höchstens 2 * jobs Bilder gleichzeitig unterwegs, damit der Speicher begrenzt bleibt.
+
+    Returns:
+        Dict {Dateipfad: Fehlermeldung} aller fehlgeschlagenen Bilder
+    """
+    errors: Dict[str, str] = {}
+    total = len(files)
+    cache_hits = cache_misses = 0
+    started = time.perf_counter()
+
+    def file_options(filepath):
+        return {**options, "output_dir": output_dir_for(filepath, input_root, options.get("output_dir"))}
+
+    if jobs <= 1:
+        for done, filepath in enumerate(files, start=1):
+            error, hits, misses = _process_safe(filepath, file_options(filepath))
+            cache_hits, cache_misses = cache_hits + hits, cache_misses + misses
+            if error:
+                errors[filepath] = error
+            _report_progress(done, total, filepath, started)
+    else:
+        # Im Pool keine zusätzlichen Kachel-Prozesse starten, die Kerne sind schon durch die Bilder ausgelastet
+        options = {**options, "tile_workers": 1}
+        pending = {}
+        remaining = iter(files)
+        done = 0
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(cache_path,)) as pool:
+            while True:
+                # Nachschieben, bis das Limit an gleichzeitig bearbeiteten Bildern erreicht ist
+                for filepath in remaining:
+                    pending[pool.submit(_process_safe, filepath, file_options(filepath))] = filepath
+                    if len(pending) >= 2 * jobs:
+                        break
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    filepath = pending.pop(future)
+                    error, hits, misses = future.result()
+                    cache_hits, cache_misses = cache_hits + hits, cache_misses + misses
+                    if error:
+                        errors[filepath] = error
+                    done += 1
+                    _report_progress(done, total, filepath, started)
+
+    elapsed = time.perf_counter() - started
+    print(f"Processed {total} images in {elapsed:.1f}s ({total / elapsed if elapsed > 0 else 0.0:.2f} images/s), "
+          f"{len(errors)} failed")
+    print(f"Detection cache: {cache_hits} hits, {cache_misses} misses")
+    for filepath, error in errors.items():
+        print(f"  FAILED {filepath}: {error}")
+    return errors
+
+def positive_int(value: str) -> int:
+    """argparse-Typ: ganze Zahl > 0, wie optional_positive_int in api/routes.py"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"must be a whole number, got {value!r}")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {number}")
+    return number
+
+def quality(value: str) -> int:
+    """argparse-Typ für --quality: 1-100, wie parse_encode_options in api/routes.py"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"must be a whole number, got {value!r}")
+    if not 1 <= number <= 100:
+        raise argparse.ArgumentTypeError(f"must be between 1 and 100, got {number}")
+    return number
+
+def main() -> int:
     #parser für Befehl-Aufbau
     parser = argparse.ArgumentParser(description="Smart Face/Eye detection & censor CLI")
     parser.add_argument("input", help="Image file or folder")
     parser.add_argument("--mode", choices=["detect", "censor"], default="detect")
     parser.add_argument("--censor", choices=["pixel", "blur", "eyeBar"], default="pixel")
     parser.add_argument("--output", help="Output directory")
+    parser.add_argument("--blur-sigma", type=float, default=None, help="Blur strength in pixels (default: relative to box size)")
+    parser.add_argument("--max-side", type=positive_int, default=None, help="Downscale images to this longest side before detection")
+    parser.add_argument("--min-face-size", type=positive_int, default=None, help="Smallest face (in pixels) to detect; downscales detection accordingly")
+    parser.add_argument("--profile", choices=list(PROFILES), default=DEFAULT_PROFILE,
+                        help="Detection speed/accuracy tradeoff: fast (HOG, no upsampling, 5-point landmarks), "
+                             "balanced (HOG, upsample 1) or thorough (CNN, slow on CPU)")
+    parser.add_argument("--tile-size", type=int, default=None, help="Detect very large images in overlapping tiles of this size (in parallel)")
+    parser.add_argument("--tile-overlap", type=int, default=TILE_OVERLAP, help="Overlap between tiles in pixels")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Number of worker processes for folders")
+    parser.add_argument("--recursive", "-r", action="store_true", help="Also process images in subfolders")
+    parser.add_argument("--cache", help="SQLite file to keep detection results between runs")
+    parser.add_argument("--format", choices=["original", *OUTPUT_FORMATS], default="original",
+                        help="Output format of censored images (default: same as input)")
+    parser.add_argument("--quality", type=quality, default=None, help="JPEG/WebP quality 1-100 (default: 90)")
+    parser.add_argument("--keyframe-interval", type=int, default=KEYFRAME_INTERVAL,
+                        help="Animations/ multi-page images: run detection every N frames (and on scene changes)")
+    parser.add_argument("--scene-threshold", type=float, default=SCENE_CHANGE_THRESHOLD,
+                        help="Mean gray-level difference (0-255) that counts as a scene change")
+    parser.add_argument("--max-frame-mb", type=float, default=MAX_BUFFERED_MB,
+                        help="APNG/ TIFF/ WebP output keeps all censored frames in memory; refuse above this (MB)")
+    parser.add_argument("--png-level", type=int, choices=range(10), default=None, metavar="0-9",
+                        help="PNG compression level, 1 is much faster than the default 6")
 
     args = parser.parse_args()
+    if args.blur_sigma is not None and not args.blur_sigma > 0:
+        parser.error("--blur-sigma must be positive")
+    try:
+        check_tiling(args.tile_size, args.tile_overlap)
+    except ValueError as e:
+        parser.error(str(e).replace("tile_size", "--tile-size").replace("tile_overlap", "--tile-overlap"))
+
+    options = {
+        "mode": args.mode,
+        "censor_mode": args.censor,
+        "output_dir": args.output,
+        "blur_sigma": args.blur_sigma,
+        "max_side": args.max_side,
+        "min_face_size": args.min_face_size,
+        "profile": args.profile,
+        "tile_size": args.tile_size,
+        "tile_overlap": args.tile_overlap,
+        "output_fmt": args.format,
+        "quality": args.quality,
+        "png_compress_level": args.png_level,
+        "keyframe_interval": max(1, args.keyframe_interval),
+        "scene_threshold": args.scene_threshold,
+        "max_frame_mb": args.max_frame_mb,
+    }
+
+    if args.cache:
+        detection_cache.open(args.cache)
 
     input_path = args.input
     if os.path.isdir(input_path):
-        for fn in os.listdir(input_path):
-            if fn.lower().endswith((".png", ".jpg", ".jpeg", ".webp")):
-                process_image(os.path.join(input_path, fn), args.mode, args.censor, args.output)
-    else:
-        process_image(input_path, args.mode, args.censor, args.output)
+        files = collect_images(input_path, args.recursive)
+        errors = run_batch(files, input_path, options, jobs=max(1, args.jobs), cache_path=args.cache)
+        return 1 if errors else 0
+
+    try:
+        process_image(input_path, **options)
+    except FrameBufferError as e:                       # Limit aus --max-frame-mb, kein Programmfehler
+        print(f"FAILED {input_path}: {e}")
+        return 1
+    return 0
 
 if __name__ == "__main__":
-    main()
+    multiprocessing.freeze_support()
+    raise SystemExit(main())
@@ -0,0 +1,38 @@
+# Umwandlung der Erkennungs-Boxen (detector-Format) in das Format, das censor() erwartet.
+# Früher nur in der CLI, weil das Frontend das selbst macht; wird jetzt auch vom /api/v1/anonymize-Endpoint gebraucht.
+import logging
+from typing import List, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+#Umformatierung vom Dict zu Tuplen (das Frontend macht das selbst, CLI und anonymize-Endpoint nutzen diese Methode)
+def dicts_to_censor_tuples(boxes: List[Dict]) -> List[Tuple[int, int, int, int]]:
+    """Konvertieren: detector dicts → censor tuples (x,y,half_w,half_h)"""
+    return [(box['x'], box['y'], box['w']//2, box['h']//2) for box in boxes]
+
+def group_eyes_into_pairs(eye_boxes: List[Tuple[int, int, int, int]]) -> List[List[Tuple[int, int, int, int]]]:
+    """Augenpaare gruppieren für Balkne-Zensur"""
+    if len(eye_boxes) % 2 != 0:
+        logger.warning(f"{len(eye_boxes)} eyes (odd number) - ignoring last eye")
+        eye_boxes = eye_boxes[:-1]
+
+    pairs = []
+    for i in range(0, len(eye_boxes), 2):
+        left_eye = min(eye_boxes[i:i+2], key=lambda b: b[0])
+        right_eye = max(eye_boxes[i:i+2], key=lambda b: b[0])
+        pairs.append([left_eye, right_eye])
+    return pairs
+
+def auto_select_subject(censor_mode: str) -> str:
+    """Merkmal (Gesicht oder Augen) je nach Zensur-Modus bestimmen"""
+    if censor_mode == "eyeBar":
+        return "eyes"
+    return "face"  # pixel/blur → faces
+
+def censor_boxes_for_mode(detections: List[Dict], censor_mode: str) -> list:
+    """Erkennungs-Boxen in die Eingabe von censor() umwandeln: Tupel pro Box, bei eyeBar Augenpaare"""
+    censor_tuples = dicts_to_censor_tuples(detections)
+    if censor_mode == "eyeBar":
+        return group_eyes_into_pairs(censor_tuples)
+    return censor_tuples
@@ -0,0 +1,103 @@
+# Cache für Erkennungsergebnisse, damit das gleiche Bild nicht mehrfach durch den HOG-Detektor muss
+# (z.B. wenn im Frontend zwischen Gesicht und Augen gewechselt wird oder die CLI denselben Ordner erneut verarbeitet).
+# Gespeichert werden die rohen face_locations und Landmarks, daraus lassen sich Gesichter UND Augen ohne neue Erkennung berechnen.
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class DetectionCache:
+    """
+    Zweistufiger Cache: LRU im Speicher (begrenzte Anzahl Einträge) und optional eine SQLite-Datei,
+    die einen Neustart überlebt. Schlüssel ist ein Hash der Pixel plus der Erkennungs-Parameter.
+    """
+
+    def __init__(self, max_entries: int = 256, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            self.open(path)
+
+    def open(self, path: str):
+        """SQLite-Datei als zweite Stufe verwenden (wird bei Bedarf angelegt)"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+            # check_same_thread=False: Zugriff aus mehreren Flask-Threads, abgesichert über self._lock
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS detections (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.commit()
+
+    @staticmethod
+    def key(np_img: np.ndarray, **params) -> str:
+        """Hash über die dekodierten Pixel (inkl. Form und Datentyp) und alle Parameter, die das Ergebnis beeinflussen"""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(repr((np_img.shape, np_img.dtype.str, sorted(params.items()))).encode())
+        digest.update(memoryview(np.ascontiguousarray(np_img)).cast("B"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM detections WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = json.loads(row[0])
+                    self._remember(key, entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    def put(self, key: str, entry: Dict):
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO detections (key, value) VALUES (?, ?)", (key, json.dumps(entry)))
+                self._db.commit()
+
+    def _remember(self, key: str, entry: Dict):
+        """In die Speicher-Stufe eintragen, ältesten Eintrag verdrängen wenn voll"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM detections")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "persistent": self._db is not None,
+            }
+
+
+# Standard-Cache des Prozesses, wird von engine.detector benutzt
+detection_cache = DetectionCache()
@@ -4,172 +4,444 @@ from PIL import Image
 import io
 import numpy as np
 import math
+import numbers
 
-def rotated_rect_points(cx, cy, width, height, angle):
-                c = math.cos(angle)
-                s = math.sin(angle)
+from engine.regions import RegionSet
+from engine.timing import timed
 
-                rect = []
+def rotated_rect_mask(cx, cy, width, height, angle, shape):
+    """Maske eines gedrehten Rechtecks, nur über dessen Bounding-Box und auf das Bild zugeschnitten.
 
-                hw = width / 2
-                hh = height / 2
+    Für jedes Pixel der Bounding-Box wird geprüft, ob es (in das Koordinatensystem des Rechtecks
+    zurückgedreht) innerhalb der halben Breite/Höhe liegt. Dadurch entstehen keine Löcher wie beim
+    Runden einzelner gedrehter Punkte.
 
-                for iy in range(int(-hh), int(hh) + 1):
-                    for ix in range(int(-hw), int(hw) + 1):
+    Returns:
+        (slice_y, slice_x, mask) oder None, wenn das Rechteck komplett außerhalb des Bildes liegt
+    """
+    c = math.cos(angle)
+    s = math.sin(angle)
+
+    # halbe Kantenlängen, um ein halbes Pixel erweitert, damit Randpixel mit Mittelpunkt auf der Kante dazu gehören
+    hw = width / 2 + 0.5
+    hh = height / 2 + 0.5
+
+    # Bounding-Box des gedrehten Rechtecks, auf das Bild zugeschnitten
+    extent_x = abs(c) * hw + abs(s) * hh
+    extent_y = abs(s) * hw + abs(c) * hh
+    x0 = max(0, math.floor(cx - extent_x))
+    x1 = min(shape[1], math.ceil(cx + extent_x) + 1)
+    y0 = max(0, math.floor(cy - extent_y))
+    y1 = min(shape[0], math.ceil(cy + extent_y) + 1)
+    if x0 >= x1 or y0 >= y1:
+        return None
+
+    # Koordinatengitter relativ zum Mittelpunkt, dann in das gedrehte System des Rechtecks projizieren
+    dx = np.arange(x0, x1, dtype=np.float64)[np.newaxis, :] - cx
+    dy = np.arange(y0, y1, dtype=np.float64)[:, np.newaxis] - cy
+    u = dx * c + dy * s      # entlang der Breite
+    v = dy * c - dx * s      # entlang der Höhe
+    mask = (np.abs(u) <= hw) & (np.abs(v) <= hh)
+
+    return slice(y0, y1), slice(x0, x1), mask
+
+
+# Kleinste Blockgröße beim Verpixeln: bei 1-Pixel-Blöcken wäre der Mittelwert der Pixel selbst, kleine (ferne)
+# Gesichter blieben also unverändert und erkennbar
+MIN_BLOCK_PIX = 2
+
+
+def _block_size(extent, num_pixelation):
+    """Blockgröße für eine Box-Seite: num_pixelation Blöcke, aber mindestens MIN_BLOCK_PIX Pixel"""
+    return max(MIN_BLOCK_PIX, extent // num_pixelation)
+
+
+def _block_edges(start, stop, block, limit):
+    """Start- und Endkoordinaten der Blöcke entlang einer Achse, auf das Bild (0..limit) zugeschnitten.
+
+    Wie bisher beginnt das Raster bei 'start' und der letzte Block darf über 'stop' hinausragen.
+    Blöcke, die komplett außerhalb des Bildes liegen, werden verworfen.
+    """
+    starts = np.arange(start, stop, block)
+    ends = np.clip(starts + block, 0, limit)
+    starts = np.clip(starts, 0, limit)
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+
+def _grid_extent(start, stop, block, limit):
+    """Erster Start und letztes Ende der Blöcke aus _block_edges, oder None, wenn kein Block im Bild liegt"""
+    if stop <= start:
+        return None
+    count = math.ceil((stop - start) / block)
+    first, last = max(0, start), min(limit, start + count * block)
+    if first >= last:
+        return None
+    return int(first), int(last)
+
+
+def _pixelate_region(image: np.ndarray, region, boxes, num_pixelation_x, num_pixelation_y) -> np.ndarray:
+    """Verpixelt eine Region vektorisiert: ein gemeinsames Raster für alle Boxen der Region, alle Block-Mittelwerte
+    in einem Durchlauf.
+
+    Das Raster beginnt an der linkesten/ obersten Box-Kante, die Blockgröße ist die der größten Box (gröberes Raster
+    = sicherer). Die Blöcke liegen lückenlos nebeneinander, daher reicht np.add.reduceat über die Block-Startindizes
+    (erst Zeilen, dann Spalten) um die Summen aller Blöcke zu bekommen. Bei einer einzelnen Box ist das genau die
+    Verpixelung der Box: der letzte Block darf über die Box hinausragen, Boxen über den Bildrand werden abgeschnitten,
+    Boxen kleiner als das Raster bekommen Blöcke von MIN_BLOCK_PIX Pixeln.
+
+    Returns:
+        verpixelte Pixel für das Rechteck der Region
+    """
+    height, width = image.shape[:2]
+    anchor_x = anchor_y = math.inf
+    width_block_pix = height_block_pix = MIN_BLOCK_PIX
+    for index in region.indices:
+        box = boxes[index]
+        box_left, box_right = box[0] - box[2], box[0] + box[2]
+        box_up, box_down = box[1] - box[3], box[1] + box[3]
+        anchor_x, anchor_y = min(anchor_x, box_left), min(anchor_y, box_up)
+        # Größe der "Pixel-Blöcke" berechnen (mindestens MIN_BLOCK_PIX, siehe dort)
+        width_block_pix = max(width_block_pix, _block_size(box_right - box_left, num_pixelation_x))
+        height_block_pix = max(height_block_pix, _block_size(box_down - box_up, num_pixelation_y))
+
+    left, up, right, down = region.rect
+    y_starts, y_ends = _block_edges(anchor_y, down, height_block_pix, height)
+    x_starts, x_ends = _block_edges(anchor_x, right, width_block_pix, width)
+    top, bottom = y_starts[0], y_ends[-1]
+    grid_left, grid_right = x_starts[0], x_ends[-1]
+    pixels = image[top:bottom, grid_left:grid_right]
+
+    # Summen pro Block (int64, damit nichts überläuft) und Anzahl Pixel pro Block (Randblöcke sind kleiner)
+    sums = np.add.reduceat(pixels, y_starts - top, axis=0, dtype=np.int64)
+    sums = np.add.reduceat(sums, x_starts - grid_left, axis=1, dtype=np.int64)
+    block_heights = y_ends - y_starts
+    block_widths = x_ends - x_starts
+    counts = np.outer(block_heights, block_widths).reshape(sums.shape[:2] + (1,) * (sums.ndim - 2))
+
+    # Mittelwert wie block.mean(): exakte Ganzzahl-Summe / Anzahl, dann abschneiden auf uint8
+    mean_colors = (sums / counts).astype(np.uint8)
+
+    # Mittelwerte per Broadcasting auf die Blöcke verteilen, davon nur das Rechteck der Region
+    pixelated = np.repeat(np.repeat(mean_colors, block_heights, axis=0), block_widths, axis=1)
+    return pixelated[up - top:down - top, left - grid_left:right - grid_left]
+
+
+def _box_sizes_for_gauss(sigma, n = 3):
+    """Breiten von n Box-Filtern, die hintereinander angewendet einen Gauß-Filter mit 'sigma' annähern"""
+    w_ideal = math.sqrt(12 * sigma * sigma / n + 1)
+    w_low = int(math.floor(w_ideal))
+    if w_low % 2 == 0:
+        w_low -= 1
+    w_up = w_low + 2
+    m = round((12 * sigma * sigma - n * w_low * w_low - 4 * n * w_low - 3 * n) / (-4 * w_low - 4))
+    return [w_low if i < m else w_up for i in range(n)]
+
+
+def _box_sums(sums: np.ndarray, widths, axis: int) -> np.ndarray:
+    """Box-Filter der Breiten 'widths' nacheinander entlang einer Achse, jeweils über eine kumulierte Summe des
+    ganzen Blocks (np.cumsum) -> Aufwand unabhängig von der Breite.
+
+    Gerechnet wird ganzzahlig ohne Normierung: jede Stufe liefert Fenstersummen, der Block wird pro Breite um
+    width - 1 Werte kürzer (der Rand muss also vorher angefügt sein). Ein Überlauf der int32-Präfixsummen ist
+    harmlos, weil die Differenz zweier Präfixsummen modulo 2^32 trotzdem die exakte Fenstersumme ergibt.
+    """
+    def along(start, stop = None):
+        return tuple(slice(start, stop) if dim == axis else slice(None) for dim in range(sums.ndim))
+
+    for width in widths:
+        np.cumsum(sums, axis=axis, out=sums)
+        window = sums[along(width - 1)].copy()
+        window[along(1)] -= sums[along(0, -width)]     # Fenster i: csum[i + w - 1] - csum[i - 1]
+        sums = window
+    return sums
+
+
+def gaussian_blur(region: np.ndarray, sigma: float) -> np.ndarray:
+    """Gauß-Weichzeichner ohne scipy: drei Box-Filter pro Achse (separierbar) über kumulierte Summen.
+
+    Bei großem sigma wird vorher per Blockmittelwert verkleinert (Faktor ~sigma/2) und danach bilinear
+    wieder vergrößert. Das Ergebnis ist optisch gleich, der Aufwand bleibt aber linear in der Pixelzahl
+    und unabhängig vom Radius. Am Bildrand wird der letzte Pixelwert wiederholt (wie mode='nearest' bei scipy).
+    """
+    if not math.isfinite(sigma) or sigma <= 0:
+        raise ValueError(f"blur sigma must be positive, got {sigma}")
+    factor = max(1, int(sigma // 2))
+    work = region
+    if factor > 1:
+        work = np.asarray(Image.fromarray(np.ascontiguousarray(region)).reduce(factor))
+        sigma = sigma / factor
+
+    # Rand einmal für alle Durchläufe anfügen, dann ganzzahlige Fenstersummen erst über die Zeilen, dann über die Spalten
+    widths = _box_sizes_for_gauss(sigma)
+    reach = sum(width - 1 for width in widths) // 2
+    pad = [(reach, reach), (reach, reach)] + [(0, 0)] * (work.ndim - 2)
+    sums = np.pad(work, pad, mode="edge").astype(np.int32)
+    sums = _box_sums(_box_sums(sums, widths, 0), widths, 1)
+    norm = math.prod(widths) ** 2                  # Summe über höchstens 255 * norm, passt für sigma < 4 sicher in int32
+    sums += norm // 2
+    sums //= norm
+    blurred = sums.astype(np.uint8)
+
+    if factor > 1:
+        height, width = region.shape[:2]
+        blurred = np.asarray(Image.fromarray(blurred).resize((width, height), Image.BILINEAR))
+    return blurred
+
+
+def _default_blur_sigma(box) -> float:
+    """Standard-Stärke abhängig von der Boxgröße, damit große Gesichter genauso unkenntlich werden wie kleine"""
+    return max(2.0, max(2 * box[2], 2 * box[3]) / 10)
+
+
+def _blur_region(image: np.ndarray, region, boxes, blur_sigma = None) -> np.ndarray:
+    """Zeichnet eine Region weich. Gelesen wird das Rechteck der Region plus Rand (3 sigma), damit auch die Kanten
+    korrekt weichgezeichnet werden; zurückgegeben wird nur das Rechteck selbst. Ohne blur_sigma gilt die Stärke der
+    größten Box der Region."""
+    height, width = image.shape[:2]
+    if blur_sigma is None:
+        blur_sigma = max(_default_blur_sigma(boxes[index]) for index in region.indices)
+    elif not isinstance(blur_sigma, numbers.Real) or not math.isfinite(blur_sigma) or blur_sigma <= 0:
+        raise ValueError(f"blur_sigma must be a positive number, got {blur_sigma!r}")
+
+    # Bereich inkl. Rand ausschneiden und weichzeichnen
+    left, up, right, down = region.rect
+    margin = int(math.ceil(3 * blur_sigma))
+    pad_left, pad_up = max(0, left - margin), max(0, up - margin)
+    pad_right, pad_down = min(width, right + margin), min(height, down + margin)
+    blurred = gaussian_blur(image[pad_up:pad_down, pad_left:pad_right], blur_sigma)
+    return blurred[up - pad_up:down - pad_up, left - pad_left:right - pad_left]
+
+
+def _eye_bar(eyePair):
+    """Mittelpunkt, Breite, Höhe und Winkel des Augenbalkens für ein Augenpaar
+
+    eyePair ist nicht wie bei der Verpixelung eine box, sondern eine Liste aus zwei boxen (zwei Augen). Die erste Box ist das linkere Auge.
+    """
+    # Liste von allen Ecken des linken und rechten Auges, beginnend in der oberen linken Ecke, im Uhrzeigersinn
+    lWidth, lHeight = eyePair[0][2:]
+
+    rWidth, rHeight = eyePair[1][2:]
+
+    lCorners =  [(eyePair[0][0]-lWidth,  eyePair[0][1]-lHeight), (eyePair[0][0] + lWidth, eyePair[0][1] - lHeight), (eyePair[0][0] + lWidth, eyePair[0][1] + lHeight), (eyePair[0][0]-lWidth, eyePair[0][1] + lHeight)]
+    rCorners = [(eyePair[1][0]-rWidth,  eyePair[1][1]-rHeight), (eyePair[1][0] + rWidth, eyePair[1][1]-rHeight), (eyePair[1][0] + rWidth, eyePair[1][1]+ rHeight), (eyePair[1][0]-rWidth, eyePair[1][1] + rHeight)]
+    # 1. von welchen Ecken aus muss die Bar gezogen werden? (entweder linksoben bis rechtsunten oder linksunten bis rechtsoben)
+    if eyePair[0][1] <= eyePair[1][1]: #right eye lower
+        lCorner = (lCorners[0]) #linkester, höchster Punkt
+        adjacentlCorners = [lCorners[1], lCorners[3]] #die Ecken, die an die "extremste" Ecke (lCorner) angrenzen. Erste Ecke ist die obere, zweite die niedrigere
+        rCorner = (rCorners[2]) #rechtester, niedrigster Punkt
+        adjacentrCorners = [rCorners[1], rCorners[3]]
+    else: #right eye higher
+        lCorner = (lCorners[3]) #linkester, niedrigster Punkt
+        adjacentlCorners = [lCorners[0], lCorners[2]] 
+        rCorner = (rCorners[1]) #rechtester, höchster Punkt
+        adjacentrCorners = [rCorners[0], rCorners[2]]
+    
+    # 2. Winkel und mittelpunkt berechnen
+
+    lCornCenter = ((adjacentlCorners[0][0] + adjacentlCorners[1][0])/2, (adjacentlCorners[0][1] + adjacentlCorners[1][1])/2)
+    rCornCenter = ((adjacentrCorners[0][0] + adjacentrCorners[1][0])/2, (adjacentrCorners[0][1] + adjacentrCorners[1][1])/2)
+    
+    rectCenter = ((rCornCenter[0] + lCornCenter[0])/2, (rCornCenter[1] + lCornCenter[1])/2)
+
+    rectAngle = math.atan2(rCornCenter[1] - lCornCenter[1], rCornCenter[0] - lCornCenter[0]) # in rad
+
+    # 3. Breite (zwischen beiden Augen) des Rechtecks bestimmen: der Abstand, zwischen einem punkt, der zwar die gleiche Höhe hat wie die lcorner, aber eine kleinere
 
-                        x = ix * c - iy * s + cx
-                        y = ix * s + iy * c + cy
+    rCentCornAngle = math.atan2(abs(rCorner[1]-rectCenter[1]), abs(rCorner[0] - rectCenter[0]))
+    rCentCornDist = math.sqrt((rCorner[0]-rectCenter[0])**2+(rCorner[1]-rectCenter[1])**2)
+    rDiagonalWidth = rCentCornDist/math.cos(abs(rCentCornAngle)-abs(rectAngle))
 
-                        rect.append((round(x)-1, round(y)))
-                        rect.append((round(x), round(y)))
-                        rect.append((round(x)+1, round(y)))
-                return rect
-            
+    lCentCornAngle = math.atan2(abs(lCorner[1]-rectCenter[1]), abs(lCorner[0] - rectCenter[0]))
+    lCentCornDist = math.sqrt((lCorner[0]-rectCenter[0])**2+(lCorner[1]-rectCenter[1])**2)
+    lDiagonalWidth = lCentCornDist/math.cos(abs(lCentCornAngle) - abs(rectAngle))
 
+    width = max(rDiagonalWidth,lDiagonalWidth)*2 # damit beide rects immer abgedeckt sind
 
-def censor(image: np.ndarray, boxes: list, mode = 'pixel', num_pixelation_x = 7, num_pixelation_y = 7) -> np.ndarray:
+    # 4. Höhe berechnen: max aus distance zwischen corner centers
+    height = 0
+    
+    for i in range(len(adjacentrCorners)): # immer 2 mal
+        newHeight = math.sqrt((rCornCenter[0]-adjacentrCorners[i][0])**2 + (rCornCenter[1]-adjacentrCorners[i][1])**2)
+        height = max(newHeight, height) 
+
+    for i in range(len(adjacentlCorners)): # immer 2 mal
+        newHeight = math.sqrt((lCornCenter[0]-adjacentlCorners[i][0])**2 + (lCornCenter[1]-adjacentlCorners[i][1])**2)
+        height = max(newHeight, height) 
+
+    height = height*2 # weil die rectangle funktion die height selbst halbiert
+
+    #Größe der Balken hiermit noch mal anpassen
+    width *= 1.8
+    height *= 1.5
+
+    return rectCenter, width, height, rectAngle
+
+
+@timed("censor")
+def censor(image: np.ndarray, boxes: list, mode = 'pixel', num_pixelation_x = 7, num_pixelation_y = 7, blur_sigma: float | None = None,
+           inplace: bool = False) -> np.ndarray:
     """returns censored image given to the function according to the given boxes
 
+    Überlappende Boxen werden vorher zu Regionen zusammengefasst (engine/regions.py) und jede Region in einem
+    Durchgang zensiert: ein gemeinsames Pixel-Raster, ein Weichzeichner bzw. eine Maske für alle Augenbalken.
+    Jeder Pixel wird so nur einmal bearbeitet, und das Ergebnis hängt nicht von der Reihenfolge der Boxen ab.
+    Eine einzelne Box ohne Überlappung wird genauso zensiert wie bisher.
+
     Args:
         image (np.ndarray): Bild, dass zensiert werden soll
         boxes (list): Liste der zu zensierenden Boxen
         mode (str, optional): Zensier modus, standardmäßig 'pixel'
         num_pixelation_x (int, optional): Menge an Pixeln auf die runter Zensiert wird (x)
         num_pixelation_y (int, optional): Menge an Pixeln auf die runter Zensiert wird (y)
+        blur_sigma (float, optional): Stärke des Weichzeichners (Standardabweichung in Pixeln), standardmäßig abhängig von der Boxgröße
+        inplace (bool, optional): direkt in 'image' schreiben statt in eine Kopie. Spart die Kopie des ganzen Bildes;
+            berechnet werden trotzdem alle Regionen aus dem unveränderten Bild. Ist 'image' schreibgeschützt
+            (z.B. aus np.asarray eines PIL-Bildes), wird trotzdem kopiert.
+
+    RGB, RGBA und Graustufen werden gleich behandelt, bei RGBA wird der Alphakanal mit verpixelt bzw. weichgezeichnet
+    und der Augenbalken ist deckend schwarz.
 
     Returns:
         np.ndarray: censored image
     """
 
-    output = image.copy()
-    if mode != 'eyeBar':
-        for box in boxes:
-            # Koordinaten der Box so umwandeln, dass sie linke obere und rechte untere ecke angeben können
-            box_left = box[0] - box[2]
-            box_right = box[0] + box[2]
-            box_up = box[1] - box[3]
-            box_down = box[1] + box[3]  
-
-            # Ab hier: Entscheidungsstruktur nach Art der Anonymisierung (eigentlich noch geplant: Gaußian Blur)
-            if mode == 'pixel':
-                # Variable 'Block' bezieht sich auf das, was zu einem Pixel wird. 'Box' bezieht sich auf den ganzen Bereich des erkannten Gesichtes
-            
-                # Größe der "Pixel-Blöcke" berechnen
-                width_block_pix = (box_right - box_left) // num_pixelation_x
-                height_block_pix = (box_down - box_up) // num_pixelation_y
-                #Aufteilen in Blöcke (Erstellen je eines Blockes, fängt bei 0 an, Schrittgröße height/ width_block_pix, macht so viele Schritte bis Rand erreicht)
-                for y in range(box_up, box_down, height_block_pix):
-                    for x in range(box_left, box_right, width_block_pix):
-                        #Block ausschneiden (array slicing)
-                        block = image[y:y+height_block_pix, x:x+width_block_pix]
-
-                        # Mittelwert berechnen (axis=(0,1) bedeutet Mittelwert über Zeilen UND Spalten) => Ergebnis: Vektor der Länge 3 (Je Mittelwert für R-/G-/B-Wert)
-                        mean_color = block.mean(axis=(0, 1)).astype(np.uint8) #Zusatz um Mittelwerte (float) zu Ganzzahlen (0-255) umzuwandeln
-
-                        # Mittelwert allen Pixeln im Block zuweisen => überschreiben aller Pixel im Block
-                        output[y:y+height_block_pix, x:x+width_block_pix] = mean_color
-            elif mode == 'blur': #Aus Zeitmangel konnten wir diesen algorithmus nicht mehr selber implementieren, dahingehend ki-generitert und sehr simpel
-                patch = output[box_up:box_down, box_left:box_right]
-                if patch.size > 0:
-                    # Handle both grayscale (2D) and color (3D) images
-                    if len(patch.shape) == 2:  # grayscale
-                        mean_val = np.mean(patch)
-                        output[box_up:box_down, box_left:box_right] = mean_val
-                    else:  # color (H,W,3)
-                        mean_color = np.mean(patch, axis=(0,1))
-                        output[box_up:box_down, box_left:box_right] = mean_color
-
-            '''
-            Für ein verbesserten gaussian blur:
-            
-            (nicht aktiv implementiert, da build sonst nicht funktioniert)
-            
-            "conda install scipy" im cmd
-            
-            und import oben hinzufügen
-            
-            region = output[box_up:box_down, box_left:box_right].astype(np.float32)  
-            # Apply Gaussian blur to each color channel separately  
-            for c in range(3):  # R, G, B channels  
-                region[:,:,c] = gaussian_filter(region[:,:,c], sigma=10) #häherer sigmaa Wert -> Stärkerer Blur  
-            output[box_up:box_down, box_left:box_right] = region.astype(np.uint8)
-            '''
-
-    else:
-        for eyePair in boxes: # eyePair ist nicht wie bei der Verpixelung eine box, sondern eine Liste aus zwei boxen (zwei Augen). Die erste Box ist das linkere Auge.
-            # Liste von allen Ecken des linken und rechten Auges, beginnend in der oberen linken Ecke, im Uhrzeigersinn
-            lWidth, lHeight = eyePair[0][2:]
-
-            rWidth, rHeight = eyePair[1][2:]
-
-            lCorners =  [(eyePair[0][0]-lWidth,  eyePair[0][1]-lHeight), (eyePair[0][0] + lWidth, eyePair[0][1] - lHeight), (eyePair[0][0] + lWidth, eyePair[0][1] + lHeight), (eyePair[0][0]-lWidth, eyePair[0][1] + lHeight)]
-            rCorners = [(eyePair[1][0]-rWidth,  eyePair[1][1]-rHeight), (eyePair[1][0] + rWidth, eyePair[1][1]-rHeight), (eyePair[1][0] + rWidth, eyePair[1][1]+ rHeight), (eyePair[1][0]-rWidth, eyePair[1][1] + rHeight)]
-            # 1. von welchen Ecken aus muss die Bar gezogen werden? (entweder linksoben bis rechtsunten oder linksunten bis rechtsoben)
-            if eyePair[0][1] <= eyePair[1][1]: #right eye lower
-                lCorner = (lCorners[0]) #linkester, höchster Punkt
-                adjacentlCorners = [lCorners[1], lCorners[3]] #die Ecken, die an die "extremste" Ecke (lCorner) angrenzen. Erste Ecke ist die obere, zweite die niedrigere
-                rCorner = (rCorners[2]) #rechtester, niedrigster Punkt
-                adjacentrCorners = [rCorners[1], rCorners[3]]
-            else: #right eye higher
-                lCorner = (lCorners[3]) #linkester, niedrigster Punkt
-                adjacentlCorners = [lCorners[0], lCorners[2]] 
-                rCorner = (rCorners[1]) #rechtester, höchster Punkt
-                adjacentrCorners = [rCorners[0], rCorners[2]]
-            
-            # 2. Winkel und mittelpunkt berechnen
-
-            lCornCenter = ((adjacentlCorners[0][0] + adjacentlCorners[1][0])/2, (adjacentlCorners[0][1] + adjacentlCorners[1][1])/2)
-            rCornCenter = ((adjacentrCorners[0][0] + adjacentrCorners[1][0])/2, (adjacentrCorners[0][1] + adjacentrCorners[1][1])/2)
-            
-            rectCenter = ((rCornCenter[0] + lCornCenter[0])/2, (rCornCenter[1] + lCornCenter[1])/2)
-
-            rectAngle = math.atan2(rCornCenter[1] - lCornCenter[1], rCornCenter[0] - lCornCenter[0]) # in rad
-
-            # 3. Breite (zwischen beiden Augen) des Rechtecks bestimmen: der Abstand, zwischen einem punkt, der zwar die gleiche Höhe hat wie die lcorner, aber eine kleinere
-
-            rCentCornAngle = math.atan2(abs(rCorner[1]-rectCenter[1]), abs(rCorner[0] - rectCenter[0]))
-            rCentCornDist = math.sqrt((rCorner[0]-rectCenter[0])**2+(rCorner[1]-rectCenter[1])**2)
-            rDiagonalWidth = rCentCornDist/math.cos(abs(rCentCornAngle)-abs(rectAngle))
-
-            lCentCornAngle = math.atan2(abs(lCorner[1]-rectCenter[1]), abs(lCorner[0] - rectCenter[0]))
-            lCentCornDist = math.sqrt((lCorner[0]-rectCenter[0])**2+(lCorner[1]-rectCenter[1])**2)
-            lDiagonalWidth = lCentCornDist/math.cos(abs(lCentCornAngle) - abs(rectAngle))
-
-            width = max(rDiagonalWidth,lDiagonalWidth)*2 # damit beide rects immer abgedeckt sind
-
-            # 4. Höhe berechnen: max aus distance zwischen corner centers
-            height = 0
-            
-            for i in range(len(adjacentrCorners)): # immer 2 mal
-                newHeight = math.sqrt((rCornCenter[0]-adjacentrCorners[i][0])**2 + (rCornCenter[1]-adjacentrCorners[i][1])**2)
-                height = max(newHeight, height) 
-
-            for i in range(len(adjacentlCorners)): # immer 2 mal
-                newHeight = math.sqrt((lCornCenter[0]-adjacentlCorners[i][0])**2 + (lCornCenter[1]-adjacentlCorners[i][1])**2)
-                height = max(newHeight, height) 
-
-            # for i in range(len(adjacentlCorners)): # immer 2 mal
-            #     newHeight = math.sqrt((lCornerAdjusted[0]-adjacentlCorners[i][0])**2 + (lCornerAdjusted[1]-adjacentlCorners[i][1])**2)
-            #     height = max(newHeight, height)
-            
-            height = height*2 # weil die rectangle funktion die height selbst halbiert
-
-            #Größe der Balken hiermit noch mal anpassen
-            width *= 1.8
-            height *= 1.5
-
-            # 5. Rechtecks-koordinaten berechnen
-            rect = rotated_rect_points(rectCenter[0], rectCenter[1], width, height, rectAngle)
-
-            # 6. Bild bearbeiten
-            for x,y in rect:
-                try:
-                    output[y][x] = [0,0,0]
-                except:
-                    print('tried to blacken out of frame pixel')
-
-
-
-    #Frage: wie Bild zurückgeben? Wie handeln, dass nur ein Teil verpixelt werden soll? (Lösung: nicht bei 0 anfangen? Eig. Wäre Funktion, die Anfangswert als Parameter kriegt besser)
-    # wie mehrere Gesichter handeln?     
-    return output.astype(np.uint8)
+    output = image if inplace and image.flags.writeable else image.copy()
+    options = dict(num_pixelation_x=num_pixelation_x, num_pixelation_y=num_pixelation_y, blur_sigma=blur_sigma)
+    rendered = ((region, _render_region(image, region, boxes, mode, **options))
+                for region in region_set(boxes, mode, image.shape, num_pixelation_x, num_pixelation_y))
+    if output is image:
+        rendered = list(rendered)   # erst alles aus dem unveränderten Bild berechnen (Ränder beim Weichzeichnen), dann schreiben
+    for region, patch in rendered:
+        left, up, right, down = region.rect
+        _apply(output[up:down, left:right], region.coverage, patch)
+
+    return output.astype(np.uint8, copy=False)
+
+
+def _bar_color(image: np.ndarray):
+    """Schwarz, bei RGBA mit vollem Alpha (sonst wäre der Balken durchsichtig)"""
+    if image.ndim == 3 and image.shape[2] == 4:
+        return (0, 0, 0, 255)
+    return 0
+
+
+def _written_rect(box, mode, shape, num_pixelation_x = 7, num_pixelation_y = 7):
+    """Welche Pixel verändert die Zensur einer einzelnen Box (pixel/ blur)?
+
+    Returns:
+        (left, up, right, down) auf das Bild zugeschnitten, oder None, wenn die Box das Bild nicht berührt
+    """
+    height, width = shape[:2]
+    box_left, box_right = box[0] - box[2], box[0] + box[2]
+    box_up, box_down = box[1] - box[3], box[1] + box[3]
+    if mode == 'pixel':
+        # der letzte Block darf über die Box hinausragen, daher über die Blockgrenzen (wie _block_edges, nur ohne Arrays)
+        y_extent = _grid_extent(box_up, box_down, _block_size(box_down - box_up, num_pixelation_y), height)
+        x_extent = _grid_extent(box_left, box_right, _block_size(box_right - box_left, num_pixelation_x), width)
+        if y_extent is None or x_extent is None:
+            return None
+        return (x_extent[0], y_extent[0], x_extent[1], y_extent[1])
+    if mode == 'blur':
+        left, right = max(0, box_left), min(width, box_right)
+        up, down = max(0, box_up), min(height, box_down)
+        if left >= right or up >= down:
+            return None
+        return (left, up, right, down)
+    return None
+
+
+def region_set(boxes: list, mode, shape, num_pixelation_x = 7, num_pixelation_y = 7) -> RegionSet:
+    """Boxen (bei eyeBar: Augenpaare) für censor() zu Regionen zusammenfassen"""
+    if mode == 'eyeBar':
+        bars = []
+        for eyePair in boxes:
+            rectCenter, width, height, rectAngle = _eye_bar(eyePair)
+            # Maske des gedrehten Rechtecks berechnen (nur innerhalb des Bildes)
+            bars.append(rotated_rect_mask(rectCenter[0], rectCenter[1], width, height, rectAngle, shape))
+        rects = [None if bar is None else (bar[1].start, bar[0].start, bar[1].stop, bar[0].stop) for bar in bars]
+        return RegionSet(rects, bars)
+    return RegionSet([_written_rect(box, mode, shape, num_pixelation_x, num_pixelation_y) for box in boxes])
+
+
+def _render_region(image: np.ndarray, region, boxes, mode, num_pixelation_x = 7, num_pixelation_y = 7, blur_sigma = None) -> np.ndarray:
+    """Neue Pixel für das Rechteck der Region (geschrieben werden davon nur die abgedeckten, siehe _apply),
+    beim Augenbalken nur die Farbe"""
+    if mode == 'pixel':
+        return _pixelate_region(image, region, boxes, num_pixelation_x, num_pixelation_y)
+    if mode == 'blur':
+        return _blur_region(image, region, boxes, blur_sigma)
+    return np.asarray(_bar_color(image), dtype=image.dtype)
+
+
+def _apply(target: np.ndarray, coverage, patch: np.ndarray):
+    """patch in target schreiben, nur wo coverage gesetzt ist (None = überall). patch kann auch eine einzelne
+    Farbe sein."""
+    if coverage is None:
+        target[...] = patch
+    else:   # copyto mit where statt Indexierung über die Maske: kein Zwischen-Array mit den ausgewählten Pixeln
+        np.copyto(target, patch, where=coverage.reshape(coverage.shape + (1,) * (target.ndim - 2)))
+
+
+def censor_patches(image: np.ndarray, boxes: list, mode = 'pixel', num_pixelation_x = 7, num_pixelation_y = 7,
+                   blur_sigma: float | None = None) -> list:
+    """Wie censor(), aber statt des ganzen Bildes nur die veränderten Ausschnitte.
+
+    Ein Ausschnitt pro Region (überlappende Boxen sind schon zusammengefasst, die Rechtecke der Regionen überlappen
+    sich nicht). Kopiert wird nur das Rechteck der Region, nicht das ganze Bild. Werden die Ausschnitte auf das
+    Original gelegt, ergibt sich genau das Ergebnis von censor().
+
+    Returns:
+        Liste von (left, up, patch) mit patch als np.ndarray (uint8), left/up = Position im Bild
+    """
+    options = dict(num_pixelation_x=num_pixelation_x, num_pixelation_y=num_pixelation_y, blur_sigma=blur_sigma)
+    patches = []
+    for region in region_set(boxes, mode, image.shape, num_pixelation_x, num_pixelation_y):
+        left, up, right, down = region.rect
+        patch = image[up:down, left:right].copy()       # nicht abgedeckte Pixel des Rechtecks bleiben wie im Original
+        _apply(patch, region.coverage, _render_region(image, region, boxes, mode, **options))
+        patches.append((left, up, patch.astype(np.uint8, copy=False)))
+    return patches
+
+
+def box_key(box):
+    """Box (bzw. Augenpaar) als vergleichbarer Wert, egal ob als Liste (JSON) oder Tupel, int oder float"""
+    if isinstance(box, (list, tuple)):
+        return tuple(box_key(value) for value in box)
+    return float(box)
+
+
+@timed("censor_update")
+def censor_update(original: np.ndarray, target: np.ndarray, old_boxes: list, new_boxes: list, mode = 'pixel',
+                  num_pixelation_x = 7, num_pixelation_y = 7, blur_sigma: float | None = None) -> list:
+    """target von censor(original, old_boxes) auf censor(original, new_boxes) bringen, ohne alles neu zu zensieren.
+
+    Verglichen wird pro Region: Regionen, die es vorher und nachher mit genau denselben Boxen gibt (Reihenfolge egal,
+    das Ergebnis einer Region hängt nicht davon ab), bleiben stehen.
+    Weggefallene oder veränderte Regionen werden aus 'original' wiederhergestellt, neue Regionen aus 'original'
+    zensiert. Das Ergebnis ist pixelgenau das gleiche wie ein neuer censor()-Aufruf mit new_boxes.
+
+    Args:
+        original (np.ndarray): unzensiertes Bild, wird nicht verändert
+        target (np.ndarray): Bild, das censor(original, old_boxes, ...) entspricht, wird direkt geändert
+        old_boxes, new_boxes (list): Boxen vorher und nachher (bei eyeBar: Augenpaare)
+
+    Returns:
+        Liste der geänderten Rechtecke (left, up, right, down), die sich nicht überlappen
+    """
+    options = dict(num_pixelation_x=num_pixelation_x, num_pixelation_y=num_pixelation_y)
+    old_regions = {(region.rect, tuple(sorted(box_key(old_boxes[i]) for i in region.indices))): region
+                   for region in region_set(old_boxes, mode, original.shape, **options)}
+    new_regions = {(region.rect, tuple(sorted(box_key(new_boxes[i]) for i in region.indices))): region
+                   for region in region_set(new_boxes, mode, original.shape, **options)}
+    removed = [region for key, region in old_regions.items() if key not in new_regions]
+    added = [region for key, region in new_regions.items() if key not in old_regions]
+
+    for region in removed:
+        left, up, right, down = region.rect
+        target[up:down, left:right] = original[up:down, left:right]
+    # ganze Regionen bilden unter sich wieder genau diese Regionen, censor_patches fasst sie also gleich zusammen
+    changed_boxes = [new_boxes[i] for region in added for i in region.indices]
+    for left, up, patch in censor_patches(original, changed_boxes, mode, blur_sigma=blur_sigma, **options):
+        target[up:up + patch.shape[0], left:left + patch.shape[1]] = patch
+    return [region.rect for region in RegionSet([region.rect for region in removed + added])]
@@ -1,7 +1,49 @@
 # Erkennung von Gesichtern/ Augen mithilfe der KI, enthält Funktion, die "Koordinaten" der erkannten Boxen ausgibt
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import atexit
+import functools
+import os
+import threading
 import numpy as np
-import face_recognition
+from engine.image_adapter import downscale, decode_reduced
+from engine.cache import detection_cache
+from engine.timing import stage
+
+# Der HOG-Detektor von dlib arbeitet mit einem 80x80 Fenster, jede Stufe Hochskalieren halbiert die kleinste
+# erkennbare Gesichtsgröße (siehe min_detectable_face). Kleiner sollte ein Gesicht nach dem Verkleinern nicht werden.
+_HOG_WINDOW = 80
+_UPSAMPLE = 1
+
+# Erkennungs-Profile: Geschwindigkeit gegen Trefferquote (Messwerte siehe README, "Erkennungs-Profile").
+#   model:     "hog" oder "cnn" (CNN-Detektor von dlib, auch auf der CPU; findet gedrehte und verdeckte Gesichter
+#              besser, ist aber um ein Vielfaches langsamer)
+#   upsample:  wie oft das Bild vor dem Detektor verdoppelt wird. Jede Stufe halbiert die kleinste erkennbare
+#              Gesichtsgröße (80 -> 40 -> 20 Pixel) und kostet etwa das Vierfache
+#   landmarks: "large" = 68 Punkte, "small" = 5 Punkte (nur Augenwinkel und Nase, reicht für Augen-Boxen)
+# Auch das CNN-Modell ist auf Gesichter ab ca. 80 Pixeln trainiert, min_detectable_face gilt also für beide.
+PROFILES = {
+    "fast": {"model": "hog", "upsample": 0, "landmarks": "small"},
+    "balanced": {"model": "hog", "upsample": _UPSAMPLE, "landmarks": "large"},
+    "thorough": {"model": "cnn", "upsample": _UPSAMPLE, "landmarks": "large"},
+}
+DEFAULT_PROFILE = "balanced"
+
+# Beim 5-Punkte-Modell gibt es pro Auge nur die beiden Augenwinkel. Die Höhe der Augen-Box wird dann aus der
+# Breite geschätzt (Verhältnis wie im Mittel beim 68-Punkte-Modell).
+_EYE_HEIGHT_RATIO = 0.4
+
+# Kachel-Modus für sehr große Bilder (Panoramen, zusammengesetzte Gruppenfotos).
+# Die Überlappung sollte größer als das größte erwartete Gesicht sein, damit jedes Gesicht in mindestens einer Kachel ganz liegt.
+TILE_SIZE = 2048
+TILE_OVERLAP = 256
+# Kleinste Kachel: ein paar HOG-Fenster (80 px) breit. Kleinere Kacheln finden kaum noch Gesichter, ergeben aber
+# bei großen Bildern sehr viele Detektor-Aufrufe.
+MIN_TILE_SIZE = 128
+
+_tile_pool: Optional[ProcessPoolExecutor] = None
+_tile_pool_lock = threading.Lock()                     # Request-Threads legen den Pool sonst evtl. doppelt an
+_whole_images_in_pool = False                           # siehe use_detector_pool
 
 
 def _normalize_subject(subject: str) -> str:
@@ -20,88 +62,392 @@ def _normalize_subject(subject: str) -> str:
     return "face"  # fallback
 
 
+_face_recognition = None
+
+
+def _fr():
+    """face_recognition (und damit dlib samt Modell-Dateien, mehrere Sekunden) erst beim ersten Gebrauch laden,
+    damit z.B. `--help` der CLI oder das Öffnen des Browsers nicht darauf warten müssen."""
+    global _face_recognition
+    if _face_recognition is None:
+        import face_recognition
+        _face_recognition = face_recognition
+    return _face_recognition
+
+
+def models_loaded() -> bool:
+    """Ist face_recognition (samt Modellen) schon geladen, z.B. durch warm_up() oder einen ersten Aufruf?"""
+    return _face_recognition is not None
+
+
+def warm_up():
+    """Lädt die Modelle von face_recognition/dlib einmal vorab (z.B. in jedem Worker-Prozess), damit der erste
+    echte Aufruf nicht die Ladezeit bezahlt."""
+    blank = np.zeros((_HOG_WINDOW, _HOG_WINDOW, 3), dtype=np.uint8)
+    _fr().face_locations(blank, model="hog")
+    _fr().face_landmarks(blank, face_locations=[(0, _HOG_WINDOW, _HOG_WINDOW, 0)])
+
+
+def detection_profile(profile: Optional[str] = None) -> Dict:
+    """Einstellungen eines Profils aus PROFILES (None = DEFAULT_PROFILE)"""
+    name = (profile or DEFAULT_PROFILE).strip().lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown detection profile '{profile}', expected one of: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def _check_image(np_img: np.ndarray) -> np.ndarray:
+    """Formate überprüfen und ggf. zu uint8 konvertieren. Erlaubt sind RGB, RGBA und Graustufen (wie aus piltonp)."""
+    if not (np_img.ndim == 2 or (np_img.ndim == 3 and np_img.shape[2] in (3, 4))):
+        raise ValueError(f"Expected RGB, RGBA or grayscale image with shape (H, W, 3), (H, W, 4) or (H, W), got {np_img.shape}")
+    return np_img.astype(np.uint8, copy=False) #Überprüfung des Datentyps (uint8), nur wenn nötig konvertieren
+
+
+def _dlib_image(np_img: np.ndarray) -> np.ndarray:
+    """RGB-Bild für dlib. Bei RGBA wird der Alphakanal abgeschnitten, Graustufen werden auf drei Kanäle gebracht
+    (dlib kann zwar Graustufen, findet darauf aber weniger Gesichter als auf dem gleichen Bild in RGB).
+    Passiert erst hier, also nach dem Verkleinern, damit nur das kleine Bild kopiert wird."""
+    if np_img.ndim == 2:
+        return np.repeat(np_img[:, :, np.newaxis], 3, axis=2)
+    if np_img.shape[2] == 4:
+        return np.ascontiguousarray(np_img[..., :3])
+    return np_img
+
+
+def _center_box(box_type: str, left, top, right, bottom) -> Dict:
+    """Ecken-Koordinaten in unser Mittelpunkt-Format umrechnen: Mittelpunkt plus Breite und Höhe der Box"""
+    w = right - left
+    h = bottom - top
+    x_center = left + w / 2.0
+    y_center = top + h / 2.0
+    return {
+        "type": box_type,
+        "x": int(round(x_center)),
+        "y": int(round(y_center)),
+        "w": int(round(w)),
+        "h": int(round(h)),
+    }
+
+
+def _face_box(location) -> Dict:
+    """Box für ein Gesicht aus face_recognition-Location (top, right, bottom, left)"""
+    top, right, bottom, left = location
+    return _center_box("face", left, top, right, bottom)
+
+
+def _eye_boxes(face_landmarks: Dict) -> List[Dict]:
+    """Boxen für linkes und rechtes Auge (in dieser Reihenfolge) anhand der Landmarks eines Gesichts
+    (68-Punkte-Modell: 6 Punkte pro Auge, 5-Punkte-Modell: nur die beiden Augenwinkel)"""
+    boxes = []
+    for key in ("left_eye", "right_eye"):
+        points = np.array(face_landmarks[key])
+        left, top = np.min(points, axis=0)
+        right, bottom = np.max(points, axis=0)
+        if len(points) == 2:
+            # nur Augenwinkel: Höhe aus der Breite schätzen, um die Mitte der beiden Winkel herum
+            half_h = max(bottom - top, (right - left) * _EYE_HEIGHT_RATIO) / 2
+            middle = (top + bottom) / 2
+            top, bottom = middle - half_h, middle + half_h
+        boxes.append(_center_box("eye", int(left), int(top), int(right), int(bottom)))
+    return boxes
+
+
+def min_detectable_face(profile: Optional[str] = None) -> float:
+    """Kleinste Gesichtsgröße (Pixel), die das Profil noch findet: Fenster des Detektors / 2 ** upsample"""
+    return _HOG_WINDOW / 2 ** detection_profile(profile)["upsample"]
+
+
+def detection_scale(shape, max_side: Optional[int] = None, min_face_size: Optional[int] = None,
+                    profile: Optional[str] = None) -> float:
+    """
+    Faktor, um den das Bild vor der Erkennung verkleinert wird (1.0 = Originalgröße).
+
+    Args:
+        shape: Form des Bildes (H, W, ...)
+        max_side (int, optional): maximale Länge der längeren Bildseite
+        min_face_size (int, optional): kleinste Gesichtsgröße (in Pixeln im Original), die noch gefunden werden soll.
+            Das Bild wird so weit verkleinert, dass solche Gesichter gerade noch erkannt werden.
+        profile (str, optional): Erkennungs-Profil, bestimmt über das Hochskalieren die kleinste erkennbare Größe
+
+    Sind beide angegeben, gilt der kleinere Faktor. Vergrößert wird nie.
+    """
+    scale = 1.0
+    if max_side:
+        scale = min(scale, max_side / max(shape[0], shape[1]))
+    if min_face_size:
+        scale = min(scale, min_detectable_face(profile) / min_face_size)
+    return scale
+
+
+def scale_boxes(boxes: List[Dict], factor_x: float, factor_y: Optional[float] = None) -> List[Dict]:
+    """Boxen (Mittelpunkt-Format) mit einem Faktor umrechnen, z.B. vom verkleinerten zurück ins Originalbild"""
+    if factor_y is None:
+        factor_y = factor_x
+    return [{
+        **box,
+        "x": int(round(box["x"] * factor_x)),
+        "y": int(round(box["y"] * factor_y)),
+        "w": int(round(box["w"] * factor_x)),
+        "h": int(round(box["h"] * factor_y)),
+    } for box in boxes]
+
+
+def _locate_cached(np_img: np.ndarray, with_landmarks: bool, scale: float, tile_size: Optional[int],
+                   tile_overlap: int, workers: Optional[int], profile: Optional[str]) -> Tuple[List, Optional[List[Dict]], float, float]:
+    """
+    locate() mit Cache und Verkleinerung davor. Der Cache-Schlüssel ist der Hash des Originalbildes plus der
+    Parameter (inkl. der Einstellungen des Profils), gespeichert werden die rohen Locations/Landmarks (im
+    verkleinerten Bild) und die Faktoren zurück ins Original. Fehlen bei einem Treffer nur die Landmarks, werden sie für die bekannten Gesichter nachgerechnet.
+
+    Returns:
+        (face_locations, face_landmarks_list, factor_x, factor_y)
+    """
+    np_img = _check_image(np_img)
+    with stage("cache_lookup"):
+        key = detection_cache.key(np_img, scale=scale, tile_size=tile_size, tile_overlap=tile_overlap,
+                                  **detection_profile(profile))
+        entry = detection_cache.get(key)
+    if entry is None or (with_landmarks and entry["landmarks"] is None):
+        small = downscale(np_img, scale)
+        known_locations = entry["locations"] if entry is not None else None
+        face_locations, face_landmarks_list = locate(small, with_landmarks, tile_size=tile_size, tile_overlap=tile_overlap,
+                                                     workers=workers, face_locations=known_locations, profile=profile)
+        entry = {
+            "locations": [list(location) for location in face_locations],
+            "landmarks": face_landmarks_list,
+            # tatsächliche Faktoren pro Achse (wegen Rundung der Bildgröße nicht exakt 1 / scale)
+            "factor_x": np_img.shape[1] / small.shape[1],
+            "factor_y": np_img.shape[0] / small.shape[0],
+        }
+        detection_cache.put(key, entry)
+    return entry["locations"], entry["landmarks"], entry["factor_x"], entry["factor_y"]
+
+
+def check_tiling(tile_size: Optional[int], tile_overlap: int):
+    """Kachel-Parameter prüfen (ValueError): tile_size mindestens MIN_TILE_SIZE, Überlappung kleiner als die Kachel.
+    Sonst wäre der Abstand der Kacheln winzig und ein großes Bild würde in Millionen Kacheln zerlegt."""
+    if tile_size is None:
+        return
+    if tile_size < MIN_TILE_SIZE:
+        raise ValueError(f"tile_size must be at least {MIN_TILE_SIZE}")
+    if not 0 <= tile_overlap < tile_size:
+        raise ValueError(f"tile_overlap must be smaller than tile_size ({tile_size})")
+
+
+def _tile_starts(length: int, tile_size: int, overlap: int) -> List[int]:
+    """Startkoordinaten der Kacheln entlang einer Achse; die letzte Kachel endet genau am Bildrand"""
+    if length <= tile_size:
+        return [0]
+    step = tile_size - overlap
+    starts = list(range(0, length - tile_size, step))
+    starts.append(length - tile_size)
+    return starts
+
+
+def _find_faces(np_img: np.ndarray, model: str, upsample: int) -> List[Tuple]:
+    """Der eigentliche Detektor-Aufruf (HOG oder CNN), Locations als (top, right, bottom, left)"""
+    return _fr().face_locations(np_img, number_of_times_to_upsample=upsample, model=model)
+
+
+def _locate_tile(tile: np.ndarray, model: str = "hog", upsample: int = _UPSAMPLE) -> List[Tuple]:
+    """Erkennung auf einer Kachel (läuft im Worker-Prozess), Koordinaten relativ zur Kachel"""
+    return _find_faces(tile, model, upsample)
+
+
+def _get_tile_pool() -> ProcessPoolExecutor:
+    """
+    Prozess-Pool für den Kachel-Modus (und mit use_detector_pool für ganze Bilder): einmal mit einem Prozess pro
+    Kern angelegt und danach nie neu gebaut, die Modelle werden beim Start jedes Workers geladen (warm_up) und
+    bleiben geladen.
+    """
+    global _tile_pool
+    with _tile_pool_lock:
+        if _tile_pool is None:
+            _tile_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, initializer=warm_up)
+        return _tile_pool
+
+
+def use_detector_pool(enabled: bool = True):
+    """
+    Auch ganze Bilder (nicht nur Kacheln) im Prozess-Pool erkennen statt im aufrufenden Thread. Für den Server:
+    dlib gibt beim Detektor den GIL nicht frei, mehrere Request-Threads würden sonst nacheinander auf einem Kern
+    erkennen. Cache, Landmarks und Zeitmessung bleiben im aufrufenden Prozess, übertragen wird nur das (ggf.
+    verkleinerte) Bild. Mit workers=1 (Batch-Worker) wird weiterhin im eigenen Prozess erkannt.
+    """
+    global _whole_images_in_pool
+    _whole_images_in_pool = enabled
+
+
+@atexit.register
+def _shutdown_tile_pool():
+    if _tile_pool is not None:
+        _tile_pool.shutdown(cancel_futures=True)
+
+
+def _suppress_duplicates(face_locations: List[Tuple], iou_threshold: float = 0.3, containment_threshold: float = 0.6) -> List[Tuple]:
+    """
+    Non-Maximum-Suppression für Gesichter aus überlappenden Kacheln. Der HOG-Detektor liefert keine Scores,
+    deshalb gewinnt die größere Box (ein an der Kachelkante abgeschnittenes Gesicht ist kleiner als das ganze).
+    Eine Box fliegt raus, wenn sie eine behaltene Box stark überlappt (IoU) oder größtenteils in ihr liegt.
+    """
+    def area(loc):
+        top, right, bottom, left = loc
+        return max(0, right - left) * max(0, bottom - top)
+
+    kept: List[Tuple] = []
+    for loc in sorted(face_locations, key=area, reverse=True):
+        top, right, bottom, left = loc
+        duplicate = False
+        for k_top, k_right, k_bottom, k_left in kept:
+            inter_w = min(right, k_right) - max(left, k_left)
+            inter_h = min(bottom, k_bottom) - max(top, k_top)
+            if inter_w <= 0 or inter_h <= 0:
+                continue
+            inter = inter_w * inter_h
+            union = area(loc) + (k_right - k_left) * (k_bottom - k_top) - inter
+            if inter / union > iou_threshold or inter / max(1, area(loc)) > containment_threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(loc)
+    return kept
+
+
+def _locate_faces_tiled(np_img: np.ndarray, tile_size: int, overlap: int, workers: Optional[int],
+                        model: str = "hog", upsample: int = _UPSAMPLE) -> List[Tuple]:
+    """Gesichter kachelweise (parallel über alle Kerne) suchen und in globale Koordinaten zurückrechnen"""
+    height, width = np_img.shape[:2]
+    origins = [(y, x) for y in _tile_starts(height, tile_size, overlap) for x in _tile_starts(width, tile_size, overlap)]
+    tiles = [np_img[y:y + tile_size, x:x + tile_size] for y, x in origins]
+
+    # workers > 1 (Standard: alle Kerne) verteilt die Kacheln auf den gemeinsamen Pool, workers=1 bleibt im Prozess
+    workers = min(workers or os.cpu_count() or 1, len(tiles))
+    locate_tile = functools.partial(_locate_tile, model=model, upsample=upsample)
+    if workers > 1:
+        results = list(_get_tile_pool().map(locate_tile, tiles))
+    else:
+        results = [locate_tile(tile) for tile in tiles]
+
+    face_locations = [
+        (top + y, right + x, bottom + y, left + x)
+        for (y, x), tile_locations in zip(origins, results)
+        for top, right, bottom, left in tile_locations
+    ]
+    return _suppress_duplicates(face_locations)
+
+
+def locate(np_img: np.ndarray, with_landmarks: bool = False, tile_size: Optional[int] = None,
+           tile_overlap: int = TILE_OVERLAP, workers: Optional[int] = None,
+           face_locations: Optional[List[Tuple]] = None,
+           profile: Optional[str] = None) -> Tuple[List[Tuple], Optional[List[Dict]]]:
+    """
+    Einziger Aufruf der KI: Detektor (HOG oder CNN, je nach Profil) genau einmal laufen lassen. Landmarks werden nur bei Bedarf
+    und nur für die bereits gefundenen Gesichter berechnet (face_landmarks würde sonst den Detektor
+    ein zweites Mal über das ganze Bild laufen lassen).
+
+    Mit tile_size wird ein Bild, dessen längere Seite größer als tile_size ist, in überlappende Kacheln
+    zerlegt, die parallel in einem gemeinsamen Pool (ein Prozess pro Kern) erkannt werden; workers=1 erkennt sie
+    nacheinander im aufrufenden Prozess (z.B. schon in einem Batch-Worker). Nach use_detector_pool laufen auch
+    ganze Bilder in diesem Pool (außer mit workers=1). Doppelte Gesichter an
+    den Kachelgrenzen werden entfernt. Die Landmarks laufen danach auf dem ganzen Bild, damit auch Gesichter
+    über einer Kachelgrenze Augen bekommen. Kleine Bilder werden immer am Stück erkannt.
+
+    Sind face_locations schon bekannt (z.B. aus dem Cache), läuft der Detektor gar nicht, nur die Landmarks.
+
+    profile wählt Detektor, Hochskalieren und Landmark-Modell (siehe PROFILES), Standard ist DEFAULT_PROFILE.
+
+    Returns:
+        (face_locations, face_landmarks_list) - face_landmarks_list ist None, wenn with_landmarks False ist.
+        Die Indexe entsprechen einander, also face_locations[i] und face_landmarks_list[i] gehören zum gleichen Gesicht.
+    """
+    settings = detection_profile(profile)
+    check_tiling(tile_size, tile_overlap)
+    np_img = _dlib_image(_check_image(np_img))
+    if face_locations is not None:
+        face_locations = [tuple(location) for location in face_locations]
+    elif tile_size and max(np_img.shape[:2]) > tile_size:
+        with stage(settings["model"]):
+            face_locations = _locate_faces_tiled(np_img, tile_size, tile_overlap, workers,
+                                                 settings["model"], settings["upsample"])
+    elif _whole_images_in_pool and workers != 1:
+        with stage(settings["model"]):
+            face_locations = _get_tile_pool().submit(_find_faces, np_img, settings["model"], settings["upsample"]).result()
+    else:
+        with stage(settings["model"]):
+            face_locations = _find_faces(np_img, settings["model"], settings["upsample"]) #Position der Gesichter
+    face_landmarks_list = None
+    if with_landmarks:
+        with stage("landmarks"):
+            face_landmarks_list = _fr().face_landmarks(np_img, face_locations=face_locations,
+                                                       model=settings["landmarks"]) #Typ (Linkes Auge, Rechtes Auge, etc.)
+    return face_locations, face_landmarks_list
+
+
+def detect_all(np_img: np.ndarray, scale: float = 1.0, tile_size: Optional[int] = None,
+               tile_overlap: int = TILE_OVERLAP, workers: Optional[int] = None,
+               profile: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """
+    Gesichter und Augen aus einem einzigen Detektor-Durchlauf, im Format:
+    { "faces": [{ "type": "face", ... }, ...], "eyes": [{ "type": "eye", ... }, ...] }
+    Die Augen kommen paarweise (linkes, dann rechtes Auge) in der Reihenfolge der Gesichter.
+    Mit scale < 1 wird auf einem verkleinerten Bild erkannt, die Boxen gelten aber für das Originalbild.
+    tile_size, tile_overlap und workers schalten den Kachel-Modus ein (siehe locate()), profile wählt das
+    Erkennungs-Profil (siehe PROFILES).
+    """
+    face_locations, face_landmarks_list, factor_x, factor_y = _locate_cached(
+        np_img, True, scale, tile_size, tile_overlap, workers, profile)
+    faces = [_face_box(location) for location in face_locations]
+    eyes = [box for landmarks in face_landmarks_list for box in _eye_boxes(landmarks)]
+    return {
+        "faces": scale_boxes(faces, factor_x, factor_y),
+        "eyes": scale_boxes(eyes, factor_x, factor_y),
+    }
+
+
     #Bild als Numpy Array erkennen und parameter zurückgeben.
-def detect(np_img: np.ndarray, subject: str = "face") -> List[Dict]:
+def detect(np_img: np.ndarray, subject: str = "face", scale: float = 1.0, tile_size: Optional[int] = None,
+           tile_overlap: int = TILE_OVERLAP, workers: Optional[int] = None, profile: Optional[str] = None) -> List[Dict]:
     """
     Merkmal erkennen und als Liste parameter zurückgeben, im Format:
     [{ "type": "face"/"eye", "x": center_x, "y": center_y, "w": width, "h": height }, ...]
     Es wird also der Mittelpunkt angegeben und von dem aus die höhe und breite der Box.
+    Mit scale < 1 (siehe detection_scale) wird auf einem verkleinerten Bild erkannt, die Boxen gelten aber
+    für das Originalbild. tile_size, tile_overlap und workers schalten den Kachel-Modus ein (siehe locate()).
+    profile wählt zwischen "fast", "balanced" (Standard) und "thorough" (siehe PROFILES).
+    Ergebnisse werden in engine.cache.detection_cache zwischengespeichert.
     """
     normalized_subject = _normalize_subject(subject) #Normalisierung zur EInheitlichkeit
+    with_landmarks = normalized_subject == "eyes" #Augen brauchen Landmarks, Gesichter nicht
 
-    #Formate überprüfen
-    if np_img.ndim != 3 or np_img.shape[2] != 3: #Sichergehen dass RGB angegeben wird und nicht Grayscale oder was anderes
-        raise ValueError(f"Expected RGB image with shape (H, W, 3), got {np_img.shape}")
-    if np_img.dtype != np.uint8: #Überprüfung des Datentyps (uint8), sonst konvertieren
-        np_img = np_img.astype(np.uint8)
-
-    #Aufruf der KI
-    face_locations = face_recognition.face_locations(np_img, model="hog") #Position der Gesichter
-    face_landmarks_list = face_recognition.face_landmarks(np_img) #Typ (Linkes Auge, Rechtes Auge, etc.)
-    #Hierbei entsprechen die Indexe einander, also face_locations[i] und face_landmarks_list[i] gehören zu dem gleichen Gesicht
-
-    #Output Container
-    boxes: List[Dict] = []
-
-    #Jedes erkanntes Gesicht verarbeiten
-    for i, (top, right, bottom, left) in enumerate(face_locations):
-        face_landmarks = face_landmarks_list[i]  #landmark für das entsprechende Gesicht
-
-        if normalized_subject == "face": #Fall: Ganzes Gesicht -> Berechnen der Größe der Box (um in unserem Mittelpunkt-Orientierten Format zurückgeben zu können, statt anhand der Ecken)
-            w = right - left
-            h = bottom - top
-            x_center = left + w / 2.0
-            y_center = top + h / 2.0
-            boxes.append({
-                "type": "face",
-                "x": int(round(x_center)),
-                "y": int(round(y_center)),
-                "w": int(round(w)),
-                "h": int(round(h)),
-            })
-
-        elif normalized_subject == "eyes": #Gleiches System, nur für Augen statt ganze Gesichter
-            left_eye_points = np.array(face_landmarks['left_eye'])
-            right_eye_points = np.array(face_landmarks['right_eye'])
-
-            #Linkes Auge anhand der Landmarks
-            left_eye_left = int(np.min(left_eye_points[:, 0]))
-            left_eye_top = int(np.min(left_eye_points[:, 1]))
-            left_eye_right = int(np.max(left_eye_points[:, 0]))
-            left_eye_bottom = int(np.max(left_eye_points[:, 1]))
-
-            #Rechtes Auge anhand der Landmarks
-            right_eye_left = int(np.min(right_eye_points[:, 0]))
-            right_eye_top = int(np.min(right_eye_points[:, 1]))
-            right_eye_right = int(np.max(right_eye_points[:, 0]))
-            right_eye_bottom = int(np.max(right_eye_points[:, 1]))
-
-            #Zu Mittelpunk Format konvertieren x,y,w,h format (selbiges wie oben)
-
-            #Linkes Auge
-            left_w = left_eye_right - left_eye_left
-            left_h = left_eye_bottom - left_eye_top
-            left_x = left_eye_left + left_w / 2.0
-            left_y = left_eye_top + left_h / 2.0
-            boxes.append({
-                "type": "eye",
-                "x": int(round(left_x)),
-                "y": int(round(left_y)),
-                "w": int(round(left_w)),
-                "h": int(round(left_h)),
-            })
-
-            #Rechtes Auge
-            right_w = right_eye_right - right_eye_left
-            right_h = right_eye_bottom - right_eye_top
-            right_x = right_eye_left + right_w / 2.0
-            right_y = right_eye_top + right_h / 2.0
-            boxes.append({
-                "type": "eye",
-                "x": int(round(right_x)),
-                "y": int(round(right_y)),
-                "w": int(round(right_w)),
-                "h": int(round(right_h)),
-            })
+    face_locations, face_landmarks_list, factor_x, factor_y = _locate_cached(
+        np_img, with_landmarks, scale, tile_size, tile_overlap, workers, profile)
 
-    return boxes
+    if with_landmarks:
+        boxes = [box for landmarks in face_landmarks_list for box in _eye_boxes(landmarks)]
+    else:
+        boxes = [_face_box(location) for location in face_locations]
+    return scale_boxes(boxes, factor_x, factor_y)
+
+
+def detect_image(image, subject: str = "face", max_side: Optional[int] = None, min_face_size: Optional[int] = None,
+                 tile_size: Optional[int] = None, tile_overlap: int = TILE_OVERLAP,
+                 workers: Optional[int] = None, profile: Optional[str] = None) -> Tuple[List[Dict], float]:
+    """
+    detect() für ein geöffnetes, aber noch nicht dekodiertes PIL-Bild. Mit max_side/ min_face_size wird ein JPEG
+    gleich verkleinert dekodiert (siehe image_adapter.decode_reduced), das volle Bild wird dann nie erzeugt.
+    Danach ist 'image' ggf. nur noch verkleinert verfügbar.
+
+    Returns:
+        (Boxen bezogen auf das Originalbild, Verkleinerungsfaktor wie bei detection_scale)
+    """
+    width, height = image.size
+    scale = detection_scale((height, width), max_side, min_face_size, profile)
+    np_img = decode_reduced(image, scale)
+    reduced_height, reduced_width = np_img.shape[:2]
+    # restliche Verkleinerung bezogen auf das schon reduziert dekodierte Bild
+    remaining = min(1.0, scale * width / reduced_width)
+    objects = detect(np_img, subject, scale=remaining, tile_size=tile_size, tile_overlap=tile_overlap, workers=workers,
+                     profile=profile)
+    if (reduced_height, reduced_width) != (height, width):
+        objects = scale_boxes(objects, width / reduced_width, height / reduced_height)
+    return objects, scale
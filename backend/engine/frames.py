@@ -0,0 +1,137 @@
+# Mehrbildformate (animiertes GIF, APNG, mehrseitiges TIFF, animiertes WebP): Bild für Bild verarbeiten,
+# ohne alle Frames gleichzeitig im Speicher zu halten. Die Gesichtserkennung läuft nur auf Keyframes
+# (alle N Frames oder bei einem Szenenwechsel), dazwischen werden die Boxen des letzten Keyframes übernommen.
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from engine.image_adapter import piltonp
+
+# Standard: alle 10 Frames neu erkennen
+KEYFRAME_INTERVAL = 10
+# Mittlere Grauwert-Differenz (0-255) der Vorschaubilder, ab der ein Frame als neue Szene gilt
+SCENE_CHANGE_THRESHOLD = 20.0
+# Kantenlänge der Vorschaubilder für den Szenenvergleich
+_THUMB_SIZE = 32
+
+# APNG, TIFF und WebP müssen vor dem Schreiben alle Frames sammeln (siehe save_frames): höchstens so viel Speicher
+MAX_BUFFERED_MB = 512
+
+# Frame-Infos, die beim Speichern erhalten bleiben sollen
+_KEPT_INFO = ("duration", "loop")
+
+# Formate, die Pillow mit mehreren Frames lesen und schreiben kann.
+# (MPO, z.B. JPEGs vom Handy mit eingebettetem Vorschaubild, zählt bewusst nicht dazu.)
+MULTIFRAME_FORMATS = ("GIF", "PNG", "TIFF", "WEBP")
+
+
+class FrameBufferError(ValueError):
+    """Die zensierten Frames passen nicht in den Speicher, den save_frames für APNG/ TIFF/ WebP sammeln darf"""
+
+    def __init__(self, needed: int, limit: int, format: str):
+        super().__init__(f"{format} output needs about {needed / 2 ** 20:.0f} MB for all frames, limit is "
+                         f"{limit / 2 ** 20:.0f} MB (raise the limit or convert the animation to GIF)")
+
+
+def is_multiframe(image: Image.Image) -> bool:
+    return image.format in MULTIFRAME_FORMATS and getattr(image, "n_frames", 1) > 1
+
+
+def buffered_bytes(image: Image.Image) -> int:
+    """Geschätzter Speicher, den save_frames beim Schreiben im Format des Bildes sammelt (GIF: 0, wird gestreamt).
+    Pillow legt RGB-Frames mit 4 Byte pro Pixel ab."""
+    if image.format == "GIF":
+        return 0
+    width, height = image.size
+    return getattr(image, "n_frames", 1) * width * height * 4
+
+
+def check_buffered(image: Image.Image, max_bytes: int = MAX_BUFFERED_MB * 2 ** 20):
+    """Vorab prüfen, ob die Frames beim Speichern ins Limit passen, damit nicht erst nach der ganzen Arbeit
+    abgebrochen wird. Wirft FrameBufferError."""
+    needed = buffered_bytes(image)
+    if needed > max_bytes:
+        raise FrameBufferError(needed, max_bytes, image.format)
+
+
+def iter_frames(image: Image.Image) -> Iterator[Tuple[np.ndarray, Dict]]:
+    """
+    Frames nacheinander als RGB-Array liefern, dazu Infos wie Anzeigedauer und Wiederholungen.
+    Es ist immer nur der aktuelle Frame dekodiert.
+    """
+    for frame in ImageSequence.Iterator(image):
+        info = {key: frame.info[key] for key in _KEPT_INFO if key in frame.info}
+        yield piltonp(frame), info
+
+
+def _thumbnail(np_img: np.ndarray) -> np.ndarray:
+    thumb = Image.fromarray(np_img).convert("L").resize((_THUMB_SIZE, _THUMB_SIZE), Image.BILINEAR)
+    return np.asarray(thumb, dtype=np.int16)
+
+
+def scene_changed(previous: np.ndarray, current: np.ndarray, threshold: float = SCENE_CHANGE_THRESHOLD) -> bool:
+    """Vergleich zweier Vorschaubilder aus _thumbnail: mittlere absolute Differenz über der Schwelle?"""
+    return float(np.abs(current - previous).mean()) > threshold
+
+
+def track_detections(frames: Iterable[Tuple[np.ndarray, Dict]], detect_fn: Callable[[np.ndarray], List],
+                     keyframe_interval: int = KEYFRAME_INTERVAL,
+                     scene_threshold: float = SCENE_CHANGE_THRESHOLD) -> Iterator[Tuple[np.ndarray, Dict, List, bool]]:
+    """
+    Erkennung über eine Folge von Frames, nur auf Keyframes wirklich ausgeführt.
+
+    Keyframe ist der erste Frame, danach jeder keyframe_interval-te Frame seit dem letzten Keyframe und jeder
+    Frame, der sich deutlich vom letzten Keyframe unterscheidet (Szenenwechsel). Für alle anderen Frames
+    werden die Boxen des letzten Keyframes übernommen.
+
+    Args:
+        frames: (Frame als RGB-Array, Infos) wie aus iter_frames, werden nacheinander abgearbeitet
+        detect_fn: Erkennung für einen Frame, z.B. lambda img: detect(img, "face")
+
+    Returns:
+        Iterator über (frame, infos, boxen, ist_keyframe)
+    """
+    detections: List = []
+    key_thumb = None
+    since_key = 0
+    for frame, info in frames:
+        thumb = _thumbnail(frame)
+        is_key = (key_thumb is None or since_key >= keyframe_interval
+                  or scene_changed(key_thumb, thumb, scene_threshold))
+        if is_key:
+            detections = detect_fn(frame)
+            key_thumb = thumb
+            since_key = 0
+        since_key += 1
+        yield frame, info, detections, is_key
+
+
+def save_frames(frames: Iterable[Tuple[Image.Image, Dict]], path: str, format: str,
+                max_bytes: int = MAX_BUFFERED_MB * 2 ** 20):
+    """
+    Frames (PIL-Bild + Infos aus iter_frames) als Mehrbilddatei speichern.
+
+    Beim GIF werden die Frames als Generator an Pillow übergeben und erst beim Schreiben erzeugt
+    (Pillow hält dann nur die auf die Palette reduzierten Frames). Die Writer für APNG, TIFF und WebP
+    gehen die Frames mehrfach durch bzw. machen selbst eine Liste daraus, dort werden sie vorher gesammelt;
+    der Speicher dafür wächst mit der Anzahl Frames und ist auf max_bytes begrenzt (sonst FrameBufferError,
+    vorab lässt sich das mit check_buffered prüfen).
+    """
+    def with_info():
+        for pil_frame, info in frames:
+            pil_frame.info.update(info)
+            yield pil_frame
+
+    generator = with_info()
+    first = next(generator)
+    if format == "GIF":
+        rest = generator
+    else:
+        rest, collected = [], first.width * first.height * 4
+        for pil_frame in generator:
+            collected += pil_frame.width * pil_frame.height * 4
+            if collected > max_bytes:
+                raise FrameBufferError(collected, max_bytes, format)
+            rest.append(pil_frame)
+    first.save(path, format=format, save_all=True, append_images=rest)
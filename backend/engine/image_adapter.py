@@ -1,21 +1,148 @@
 # definiert Methoden, wie PILs in NumPy arrays umgewandelt werden können und anders herum
+import io
+import math
+import time
 import numpy as np
 from PIL import Image
 
+from engine.timing import timed
+
+# Unterstützte Ausgabeformate: Name im Request/ CLI -> (PIL-Format, MIME-Type, Dateiendung)
+OUTPUT_FORMATS = {
+    "png": ("PNG", "image/png", ".png"),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+    "webp": ("WEBP", "image/webp", ".webp"),
+}
+DEFAULT_QUALITY = 90            # JPEG/ WebP
+DEFAULT_PNG_COMPRESS_LEVEL = 6  # 0-9, 1 ist deutlich schneller bei etwas größerer Datei
+
+# Modi, die ohne Umwandlung als Array durch die Pipeline laufen: (H, W, 3), (H, W, 4) und (H, W)
+ARRAY_MODES = ("RGB", "RGBA", "L")
+# Größe der Streifen, in denen piltonp die Pixel aus Pillow kopiert (Bytes)
+_STRIP_BYTES = 1 << 18
+
+@timed("piltonp")
 def piltonp(image: Image.Image) -> np.ndarray:
     """
-    Convert a PIL Image to a NumPy array (H x W x 3, uint8, RGB).
+    Convert a PIL Image to a NumPy array (uint8): H x W x 3 for RGB, H x W x 4 for RGBA, H x W for grayscale.
+
+    RGB, RGBA und L werden nicht umgewandelt. Andere Modi werden zum passenden davon konvertiert (Palette/ CMYK
+    -> RGB, mit Transparenz -> RGBA, einkanalige wie "1" oder "I;16" -> L).
+
+    Pillow gibt seine Pixel nicht als Buffer heraus, np.array(image) geht über tobytes() (Stücke + join) und
+    kopiert danach noch einmal, also zwei volle Kopien. Hier wird das Array einmal angelegt und streifenweise
+    befüllt: eine Kopie, und das Array gehört dem Aufrufer (beschreibbar, z.B. für censor(..., inplace=True)).
     """
-    if image.mode != "RGB":
-        image = image.convert("RGB")
-    arr = np.array(image)  # shape: (H, W, 3 [also dreidimensionales array, mit Höhe, Breite und Farbkanal (RGB) als Indexes/ Dimensionen]), dtype=uint8
-    return arr
+    if image.mode not in ARRAY_MODES:
+        if image.has_transparency_data:
+            image = image.convert("RGBA")
+        elif len(image.getbands()) == 1 and image.mode != "P":
+            image = image.convert("L")
+        else:
+            image = image.convert("RGB")
+    width, height = image.size
+    channels = len(image.getbands())
+    array = np.empty((height, width) if channels == 1 else (height, width, channels), dtype=np.uint8)
+    rows = max(1, _STRIP_BYTES // max(1, width * channels))
+    for top in range(0, height, rows):
+        array[top:top + rows] = np.asarray(image.crop((0, top, width, min(height, top + rows))))
+    return array
 
 def nptopil(array: np.ndarray) -> Image.Image:
     """
-    Convert a NumPy image array (H x W x 3, uint8) back to a PIL Image.
+    Convert a NumPy image array (uint8, H x W x 3/ H x W x 4/ H x W) back to a PIL Image (RGB/ RGBA/ L).
+
+    Ist das Array schon uint8, wird nicht konvertiert; bei RGBA und L teilt sich das PIL-Bild sogar den Speicher
+    mit dem Array (RGB legt Pillow intern mit 4 Byte pro Pixel ab, dort ist eine Kopie nicht zu vermeiden).
+    """
+    return Image.fromarray(array.astype(np.uint8, copy=False))
+
+@timed("downscale")
+def downscale(array: np.ndarray, scale: float) -> np.ndarray:
+    """
+    Verkleinert ein NumPy-Bild um den Faktor 'scale' (0 < scale <= 1), z.B. für eine schnellere Erkennung.
+    Bei scale >= 1 wird das Bild unverändert zurückgegeben.
+    """
+    if scale >= 1:
+        return array
+    height, width = array.shape[:2]
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    # reducing_gap: erst grob per Blockmittelwert verkleinern, dann fein interpolieren -> deutlich schneller bei großen Faktoren
+    small = Image.fromarray(array).resize(size, Image.BILINEAR, reducing_gap=2.0)
+    return np.asarray(small)
+
+
+def decode_reduced(image: Image.Image, scale: float) -> np.ndarray:
+    """
+    Bild für die Erkennung dekodieren, bei JPEGs direkt verkleinert.
+
+    Der JPEG-Decoder kann beim Dekodieren auf 1/2, 1/4 oder 1/8 verkleinern (Image.draft), das ist deutlich
+    schneller und braucht nur einen Bruchteil des Speichers. Gewählt wird die stärkste Verkleinerung, bei der das
+    Bild noch mindestens 'scale' * Originalgröße hat; den Rest erledigt dann downscale() in der Erkennung.
+    Andere Formate werden normal dekodiert.
+
+    Achtung: danach ist 'image' nur noch in der reduzierten Größe verfügbar. Wird das Bild in voller Auflösung
+    gebraucht (zum Zensieren), muss es neu geöffnet werden.
+    """
+    if image.format == "JPEG" and scale < 1:        # wirkt nur, solange das Bild noch nicht geladen ist
+        width, height = image.size
+        image.draft(None, (math.ceil(width * scale), math.ceil(height * scale)))
+    return piltonp(image)
+
+
+@timed("preview")
+def preview_array(image: Image.Image | np.ndarray, max_side: int) -> np.ndarray:
+    """
+    Verkleinerte Vorschau, deren längere Seite höchstens max_side ist (kleinere Bilder bleiben, wie sie sind).
+    Aus einem noch nicht dekodierten PIL-Bild wird bei JPEGs gleich verkleinert dekodiert (siehe decode_reduced),
+    ein schon dekodiertes Bild (NumPy-Array, z.B. aus einer Session) wird direkt verkleinert.
+    """
+    if isinstance(image, np.ndarray):
+        return downscale(image, max_side / max(image.shape[:2]))
+    scale = max_side / max(image.size)
+    array = decode_reduced(image, scale)
+    return downscale(array, max_side / max(array.shape[:2]))
+
+
+def output_format(requested: str | None = None, source_format: str | None = None) -> str:
     """
-    if array.dtype != np.uint8:
-        array = array.astype(np.uint8)
-    image = Image.fromarray(array, mode="RGB")
-    return image
+    Ausgabeformat bestimmen: "png"/"jpeg"/"webp" oder "original" bzw. None = Format des Eingabebildes
+    (wenn das keins der unterstützten Formate ist, z.B. GIF oder BMP, wird PNG verwendet).
+    """
+    name = (requested or "original").lower()
+    if name == "jpg":
+        name = "jpeg"
+    if name == "original":
+        name = (source_format or "png").lower()
+        return name if name in OUTPUT_FORMATS else "png"
+    if name not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {requested}")
+    return name
+
+
+@timed("encode")
+def encode_image(image: Image.Image, fmt: str = "png", quality: int | None = None,
+                 png_compress_level: int | None = None) -> tuple[bytes, dict]:
+    """
+    Bild in Bytes kodieren (fmt aus output_format). Gibt die Bytes und Infos zurück:
+    {"format", "mime_type", "encode_ms", "output_bytes"}
+    """
+    pil_format, mime_type, _ = OUTPUT_FORMATS[fmt]
+    params = {}
+    if fmt == "png":
+        params["compress_level"] = DEFAULT_PNG_COMPRESS_LEVEL if png_compress_level is None else png_compress_level
+    else:
+        params["quality"] = DEFAULT_QUALITY if quality is None else quality
+    if fmt == "jpeg" and image.mode not in ("RGB", "L"):    # JPEG kann keinen Alpha-Kanal speichern
+        image = image.convert("RGB")
+
+    started = time.perf_counter()
+    buffer = io.BytesIO()
+    image.save(buffer, format=pil_format, **params)
+    data = buffer.getvalue()
+    return data, {
+        "format": fmt,
+        "mime_type": mime_type,
+        "encode_ms": round((time.perf_counter() - started) * 1000, 1),
+        "output_bytes": len(data),
+    }
@@ -0,0 +1,169 @@
+# Überlappende Boxen (z.B. bei Menschenmengen) zu Regionen zusammenfassen, damit censor() jeden Pixel nur einmal
+# bearbeitet. Eine Region ist eine Gruppe von Boxen, die sich (auch über Umwege) überlappen; dazu gehört das
+# umschließende Rechteck und eine Maske, welche Pixel darin wirklich von einer Box abgedeckt sind.
+# Der Aufwand hängt damit von der abgedeckten Fläche ab, nicht von der Summe der Box-Flächen, und das Ergebnis
+# nicht von der Reihenfolge der Boxen.
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (left, up, right, down), right/down exklusiv, auf das Bild zugeschnitten
+Rect = Tuple[int, int, int, int]
+
+
+class Region:
+    """Eine Gruppe sich überlappender Boxen"""
+
+    def __init__(self, indices: List[int], rect: Rect, coverage: Optional[np.ndarray]):
+        self.indices = indices          # Indizes der Boxen, aufsteigend
+        self.rect = rect                # umschließendes Rechteck aller Boxen der Gruppe
+        self.coverage = coverage        # bool-Maske in der Größe von rect, None = das ganze Rechteck ist abgedeckt
+
+    @property
+    def area(self) -> int:
+        left, up, right, down = self.rect
+        if self.coverage is None:
+            return (right - left) * (down - up)
+        return int(np.count_nonzero(self.coverage))
+
+
+# Ab dieser Zahl Kandidaten-Paare pro Rechteck (im Mittel) wird pro Rechteck nur diese Zahl geprüft, siehe RegionSet
+MAX_CANDIDATES = 16
+
+
+def _edge_components(count: int, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """
+    Zusammenhangskomponenten eines Graphen mit Kanten first[k]-second[k]: für jeden Knoten der kleinste Index seiner
+    Komponente. Pro Runde wird die Wurzel jeder Kante an die kleinere Wurzel der Gegenseite gehängt, danach per
+    Pointer-Jumping (Label des Labels) wieder flach gemacht; alles vektorisiert, meist nur wenige Runden.
+    """
+    labels = np.arange(count)
+    while True:
+        root_first, root_second = labels[first], labels[second]
+        if np.array_equal(root_first, root_second):
+            return labels
+        np.minimum.at(labels, root_first, root_second)
+        np.minimum.at(labels, root_second, root_first)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+def _overlap_components(rects: np.ndarray, max_candidates: Optional[int] = None) -> Tuple[np.ndarray, bool]:
+    """
+    Zusammenhangskomponenten des Überlappungs-Graphen: für jedes Rechteck der kleinste Index seiner Komponente.
+
+    Sweep über die nach 'left' sortierten Rechtecke: Kandidaten für ein Rechteck sind nur die folgenden, deren 'left'
+    noch vor seinem 'right' liegt (per searchsorted), davon die mit Überlappung in y sind Kanten. Der Aufwand folgt
+    der Zahl der Kandidaten-Paare, bei einem dichten Haufen ist das immer noch n². Gibt es mit max_candidates
+    mehr als max_candidates Paare pro Rechteck, werden pro Rechteck nur die ersten max_candidates Kandidaten geprüft:
+    die Komponenten sind dann evtl. feiner als die echten, jede Zusammenlegung stimmt aber (siehe RegionSet).
+
+    Returns:
+        (Labels, ob alle Kandidaten geprüft wurden)
+    """
+    count = len(rects)
+    order = np.argsort(rects[:, 0], kind="stable")
+    left, up, right, down = (rects[order, i] for i in range(4))
+
+    # alle Kandidaten-Paare (first < second in Sortier-Reihenfolge) auf einmal aufzählen
+    lengths = np.maximum(np.searchsorted(left, right, side="left") - np.arange(1, count + 1), 0)
+    complete = max_candidates is None or lengths.sum() <= max_candidates * count
+    if not complete:
+        lengths = np.minimum(lengths, max_candidates)
+    first = np.repeat(np.arange(count), lengths)
+    offsets = np.arange(len(first)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    second = first + 1 + offsets
+    overlapping = (up[second] < down[first]) & (up[first] < down[second])
+    return _edge_components(count, order[first[overlapping]], order[second[overlapping]]), complete
+
+
+def _rect_coverage(rects: List[Rect], bounds: Rect) -> np.ndarray:
+    """Vereinigung von Rechtecken als Maske über 'bounds', per 2D-Differenzen-Array (Aufwand: Fläche von bounds)"""
+    left, up, right, down = bounds
+    corners = np.asarray(rects) - (left, up, left, up)
+    diff = np.zeros((down - up + 1, right - left + 1), dtype=np.int32)
+    np.add.at(diff, (corners[:, 1], corners[:, 0]), 1)
+    np.add.at(diff, (corners[:, 1], corners[:, 2]), -1)
+    np.add.at(diff, (corners[:, 3], corners[:, 0]), -1)
+    np.add.at(diff, (corners[:, 3], corners[:, 2]), 1)
+    np.cumsum(diff, axis=0, out=diff)
+    np.cumsum(diff, axis=1, out=diff)
+    return diff[:-1, :-1] > 0
+
+
+def _mask_coverage(masks: List[Tuple[slice, slice, np.ndarray]], bounds: Rect) -> np.ndarray:
+    """Vereinigung von Masken (z.B. gedrehte Augenbalken aus rotated_rect_mask) über 'bounds'"""
+    left, up, right, down = bounds
+    coverage = np.zeros((down - up, right - left), dtype=bool)
+    for slice_y, slice_x, mask in masks:
+        coverage[slice_y.start - up:slice_y.stop - up, slice_x.start - left:slice_x.stop - left] |= mask
+    return coverage
+
+
+class RegionSet:
+    """
+    Boxen einmal zusammenfassen: überlappende Boxen landen in einer Region, bis sich die umschließenden Rechtecke
+    der Regionen nicht mehr überlappen. Die Regionen sind damit disjunkt und können in beliebiger Reihenfolge
+    (oder als einzelne Ausschnitte) geschrieben werden.
+
+    Args:
+        rects: pro Box das Rechteck der Pixel, die sie verändert (None = Box liegt außerhalb des Bildes)
+        masks: optional pro Box (slice_y, slice_x, maske) für nicht-rechteckige Formen, rects[i] ist dann deren
+            Bounding-Box
+    """
+
+    def __init__(self, rects: Sequence[Optional[Rect]], masks: Optional[Sequence] = None):
+        self.rects = rects
+        self.masks = masks
+        indices = [i for i, rect in enumerate(rects) if rect is not None]
+        groups = [[i] for i in indices]
+        bounds = [rects[i] for i in indices]
+        while len(groups) > 1:
+            # Bei einem dichten Haufen zuerst nur wenige Kandidaten pro Rechteck: das reicht meist schon, um ihn in
+            # einem Durchlauf zusammenzulegen. Erst wenn dabei nichts mehr zusammenkommt, alle Paare prüfen (dann
+            # sind die Rechtecke der Gruppen weitgehend disjunkt und es gibt nur noch wenige Kandidaten).
+            labels, complete = _overlap_components(np.asarray(bounds), MAX_CANDIDATES)
+            if len(np.unique(labels)) == len(groups):
+                if complete:
+                    break
+                labels, _ = _overlap_components(np.asarray(bounds))
+                if len(np.unique(labels)) == len(groups):
+                    break
+            merged = {}
+            for group, rect, label in zip(groups, bounds, labels.tolist()):
+                if label in merged:
+                    members, other = merged[label]
+                    members.extend(group)
+                    merged[label] = (members, (min(rect[0], other[0]), min(rect[1], other[1]),
+                                               max(rect[2], other[2]), max(rect[3], other[3])))
+                else:
+                    merged[label] = (list(group), rect)
+            groups = [members for members, _ in merged.values()]
+            bounds = [rect for _, rect in merged.values()]
+        self.regions = [Region(sorted(group), rect, self._coverage(group, rect)) for group, rect in zip(groups, bounds)]
+
+    def _coverage(self, group: List[int], bounds: Rect) -> Optional[np.ndarray]:
+        if self.masks is not None:
+            if len(group) == 1:
+                coverage = self.masks[group[0]][2]      # Maske hat schon die Größe der Bounding-Box
+            else:
+                coverage = _mask_coverage([self.masks[i] for i in group], bounds)
+        elif len(group) == 1:
+            return None
+        else:
+            coverage = _rect_coverage([self.rects[i] for i in group], bounds)
+        return None if coverage.all() else coverage
+
+    def __iter__(self):
+        return iter(self.regions)
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    @property
+    def area(self) -> int:
+        """Anzahl der abgedeckten Pixel (Fläche der Vereinigung aller Boxen)"""
+        return sum(region.area for region in self.regions)
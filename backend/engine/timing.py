@@ -0,0 +1,60 @@
+# Zeitmessung einzelner Verarbeitungsschritte (Decodieren, Erkennung, Zensur, Kodieren, ...).
+# Die Engine markiert ihre Schritte mit stage("name"); wer sich für die Zeiten interessiert
+# (z.B. api/metrics.py für /metrics), meldet sich mit add_listener an. Zusätzlich können die Zeiten
+# pro Request gesammelt werden (für den Server-Timing-Header), ohne dass die Engine Flask kennen muss.
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Callable, Dict, List, Optional, Tuple
+
+_listeners: List[Callable[[str, float], None]] = []
+_collected: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("collected_timings", default=None)
+
+
+def add_listener(listener: Callable[[str, float], None]):
+    """listener(name, sekunden) wird nach jedem Schritt aufgerufen, egal in welchem Thread"""
+    _listeners.append(listener)
+
+
+@contextmanager
+def stage(name: str):
+    """Dauer des with-Blocks als Schritt 'name' erfassen (auch wenn eine Exception auftritt)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        collected = _collected.get()
+        if collected is not None:
+            collected.append((name, duration))
+        for listener in _listeners:
+            listener(name, duration)
+
+
+def timed(name: str):
+    """Decorator-Variante von stage() für ganze Funktionen"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_collecting() -> Token:
+    """Ab jetzt die Schritte im aktuellen Kontext (Thread/ Request) sammeln"""
+    return _collected.set([])
+
+
+def stop_collecting(token: Token):
+    _collected.reset(token)
+
+
+def collected() -> Dict[str, float]:
+    """Gesammelte Zeiten in Sekunden, gleichnamige Schritte (z.B. mehrere Kacheln) zusammengezählt"""
+    totals: Dict[str, float] = {}
+    for name, duration in _collected.get() or []:
+        totals[name] = totals.get(name, 0.0) + duration
+    return totals
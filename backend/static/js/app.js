@@ -5,6 +5,8 @@ import { handleFiles, refreshImagePreviews } from './files.js';
 import { drawDetectionsOnImage } from './canvas.js';
 import { startLoadingAnimation, completeLoadingAnimation } from './animations.js';
 import { setupLightbox } from './lightbox.js';
+import { requestSessionThumbnail } from './previews.js';
+import { sessionRequest, fetchSessionImage, SessionExpiredError } from './sessions.js';
 import { updatePreviewButtonState, updateProcessButtonState } from './ui.js';
 
 function mapAnonymizationMode(frontendMode) {
@@ -156,18 +158,7 @@ document.addEventListener("DOMContentLoaded", () => {
                     startLoadingAnimation(previewElement);
                 }
 
-                const payload = {
-                    subject,
-                    image: imageObj.dataURL,
-                    filename: imageObj.name,
-                    type: imageObj.type
-                };
-
-                const response = await fetch(config.detectApiUrl, {
-                    method: "POST",
-                    headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify(payload)
-                });
+                const response = await sessionRequest(imageObj, "detect", { subject });
 
                 if (!response.ok) {
                     console.error(`Preview request failed for image ${index + 1}:`, response.status);
@@ -178,7 +169,10 @@ document.addEventListener("DOMContentLoaded", () => {
                 console.log(`Preview response for image ${index + 1}:`, data);
 
                 if (data.objects && data.objects.length > 0) {
-                    const imageWithDetections = await drawDetectionsOnImage(imageObj.dataURL, data.objects);
+                    // auf das Thumbnail zeichnen, die Lightbox zeichnet bei Bedarf auf die volle Auflösung
+                    const imageWithDetections = await drawDetectionsOnImage(
+                        imageObj.thumbnailURL || imageObj.dataURL, data.objects, imageObj.thumbnailURL ? imageObj.width : null
+                    );
                     
                     if (previewElement) {
                         const imgElement = previewElement.querySelector('img');
@@ -285,17 +279,9 @@ document.addEventListener("DOMContentLoaded", () => {
             }
 
             try {
-                const payload = {
-                    image: imageObj.dataURL,
-                    boxes: numericBoxes,
-                    mode
-                };
-
-                const response = await fetch(config.censorApiUrl, {
-                    method: "POST",
-                    headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify(payload)
-                });
+                // Server rechnet nur die Boxen neu, die sich seit dem letzten Mal geändert haben. Das volle Bild bleibt
+                // in der Session (Lightbox und Download holen es von dort), die Antwort enthält nur die Ausschnitte
+                const response = await sessionRequest(imageObj, "censor", { boxes: numericBoxes, mode, response: "patches" });
 
                 if (!response.ok) {
                     console.error(`Censor request failed for image ${index + 1}:`, response.status);
@@ -304,15 +290,16 @@ document.addEventListener("DOMContentLoaded", () => {
 
                 const data = await response.json();
 
-                if (!data || data.status !== "success" || !data.censored_image) {
+                if (!data || data.status !== "success" || !data.session_id) {
                     console.error(`Invalid censor response for image ${index + 1}:`, data);
                     continue;
                 }
 
                 state.outputFiles.push({
                     name: imageObj.name,
-                    type: "image/png",
-                    dataURL: data.censored_image
+                    type: data.mime_type || "image/png",
+                    sessionId: data.session_id,
+                    thumbnailURL: await requestSessionThumbnail(data.session_id, "censored")
                 });
                 successCount += 1;
             } catch (error) {
@@ -353,16 +340,23 @@ document.addEventListener("DOMContentLoaded", () => {
         const zip = new window.JSZip();
         const zipFolder = zip.folder("anonymisierte_bilder");
 
-        processedImages.forEach((imageObj, index) => {
+        // Volle Auflösung erst jetzt aus den Sessions holen (ältere Einträge haben noch eine Data-URL)
+        const files = processedImages.map(async (imageObj, index) => {
             const originalName = imageObj.name || `bild_${index + 1}`;
             const baseName = originalName.includes(".")
                 ? originalName.substring(0, originalName.lastIndexOf("."))
                 : originalName;
 
-            zipFolder.file(`${baseName}_anonymisiert.png`, dataUrlToUint8Array(imageObj.dataURL));
+            // Backend behält standardmäßig das Eingabeformat bei (PNG, JPEG oder WebP)
+            const extension = { "image/jpeg": "jpg", "image/webp": "webp" }[imageObj.type] || "png";
+            const content = imageObj.sessionId
+                ? await fetchSessionImage(imageObj.sessionId, "censored")
+                : dataUrlToUint8Array(imageObj.dataURL);
+            zipFolder.file(`${baseName}_anonymisiert.${extension}`, content);
         });
 
-        zip.generateAsync({ type: "blob" })
+        Promise.all(files)
+            .then(() => zip.generateAsync({ type: "blob" }))
             .then((zipBlob) => {
                 const timestamp = new Date().toISOString().replace(/[:.]/g, "-");
                 const link = document.createElement("a");
@@ -377,7 +371,9 @@ document.addEventListener("DOMContentLoaded", () => {
             })
             .catch((error) => {
                 console.error("ZIP creation failed:", error);
-                alert("ZIP-Datei konnte nicht erstellt werden.");
+                alert(error instanceof SessionExpiredError
+                    ? "Die anonymisierten Bilder sind auf dem Server abgelaufen. Bitte erneut anonymisieren."
+                    : "ZIP-Datei konnte nicht erstellt werden.");
             })
             .finally(() => {
                 downloadButton.textContent = originalText;
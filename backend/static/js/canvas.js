@@ -1,5 +1,6 @@
 // Canvas and detection box rendering
-export function drawDetectionsOnImage(imageDataURL, detections) {
+// originalWidth: Breite des Bildes, auf das sich die Boxen beziehen, wenn auf ein verkleinertes Bild (Thumbnail) gezeichnet wird
+export function drawDetectionsOnImage(imageDataURL, detections, originalWidth = null) {
     return new Promise((resolve) => {
         const img = new Image();
         img.onload = () => {
@@ -10,6 +11,7 @@ export function drawDetectionsOnImage(imageDataURL, detections) {
             const ctx = canvas.getContext('2d');
             
             ctx.drawImage(img, 0, 0);
+            const scale = originalWidth ? img.width / originalWidth : 1;
             
             ctx.strokeStyle = '#00ff00';
             ctx.lineWidth = 3;
@@ -18,10 +20,10 @@ export function drawDetectionsOnImage(imageDataURL, detections) {
             
             if (detections && detections.length > 0) {
                 detections.forEach((detection) => {
-                    const x = detection.x;
-                    const y = detection.y;
-                    const w = detection.w;
-                    const h = detection.h;
+                    const x = detection.x * scale;
+                    const y = detection.y * scale;
+                    const w = detection.w * scale;
+                    const h = detection.h * scale;
                     
                     const rectX = x - w / 2;
                     const rectY = y - h / 2;
@@ -27,6 +27,14 @@ export function initIndexedDB() {
     });
 }
 
+// Gespeichert werden Thumbnail, Session-ID und Erkennungen, nicht die Datei und keine Data-URL in voller Auflösung
+// (ältere Einträge behalten ihre Data-URL, bis sie eine Session haben)
+function storedImage(imageObj) {
+    const { file, ...stored } = imageObj;
+    if (stored.sessionId) delete stored.dataURL;
+    return stored;
+}
+
 export function saveImagesToIndexedDB() {
     if (!state.dbAvailable || !state.db) {
         return Promise.resolve();
@@ -41,8 +49,8 @@ export function saveImagesToIndexedDB() {
             
             clearRequest.onsuccess = () => {
                 const appState = {
-                    uploadedFiles: state.uploadedFiles,
-                    outputFiles: state.outputFiles
+                    uploadedFiles: state.uploadedFiles.map(storedImage),
+                    outputFiles: state.outputFiles.map(storedImage)
                 };
 
                 const putRequest = store.put(appState, "images");
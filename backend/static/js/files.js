@@ -1,6 +1,8 @@
 // File handling functions
 import { state, config } from './state.js';
 import { saveImagesToIndexedDB } from './db.js';
+import { requestSessionThumbnail } from './previews.js';
+import { ensureSession } from './sessions.js';
 import { updateDeleteAllButtonVisibility, updatePreviewButtonState, updateProcessButtonState } from './ui.js';
 
 export function handleFiles(files) {
@@ -14,20 +16,44 @@ export function handleFiles(files) {
 
     const filesToAdd = Array.from(files).slice(0, config.maxFiles - state.uploadedFiles.length);
 
-    filesToAdd.forEach(file => {
-        const reader = new FileReader();
-        reader.onload = (e) => {
-            state.uploadedFiles.push({ 
-                name: file.name, 
-                type: file.type, 
-                dataURL: e.target.result 
+    // Platzhalter in Upload-Reihenfolge anlegen; in den State kommen sie, sobald alle davor fertig sind.
+    // Die Reihenfolge hängt so nicht davon ab, welcher Upload oder welches Thumbnail zuerst fertig ist.
+    // Gespeichert werden nur Session-ID und Thumbnail, die Datei bleibt für ein erneutes Hochladen im Speicher.
+    const placeholders = filesToAdd.map(file => ({
+        name: file.name, type: file.type, file, sessionId: null, thumbnailURL: null, loaded: false, failed: false
+    }));
+    let shown = 0;
+
+    function showLoadedFiles() {
+        while (shown < placeholders.length && placeholders[shown].loaded) {
+            const imageObj = placeholders[shown];
+            shown += 1;
+            if (imageObj.failed) continue;              // nicht hochladbar, übersprungen
+            delete imageObj.loaded;
+            delete imageObj.failed;
+            state.uploadedFiles.push(imageObj);
+        }
+        updatePreviewButtonState();
+        updateProcessButtonState();
+        saveImagesToIndexedDB();
+        refreshImagePreviews();
+    }
+
+    filesToAdd.forEach((file, position) => {
+        const placeholder = placeholders[position];
+        ensureSession(placeholder)
+            .then((sessionId) => requestSessionThumbnail(sessionId, "original"))
+            .then((thumbnailURL) => {
+                placeholder.thumbnailURL = thumbnailURL;
+            })
+            .catch((error) => {
+                console.warn("Could not upload file:", file.name, error);
+                placeholder.failed = true;
+            })
+            .finally(() => {
+                placeholder.loaded = true;
+                showLoadedFiles();
             });
-            updatePreviewButtonState();
-            updateProcessButtonState();
-            saveImagesToIndexedDB();
-            refreshImagePreviews();
-        };
-        reader.readAsDataURL(file);
     });
 }
 
@@ -42,7 +68,7 @@ export function displayImagePreview(imageObj, index) {
     previewWrapper.dataset.fileIndex = index;
 
     const img = document.createElement("img");
-    img.src = imageObj.dataURL;
+    img.src = imageObj.previewImage || imageObj.thumbnailURL || imageObj.dataURL || "";
     img.alt = "Bildvorschau";
     img.style.cursor = "pointer";
     img.title = "Klicken für große Ansicht";
@@ -81,7 +107,7 @@ export function displayImagePreview(imageObj, index) {
 
 export function displayOutputPreview(imageObj, index) {
     const outputPreviewGrid = document.getElementById("output-preview-grid");
-    if (!outputPreviewGrid || !imageObj.dataURL) return;
+    if (!outputPreviewGrid) return;
 
     const openLightbox = window.openLightboxFunc;
 
@@ -90,7 +116,7 @@ export function displayOutputPreview(imageObj, index) {
     outputWrapper.dataset.fileIndex = index;
 
     const img = document.createElement("img");
-    img.src = imageObj.dataURL;
+    img.src = imageObj.thumbnailURL || imageObj.dataURL || "";
     img.alt = "Ausgabevorschau";
     img.style.cursor = "pointer";
     img.title = "Klicken für große Ansicht";
@@ -1,5 +1,20 @@
 // Lightbox modal functionality
 import { state } from './state.js';
+import { fetchSessionImage } from './sessions.js';
+import { drawDetectionsOnImage } from './canvas.js';
+
+// Volle Auflösung aus der Session, bei der Vorschau mit den erkannten Boxen. Gibt eine URL zurück (Object-URL
+// oder Data-URL), null ohne Session
+async function loadFullImage(imageObj, view) {
+    if (!imageObj.sessionId) return null;
+    const url = URL.createObjectURL(await fetchSessionImage(imageObj.sessionId, view));
+    if (view === "censored" || !imageObj.detections) return url;
+    try {
+        return await drawDetectionsOnImage(url, imageObj.detections);
+    } finally {
+        URL.revokeObjectURL(url);
+    }
+}
 
 export function setupLightbox() {
     const lightboxModal = document.getElementById("lightbox-modal");
@@ -24,9 +39,17 @@ export function setupLightbox() {
         document.body.style.overflow = "hidden";
     }
     
+    let fullImageURL = null;                    // Object-URL des gerade gezeigten Bildes, wird beim Wechsel freigegeben
+
+    function releaseFullImage() {
+        if (fullImageURL && fullImageURL.startsWith("blob:")) URL.revokeObjectURL(fullImageURL);
+        fullImageURL = null;
+    }
+
     function closeLightbox() {
         lightboxModal.classList.remove("active");
         document.body.style.overflow = "";
+        releaseFullImage();
     }
     
     function updateLightboxImage(lightboxImage, lightboxCounter, lightboxPrev, lightboxNext) {
@@ -34,11 +57,25 @@ export function setupLightbox() {
         const imageObj = currentItems[state.currentLightboxIndex];
         if (!imageObj) return;
 
-        const imageToShow = state.currentLightboxView === "output"
-            ? (imageObj.dataURL || imageObj.censoredImage || imageObj.previewImage)
-            : (imageObj.previewImage || imageObj.dataURL);
-
-        lightboxImage.src = imageToShow;
+        // Erst das Thumbnail zeigen, dann die volle Auflösung aus der Session nachladen
+        const output = state.currentLightboxView === "output";
+        releaseFullImage();
+        lightboxImage.src = output
+            ? (imageObj.thumbnailURL || imageObj.dataURL)
+            : (imageObj.previewImage || imageObj.thumbnailURL || imageObj.dataURL);
+        loadFullImage(imageObj, output ? "censored" : "original")
+            .then((url) => {
+                if (!url) return;
+                if (getCurrentLightboxItems()[state.currentLightboxIndex] !== imageObj
+                        || !lightboxModal.classList.contains("active")) {
+                    if (url.startsWith("blob:")) URL.revokeObjectURL(url);   // inzwischen weitergeblättert
+                    return;
+                }
+                releaseFullImage();
+                fullImageURL = url;
+                lightboxImage.src = url;
+            })
+            .catch((error) => console.warn("Full resolution not available:", error));
         
         lightboxCounter.textContent = `${state.currentLightboxIndex + 1} / ${currentItems.length}`;
         
@@ -0,0 +1,26 @@
+// Thumbnails vom Server (/api/v1/sessions/<id>/preview): Galerie und State halten nur kleine Bilder, die volle
+// Auflösung holen Lightbox und Download erst bei Bedarf aus der Session (siehe sessions.js)
+import { config } from './state.js';
+
+function blobToDataURL(blob) {
+    return new Promise((resolve, reject) => {
+        const reader = new FileReader();
+        reader.onload = () => resolve(reader.result);
+        reader.onerror = () => reject(reader.error);
+        reader.readAsDataURL(blob);
+    });
+}
+
+// Thumbnail des Session-Bildes, view: "original" oder "censored" (zuletzt zensierte Fassung)
+export async function requestSessionThumbnail(sessionId, view = "original") {
+    try {
+        const response = await fetch(
+            `${config.sessionApiUrl}/${sessionId}/preview?view=${view}&size=${config.thumbnailSize}`
+        );
+        if (!response.ok) return null;
+        return await blobToDataURL(await response.blob());
+    } catch (error) {
+        console.warn("Session thumbnail request failed:", error);
+        return null;
+    }
+}
@@ -0,0 +1,58 @@
+// Bild-Sessions (/api/v1/sessions): das Bild liegt einmal auf dem Server, das Frontend hält nur Session-ID und
+// Thumbnail. Die Datei selbst (imageObj.file) bleibt nur im Speicher, für ein neues Hochladen nach Ablauf der Session.
+import { config } from './state.js';
+
+export class SessionExpiredError extends Error {}
+
+// Bild als Session hochladen (Datei direkt als Multipart, ohne Data-URL), merkt sich ID und Größe am imageObj
+export async function ensureSession(imageObj) {
+    if (imageObj.sessionId) return imageObj.sessionId;
+
+    if (!imageObj.file && imageObj.dataURL) {                    // Einträge aus älteren Versionen
+        imageObj.file = await (await fetch(imageObj.dataURL)).blob();
+    }
+    const file = imageObj.file;
+    if (!file) {
+        throw new SessionExpiredError(`Session for ${imageObj.name} expired, please upload the image again`);
+    }
+    const form = new FormData();
+    form.append("image", file, imageObj.name);
+    const response = await fetch(config.sessionApiUrl, { method: "POST", body: form });
+    if (!response.ok) {
+        throw new Error(`Session request failed: ${response.status}`);
+    }
+    const data = await response.json();
+    imageObj.sessionId = data.session_id;
+    imageObj.width = data.width;
+    imageObj.height = data.height;
+    return imageObj.sessionId;
+}
+
+// POST an /api/v1/sessions/<id>/<action>. Ist die Session abgelaufen oder der Server neu gestartet (404),
+// wird das Bild einmal neu hochgeladen
+export async function sessionRequest(imageObj, action, payload) {
+    let response;
+    for (let attempt = 0; attempt < 2; attempt += 1) {
+        const sessionId = await ensureSession(imageObj);
+        response = await fetch(`${config.sessionApiUrl}/${sessionId}/${action}`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify(payload)
+        });
+        if (response.status !== 404) break;
+        imageObj.sessionId = null;
+    }
+    return response;
+}
+
+// Session-Bild in voller Auflösung als Blob, view: "original" oder "censored" (zuletzt zensierte Fassung)
+export async function fetchSessionImage(sessionId, view = "original") {
+    const response = await fetch(`${config.sessionApiUrl}/${sessionId}/image?view=${view}`);
+    if (response.status === 404) {
+        throw new SessionExpiredError(`Session ${sessionId} expired`);
+    }
+    if (!response.ok) {
+        throw new Error(`Image request failed: ${response.status}`);
+    }
+    return await response.blob();
+}
@@ -22,6 +22,9 @@ export const state = {
 export const config = {
     detectApiUrl: `${getApiBaseUrl()}/api/v1/detect`,
     censorApiUrl: `${getApiBaseUrl()}/api/v1/censor`,
+    sessionApiUrl: `${getApiBaseUrl()}/api/v1/sessions`,
+    previewApiUrl: `${getApiBaseUrl()}/api/v1/preview`,
+    thumbnailSize: 256,
     maxFiles: 10
 };
 
@@ -0,0 +1,320 @@
+# benchmark.py
+# Reproduzierbare Laufzeitmessung für Engine und API, ohne laufenden Server und ohne Testbilder:
+# die Bilder werden synthetisch erzeugt (feste Auflösungen, feste Boxen), gemessen wird der Median mehrerer Läufe.
+#
+# Aufruf aus backend/:
+#   python -m tests.benchmark --output bench.json                       # messen und speichern
+#   python -m tests.benchmark --compare bench.json --threshold 1.25     # erneut messen und mit altem Ergebnis vergleichen
+# Beim Vergleich endet das Skript mit Exit-Code 1, wenn ein Eintrag mehr als threshold-mal so langsam ist.
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from engine.image_adapter import piltonp, nptopil, downscale, encode_image
+from engine.censor import censor
+from engine.cache import detection_cache
+from engine import detector
+
+# Auflösungen (Breite, Höhe) und Anzahl Gesichter pro Bild
+RESOLUTIONS = [(640, 480), (1920, 1080), (4000, 3000)]
+QUICK_RESOLUTIONS = [(640, 480), (1920, 1080)]
+FACE_COUNTS = [1, 5, 20]
+CROWD_SIZE = 500
+DENSE_SIZE = 2000
+SCATTERED_SIZE = 2000
+
+
+def face_boxes(width: int, height: int, count: int) -> List[Tuple[int, int, int, int]]:
+    """Feste Gesichts-Boxen (x_mitte, y_mitte, halbe_breite, halbe_höhe) in einem gleichmäßigen Raster"""
+    columns = int(np.ceil(np.sqrt(count)))
+    rows = int(np.ceil(count / columns))
+    half = max(8, min(width // (2 * columns), height // (2 * rows)) * 3 // 5)
+    boxes = []
+    for i in range(count):
+        row, column = divmod(i, columns)
+        x = (2 * column + 1) * width // (2 * columns)
+        y = (2 * row + 1) * height // (2 * rows)
+        boxes.append((x, y, half, half))
+    return boxes
+
+
+def eye_pairs(boxes) -> List:
+    """Zu jeder Gesichts-Box ein Augenpaar im Format von censor(..., 'eyeBar')"""
+    pairs = []
+    for x, y, half_w, half_h in boxes:
+        eye_w, eye_h = max(2, half_w // 5), max(1, half_h // 8)
+        dy = half_h // 4
+        pairs.append([(x - half_w // 3, y - dy, eye_w, eye_h), (x + half_w // 3, y - dy, eye_w, eye_h)])
+    return pairs
+
+
+def crowd_boxes(width: int, height: int, count: int) -> List[Tuple[int, int, int, int]]:
+    """Viele überlappende Boxen in der Bildmitte (feste Zufallsfolge), wie bei einem Foto einer Menschenmenge"""
+    rng = np.random.default_rng(0)
+    half = max(4, min(width, height) // 40)
+    xs = rng.integers(width // 4, 3 * width // 4, count)
+    ys = rng.integers(height // 4, 3 * height // 4, count)
+    sizes = rng.integers(half, 2 * half, count)
+    return [(int(x), int(y), int(size), int(size)) for x, y, size in zip(xs, ys, sizes)]
+
+
+def scattered_boxes(width: int, height: int, count: int) -> List[Tuple[int, int, int, int]]:
+    """Viele kleine Boxen über das ganze Bild verteilt (feste Zufallsfolge), nur wenige überlappen sich"""
+    rng = np.random.default_rng(1)
+    half = max(2, min(width, height) // 200)
+    xs = rng.integers(0, width, count)
+    ys = rng.integers(0, height, count)
+    sizes = rng.integers(half, 2 * half, count)
+    return [(int(x), int(y), int(size), int(size)) for x, y, size in zip(xs, ys, sizes)]
+
+
+def bounding_box(boxes) -> Tuple[int, int, int, int]:
+    """Eine Box (x_mitte, y_mitte, halbe_breite, halbe_höhe) über alle Boxen"""
+    left = min(x - half_w for x, _, half_w, _ in boxes)
+    right = max(x + half_w for x, _, half_w, _ in boxes)
+    up = min(y - half_h for _, y, _, half_h in boxes)
+    down = max(y + half_h for _, y, _, half_h in boxes)
+    return ((left + right) // 2, (up + down) // 2, (right - left + 1) // 2, (down - up + 1) // 2)
+
+
+def synthetic_image(width: int, height: int, boxes, seed: int = 0) -> np.ndarray:
+    """Farbverlauf mit Rauschen, an jeder Box ein hautfarbenes Oval mit Augen und Mund (immer gleich bei gleichem seed)"""
+    rng = np.random.default_rng(seed)
+    gradient_x = np.linspace(40, 200, width, dtype=np.float32)[np.newaxis, :]
+    gradient_y = np.linspace(60, 180, height, dtype=np.float32)[:, np.newaxis]
+    base = np.stack([gradient_x + 0 * gradient_y, 0 * gradient_x + gradient_y, (gradient_x + gradient_y) / 2], axis=2)
+    base += rng.normal(0, 12, base.shape).astype(np.float32)
+    image = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8))
+
+    draw = ImageDraw.Draw(image)
+    for x, y, half_w, half_h in boxes:
+        draw.ellipse((x - half_w, y - half_h, x + half_w, y + half_h), fill=(224, 172, 140))
+        eye = max(2, half_w // 6)
+        for ex in (x - half_w // 3, x + half_w // 3):
+            draw.ellipse((ex - eye, y - half_h // 4 - eye // 2, ex + eye, y - half_h // 4 + eye // 2), fill=(40, 30, 30))
+        draw.line((x - half_w // 3, y + half_h // 2, x + half_w // 3, y + half_h // 2), fill=(150, 60, 60), width=max(1, half_h // 15))
+    return piltonp(image)
+
+
+def measure(func: Callable, repeat: int, setup: Callable | None = None) -> Dict:
+    """func einmal zum Aufwärmen, dann repeat-mal ausführen. setup läuft vor jedem Lauf und wird nicht mitgemessen."""
+    if setup:
+        setup()
+    func()
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": round(statistics.median(times), 3), "min_ms": round(min(times), 3), "runs": repeat}
+
+
+def bench_censor(resolutions, repeat: int) -> Dict[str, Dict]:
+    results = {}
+    for width, height in resolutions:
+        for count in FACE_COUNTS:
+            boxes = face_boxes(width, height, count)
+            image = synthetic_image(width, height, boxes)
+            for mode, mode_boxes in (("pixel", boxes), ("blur", boxes), ("eyeBar", eye_pairs(boxes))):
+                name = f"censor.{mode}.{width}x{height}.faces{count}"
+                results[name] = measure(lambda: censor(image, mode_boxes, mode), repeat)
+        # Menschenmenge: 500 stark überlappende Boxen, der Aufwand soll der abgedeckten Fläche folgen
+        boxes = crowd_boxes(width, height, CROWD_SIZE)
+        for mode in ("pixel", "blur"):
+            name = f"censor.{mode}.{width}x{height}.crowd{CROWD_SIZE}"
+            results[name] = measure(lambda: censor(image, boxes, mode), repeat)
+        # Dichter Haufen: das Zusammenfassen darf nicht mit n² wachsen, Vergleich ist eine Box über die ganze Fläche
+        dense = crowd_boxes(width, height, DENSE_SIZE)
+        results[f"censor.pixel.{width}x{height}.crowd{DENSE_SIZE}"] = measure(lambda: censor(image, dense, "pixel"), repeat)
+        union = [bounding_box(dense)]
+        results[f"censor.pixel.{width}x{height}.crowd{DENSE_SIZE}.union"] = measure(lambda: censor(image, union, "pixel"), repeat)
+        # Viele verstreute Boxen: das Zusammenfassen zu Regionen soll mit den Überlappungen wachsen, nicht mit n²
+        scattered = scattered_boxes(width, height, SCATTERED_SIZE)
+        name = f"censor.pixel.{width}x{height}.scattered{SCATTERED_SIZE}"
+        results[name] = measure(lambda: censor(image, scattered, "pixel"), repeat)
+    return results
+
+
+def bench_detection(resolutions, repeat: int) -> Dict[str, Dict]:
+    """Einzelne Stufen der Erkennung: Verkleinern, HOG-Detektor, Landmarks, gesamter detect()-Aufruf (ohne Cache)"""
+    detector.warm_up()
+    results = {}
+    for width, height in resolutions:
+        boxes = face_boxes(width, height, 5)
+        image = synthetic_image(width, height, boxes)
+        size = f"{width}x{height}"
+        # Landmarks immer für die festen Boxen, damit die Anzahl unabhängig davon ist, was der Detektor findet
+        locations = [(y - h, x + w, y + h, x - w) for x, y, w, h in boxes]
+        scale = detector.detection_scale(image.shape, max_side=1024)
+
+        results[f"detect.downscale.{size}"] = measure(lambda: downscale(image, scale), repeat)
+        results[f"detect.hog.{size}"] = measure(lambda: detector.locate(image), repeat)
+        results[f"detect.landmarks.{size}.faces5"] = measure(
+            lambda: detector.locate(image, with_landmarks=True, face_locations=locations), repeat)
+        results[f"detect.full.{size}"] = measure(lambda: detector.detect(image, "eyes"), repeat, setup=detection_cache.clear)
+        results[f"detect.cached.{size}"] = measure(lambda: detector.detect(image, "eyes"), repeat)
+    return results
+
+
+def bench_codec(resolutions, repeat: int) -> Dict[str, Dict]:
+    """Base64 und Bildformate hin und zurück"""
+    results = {}
+    for width, height in resolutions:
+        image = synthetic_image(width, height, face_boxes(width, height, 5))
+        pil_image = nptopil(image)
+        size = f"{width}x{height}"
+        png = encode_image(pil_image, "png")[0]
+        encoded = base64.b64encode(png)
+
+        results[f"codec.png_encode.{size}"] = measure(lambda: encode_image(pil_image, "png"), repeat)
+        results[f"codec.png_encode_fast.{size}"] = measure(lambda: encode_image(pil_image, "png", png_compress_level=1), repeat)
+        results[f"codec.jpeg_encode.{size}"] = measure(lambda: encode_image(pil_image, "jpeg"), repeat)
+        results[f"codec.png_decode.{size}"] = measure(lambda: piltonp(Image.open(io.BytesIO(png))), repeat)
+        results[f"codec.base64_encode.{size}"] = measure(lambda: base64.b64encode(png), repeat)
+        results[f"codec.base64_decode.{size}"] = measure(lambda: base64.b64decode(encoded), repeat)
+        results[f"codec.piltonp.{size}"] = measure(lambda: piltonp(pil_image), repeat)
+        results[f"codec.nptopil.{size}"] = measure(lambda: nptopil(image), repeat)
+    return results
+
+
+def bench_api(resolution, repeat: int) -> Dict[str, Dict]:
+    """Flask-Routen über den Test-Client (inkl. JSON, Base64, Erkennung, Zensur und Kodierung)"""
+    import logging
+    from api.app import app
+    logging.getLogger("api.routes").setLevel(logging.WARNING)     # Request-Logging würde die Messung verfälschen
+
+    width, height = resolution
+    boxes = face_boxes(width, height, 5)
+    image = synthetic_image(width, height, boxes)
+    data_url = "data:image/png;base64," + base64.b64encode(encode_image(nptopil(image), "png")[0]).decode()
+    client = app.test_client()
+    size = f"{width}x{height}"
+
+    def post(path, payload):
+        def call():
+            response = client.post(path, json=payload)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        return call
+
+    return {
+        f"api.detect.{size}": measure(post("/api/v1/detect", {"image": data_url, "subject": "face",
+                                                               "filename": "benchmark.png", "type": "image/png"}),
+                                      repeat, setup=detection_cache.clear),
+        f"api.censor.pixel.{size}": measure(post("/api/v1/censor", {"image": data_url, "boxes": boxes, "mode": "pixel"}), repeat),
+        f"api.censor.blur.{size}": measure(post("/api/v1/censor", {"image": data_url, "boxes": boxes, "mode": "blur"}), repeat),
+        f"api.anonymize.{size}": measure(post("/api/v1/anonymize", {"image": data_url, "mode": "pixel"}), repeat,
+                                         setup=detection_cache.clear),
+    }
+
+
+def bench_startup(repeat: int) -> Dict[str, Dict]:
+    """Kaltstart in einem frischen Prozess: Import der App, CLI-Hilfe und das Laden der Modelle"""
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def run(*args):
+        def call():
+            subprocess.run([sys.executable, *args], cwd=backend, check=True, capture_output=True)
+        return call
+
+    return {
+        "startup.python": measure(run("-c", "pass"), repeat),         # Grundlinie, der Rest ist relativ dazu zu lesen
+        "startup.cli_help": measure(run("-m", "cli.main", "--help"), repeat),
+        "startup.import_app": measure(run("-c", "import api.app"), repeat),
+        "startup.import_engine": measure(run("-c", "import engine.detector, engine.censor"), repeat),
+        "startup.warm_up": measure(run("-c", "from engine.detector import warm_up; warm_up()"), repeat),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Tabelle ausgeben, Namen aller Einträge zurückgeben, die mehr als threshold-mal so langsam sind"""
+    regressions = []
+    print(f"{'benchmark':<45} {'alt ms':>10} {'neu ms':>10} {'faktor':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["median_ms"], result["median_ms"]
+        ratio = new / old if old > 0 else 1.0
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{name:<45} {old:>10.2f} {new:>10.2f} {ratio:>8.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark engine and API with synthetic images")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Fail if a benchmark is slower than baseline * threshold")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark (median is reported)")
+    parser.add_argument("--quick", action="store_true", help="Skip the largest resolution")
+    parser.add_argument("--only", nargs="+", choices=["censor", "detect", "codec", "api", "startup"],
+                        default=["censor", "detect", "codec", "api", "startup"], help="Run only these groups")
+    args = parser.parse_args()
+
+    resolutions = QUICK_RESOLUTIONS if args.quick else RESOLUTIONS
+    results: Dict[str, Dict] = {}
+    if "censor" in args.only:
+        results.update(bench_censor(resolutions, args.repeat))
+    if "detect" in args.only:
+        results.update(bench_detection(resolutions, args.repeat))
+    if "codec" in args.only:
+        results.update(bench_codec(resolutions, args.repeat))
+    if "api" in args.only:
+        results.update(bench_api(resolutions[1], args.repeat))
+    if "startup" in args.only:
+        results.update(bench_startup(args.repeat))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks slower than {args.threshold}x baseline")
+            return 1
+        return 0
+
+    for name, result in results.items():
+        print(f"{name:<45} {result['median_ms']:>10.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
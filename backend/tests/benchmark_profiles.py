@@ -0,0 +1,181 @@
+# benchmark_profiles.py
+# Latenz und Trefferquote (Recall) der Erkennungs-Profile (fast/ balanced/ thorough) auf einem festen Bildsatz.
+# Standard-Bildsatz: das Gesicht aus skimage.data.astronaut() in verschiedenen Größen (und um 45° gedreht) auf
+# festen Positionen eingefügt, die richtigen Boxen sind damit bekannt. Dafür muss scikit-image installiert sein
+# (pip install scikit-image), sonst eigene Bilder mit --images angeben.
+#
+# Aufruf aus backend/:
+#   python -m tests.benchmark_profiles                                   # fester Bildsatz, Markdown-Tabelle
+#   python -m tests.benchmark_profiles --images fotos/ --truth fotos.json
+#   python -m tests.benchmark_profiles --profiles fast balanced --repeat 5
+# fotos.json: {"datei.jpg": [{"x": ..., "y": ..., "w": ..., "h": ...}, ...], ...} (Mittelpunkt-Format wie detect()).
+# Ohne --truth wird nur die Latenz und die Anzahl gefundener Gesichter ausgegeben.
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from engine.cache import detection_cache
+from engine.image_adapter import piltonp
+from engine import detector
+from tests.benchmark import measure
+
+# Gesicht im Astronauten-Bild (left, top, right, bottom) und der Ausschnitt, der eingefügt wird (mit Haaren/ Hals)
+ASTRONAUT_FACE = (175, 76, 265, 166)
+ASTRONAUT_HEAD = (130, 20, 310, 230)
+
+SCENE_SIZE = (640, 480)
+# Szenen: (Name, Gesichtsgröße in Pixeln, Anzahl, Drehung in Grad)
+SCENES = [
+    ("portrait", 200, 1, 0),
+    ("group", 90, 6, 0),
+    ("small", 50, 12, 0),
+    ("tilted", 100, 4, 45),
+]
+
+# Ab dieser Überlappung (Intersection over Union) gilt ein Gesicht als gefunden. Bewusst niedrig, weil HOG und CNN
+# unterschiedlich große Boxen um das gleiche Gesicht legen.
+MATCH_IOU = 0.3
+
+
+def _astronaut_head() -> Tuple[Image.Image, Tuple[float, float, float, float]]:
+    """Kopf-Ausschnitt und die Lage des Gesichts darin (relativ, 0-1)"""
+    from skimage import data                            # nur für den Standard-Bildsatz nötig
+    left, top, right, bottom = ASTRONAUT_HEAD
+    head = Image.fromarray(data.astronaut()).crop(ASTRONAUT_HEAD)
+    f_left, f_top, f_right, f_bottom = ASTRONAUT_FACE
+    width, height = right - left, bottom - top
+    return head, ((f_left - left) / width, (f_top - top) / height, (f_right - left) / width, (f_bottom - top) / height)
+
+
+def fixed_image_set() -> List[Tuple[str, np.ndarray, List[Dict]]]:
+    """Der feste Bildsatz: (Name, Bild, richtige Gesichts-Boxen) pro Szene"""
+    head, (rel_left, rel_top, rel_right, rel_bottom) = _astronaut_head()
+    rng = np.random.default_rng(0)
+    images = []
+    for name, face_size, count, angle in SCENES:
+        canvas = Image.fromarray(rng.integers(90, 150, (SCENE_SIZE[1], SCENE_SIZE[0], 3), dtype=np.uint8))
+        # Kopf so skalieren, dass das Gesicht face_size Pixel breit ist
+        factor = face_size / ((rel_right - rel_left) * head.width)
+        scaled = head.resize((round(head.width * factor), round(head.height * factor)), Image.LANCZOS)
+        if angle:
+            scaled = scaled.rotate(angle, resample=Image.BICUBIC, expand=False, fillcolor=(120, 120, 120))
+        columns = int(np.ceil(np.sqrt(count * SCENE_SIZE[0] / SCENE_SIZE[1])))
+        rows = int(np.ceil(count / columns))
+        truth = []
+        for i in range(count):
+            row, column = divmod(i, columns)
+            # Kopf mittig in seine Rasterzelle, Drehung um die Bildmitte verschiebt den Gesichtsmittelpunkt kaum
+            x0 = (2 * column + 1) * SCENE_SIZE[0] // (2 * columns) - scaled.width // 2
+            y0 = (2 * row + 1) * SCENE_SIZE[1] // (2 * rows) - scaled.height // 2
+            canvas.paste(scaled, (x0, y0))
+            center_x = x0 + (rel_left + rel_right) / 2 * scaled.width
+            center_y = y0 + (rel_top + rel_bottom) / 2 * scaled.height
+            truth.append({"type": "face", "x": round(center_x), "y": round(center_y), "w": face_size, "h": face_size})
+        images.append((name, np.asarray(canvas).copy(), truth))
+    return images
+
+
+def folder_image_set(folder: str, truth_path: Optional[str]) -> List[Tuple[str, np.ndarray, Optional[List[Dict]]]]:
+    truth = {}
+    if truth_path:
+        with open(truth_path) as f:
+            truth = json.load(f)
+    images = []
+    for filename in sorted(os.listdir(folder)):
+        if filename.lower().endswith((".png", ".jpg", ".jpeg", ".webp")):
+            image = piltonp(Image.open(os.path.join(folder, filename)))
+            images.append((filename, image, truth.get(filename) if truth_path else None))
+    return images
+
+
+def _iou(a: Dict, b: Dict) -> float:
+    inter_w = min(a["x"] + a["w"] / 2, b["x"] + b["w"] / 2) - max(a["x"] - a["w"] / 2, b["x"] - b["w"] / 2)
+    inter_h = min(a["y"] + a["h"] / 2, b["y"] + b["h"] / 2) - max(a["y"] - a["h"] / 2, b["y"] - b["h"] / 2)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    return inter / (a["w"] * a["h"] + b["w"] * b["h"] - inter)
+
+
+def match(found: List[Dict], truth: List[Dict]) -> Tuple[int, int]:
+    """Greedy-Zuordnung: (gefundene richtige Gesichter, Fehlalarme)"""
+    unused = list(found)
+    hits = 0
+    for expected in truth:
+        scores = [_iou(expected, box) for box in unused]
+        if scores and max(scores) >= MATCH_IOU:
+            unused.pop(int(np.argmax(scores)))
+            hits += 1
+    return hits, len(unused)
+
+
+def bench_profile(profile: str, images, repeat: int) -> Dict:
+    """Erkennung von Gesichtern und Augen (ein Durchlauf, wie bei detect_all) ohne Cache"""
+    total_ms, faces, hits, expected, false_positives = 0.0, 0, 0, 0, 0
+    per_image = {}
+    for name, image, truth in images:
+        timing = measure(lambda: detector.detect_all(image, profile=profile), repeat, setup=detection_cache.clear)
+        found = detector.detect_all(image, profile=profile)["faces"]
+        total_ms += timing["median_ms"]
+        faces += len(found)
+        per_image[name] = {"median_ms": timing["median_ms"], "faces": len(found)}
+        if truth is not None:
+            image_hits, image_false = match(found, truth)
+            hits, expected, false_positives = hits + image_hits, expected + len(truth), false_positives + image_false
+            per_image[name]["recall"] = image_hits / len(truth) if truth else None
+    return {
+        "ms_per_image": total_ms / len(images),
+        "faces": faces,
+        "recall": hits / expected if expected else None,
+        "false_positives": false_positives if expected else None,
+        "images": per_image,
+    }
+
+
+def markdown_table(results: Dict[str, Dict]) -> str:
+    lines = ["| Profil | Detektor | Upsample | Landmarks | ms pro Bild | Gesichter | Recall | Fehlalarme |",
+             "|---|---|---|---|---:|---:|---:|---:|"]
+    for profile, result in results.items():
+        settings = detector.PROFILES[profile]
+        recall = f"{result['recall']:.0%}" if result["recall"] is not None else "-"
+        false_positives = result["false_positives"] if result["false_positives"] is not None else "-"
+        lines.append(f"| {profile} | {settings['model'].upper()} | {settings['upsample']} | "
+                     f"{'5 Punkte' if settings['landmarks'] == 'small' else '68 Punkte'} | "
+                     f"{result['ms_per_image']:.0f} | {result['faces']} | {recall} | {false_positives} |")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Latency and recall of the detection profiles on a fixed image set")
+    parser.add_argument("--images", help="Folder with images (default: synthetic set built from skimage.data.astronaut)")
+    parser.add_argument("--truth", help="JSON file with the expected face boxes per file name (for --images)")
+    parser.add_argument("--profiles", nargs="+", choices=list(detector.PROFILES), default=list(detector.PROFILES))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per image (median is reported)")
+    parser.add_argument("--output", help="Also write the full results (per image) as JSON to this file")
+    args = parser.parse_args()
+
+    if args.images:
+        images = folder_image_set(args.images, args.truth)
+    else:
+        try:
+            images = fixed_image_set()
+        except ImportError:
+            parser.error("the default image set needs scikit-image (pip install scikit-image), or pass --images")
+    if not images:
+        parser.error("no images found")
+
+    results = {profile: bench_profile(profile, images, args.repeat) for profile in args.profiles}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(f"{len(images)} images, median of {args.repeat} runs each\n")
+    print(markdown_table(results))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,245 @@
+# test_api.py
+# Endpunkte über den Flask-Test-Client (ohne laufenden Server): Validierung der Parameter und Form der Antworten.
+#
+# Aufruf aus backend/:
+#   python -m pytest tests/test_api.py
+import base64
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from api import app as app_module, batch, routes
+from api.app import app
+from api.jobs import Job, JobQueue
+from engine.boxes import censor_boxes_for_mode
+from engine.censor import censor
+
+
+def png_bytes(width: int = 64, height: int = 48, seed: int = 0) -> bytes:
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def data_url(image_bytes: bytes) -> str:
+    return "data:image/png;base64," + base64.b64encode(image_bytes).decode("ascii")
+
+
+@pytest.fixture(scope="module")
+def client():
+    return app.test_client()
+
+
+def detect_request(**options) -> dict:
+    return {"subject": "face", "image": data_url(png_bytes()), "filename": "test.png", "type": "image/png", **options}
+
+
+@pytest.mark.parametrize("options", [
+    {"tile_size": 100},                                 # kleiner als MIN_TILE_SIZE
+    {"tile_size": 256},                                 # Standard-Überlappung (256) nicht kleiner als die Kachel
+    {"tile_size": 512, "tile_overlap": 512},
+])
+def test_detect_rejects_tiling_without_progress(client, options):
+    response = client.post("/api/v1/detect", json=detect_request(**options))
+    assert response.status_code == 400
+    assert "tile" in response.get_json()["message"]
+
+
+def decode(url: str) -> np.ndarray:
+    return np.asarray(Image.open(io.BytesIO(base64.b64decode(url.split(",", 1)[1]))))
+
+
+def test_censor_patches_compose_to_the_full_image(client):
+    original = png_bytes(160, 120)
+    boxes = [[40, 40, 15, 12], [52, 48, 10, 10], [130, 90, 20, 25], [5, 110, 8, 8]]
+    request = {"image": data_url(original), "boxes": boxes, "mode": "pixel", "filename": "test.png", "type": "image/png"}
+    full = client.post("/api/v1/censor", json=request).get_json()
+    patched = client.post("/api/v1/censor", json={**request, "response": "patches"}).get_json()
+    assert patched["status"] == "success" and (patched["width"], patched["height"]) == (160, 120)
+    composed = np.asarray(Image.open(io.BytesIO(original))).copy()
+    for patch in patched["patches"]:
+        pixels = decode(patch["image"])
+        assert pixels.shape[:2] == (patch["h"], patch["w"])
+        composed[patch["y"]:patch["y"] + patch["h"], patch["x"]:patch["x"] + patch["w"]] = pixels
+    assert np.array_equal(composed, decode(full["censored_image"]))
+
+
+@pytest.mark.parametrize("sigma", [0, -1, "abc", "inf", "nan"])
+def test_censor_rejects_invalid_blur_sigma(client, sigma):
+    request = {"image": data_url(png_bytes()), "boxes": [[20, 20, 10, 10]], "mode": "blur", "blur_sigma": sigma,
+               "filename": "test.png", "type": "image/png"}
+    response = client.post("/api/v1/censor", json=request)
+    assert response.status_code == 400
+    assert "blur_sigma" in response.get_json()["message"]
+
+
+ANONYMIZE_BOXES = {
+    "pixel": [{"x": 20, "y": 15, "w": 30, "h": 30}, {"x": 100, "y": 60, "w": 40, "h": 35}],
+    "eyeBar": [{"x": 40, "y": 40, "w": 12, "h": 8}, {"x": 70, "y": 44, "w": 12, "h": 8}],
+}
+ANONYMIZE_BOXES["blur"] = ANONYMIZE_BOXES["pixel"]
+
+
+def anonymize_request(mode: str, **fields) -> dict:
+    return {"image": data_url(png_bytes(160, 120)), "mode": mode, "boxes": ANONYMIZE_BOXES[mode],
+            "filename": "test.png", "type": "image/png", **fields}
+
+
+@pytest.mark.parametrize("mode, subject", [("pixel", "face"), ("pixel", None), ("blur", "face"), ("eyeBar", "eyes"), ("eyeBar", "eye")])
+def test_anonymize_censors_the_given_boxes(client, mode, subject):
+    response = client.post("/api/v1/anonymize", json=anonymize_request(mode, subject=subject))
+    assert response.status_code == 200
+    payload = response.get_json()
+    box_type = "eye" if mode == "eyeBar" else "face"
+    assert payload["objects"] == [{"type": box_type, **box} for box in ANONYMIZE_BOXES[mode]]
+    original = np.asarray(Image.open(io.BytesIO(png_bytes(160, 120))))
+    expected = censor(original, censor_boxes_for_mode(payload["objects"], mode), mode)
+    assert np.array_equal(decode(payload["censored_image"]), expected)
+
+
+@pytest.mark.parametrize("mode, subject", [("pixel", "eyes"), ("blur", "eye"), ("eyeBar", "face")])
+def test_anonymize_rejects_a_subject_that_does_not_fit_the_mode(client, mode, subject):
+    response = client.post("/api/v1/anonymize", json=anonymize_request(mode, subject=subject))
+    assert response.status_code == 400
+    assert "does not fit mode" in response.get_json()["message"]
+
+
+def test_anonymize_binary_returns_the_same_image_as_json(client):
+    request = anonymize_request("pixel")
+    as_json = decode(client.post("/api/v1/anonymize", json=request).get_json()["censored_image"])
+    response = client.post("/api/v1/anonymize", content_type="multipart/form-data", data={
+        "image": (io.BytesIO(png_bytes(160, 120)), "test.png", "image/png"),
+        "mode": "pixel",
+        "boxes": json.dumps(ANONYMIZE_BOXES["pixel"]),
+    })
+    assert response.status_code == 200
+    assert response.mimetype == "image/png" and response.headers["X-Censored-Regions"] == "2"
+    assert np.array_equal(np.asarray(Image.open(io.BytesIO(response.data))), as_json)
+
+
+def batch_request(**fields) -> dict:
+    """Zwei gültige Bilder, eine kaputte Data-URL und Bytes, die kein Bild sind"""
+    return {"subject": "face", "images": [
+        {"filename": "a.png", "image": data_url(png_bytes(seed=1))},
+        {"filename": "broken-url.png", "image": "data:image/png;base64"},             # ohne Komma
+        {"filename": "not-an-image.png", "image": data_url(b"this is not a png")},
+        {"filename": "b.png", "image": data_url(png_bytes(seed=2))},
+    ], **fields}
+
+
+def test_detect_batch_streams_one_line_per_image(client):
+    response = client.post("/api/v1/detect/batch", json=batch_request())
+    assert response.status_code == 200 and response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2, 3]
+    assert lines[0]["index"] == 1                   # Fehler beim Decodieren der Data-URL kommen sofort
+    by_index = {line["index"]: line for line in lines}
+    assert [by_index[index]["filename"] for index in range(4)] == ["a.png", "broken-url.png", "not-an-image.png", "b.png"]
+    assert [by_index[index]["status"] for index in range(4)] == ["success", "error", "error", "success"]
+    assert by_index[1]["message"].startswith("Invalid image") and by_index[1]["objects"] == []
+    assert by_index[2]["message"].startswith("Processing failed") and by_index[2]["objects"] == []
+
+
+def test_detect_batch_without_stream_keeps_input_order(client):
+    payload = client.post("/api/v1/detect/batch", json=batch_request(stream=False)).get_json()
+    assert [result["index"] for result in payload["results"]] == [0, 1, 2, 3]
+    assert [result["status"] for result in payload["results"]] == ["success", "error", "error", "success"]
+    assert payload["message"] == "Batch complete, 2 of 4 images processed"
+
+
+def censor_job() -> dict:
+    return {"kind": "censor", "image": data_url(png_bytes()), "boxes": [[20, 20, 10, 10]], "mode": "pixel"}
+
+
+def test_job_is_accepted_then_done_then_gone(client):
+    submitted = client.post("/api/v1/jobs", json=censor_job())
+    assert submitted.status_code == 202
+    job_id = submitted.get_json()["job_id"]
+    done = client.get(f"/api/v1/jobs/{job_id}?wait=30")
+    assert done.status_code == 200
+    assert done.get_json()["status"] == "done" and "censored_image" in done.get_json()["result"]
+    assert client.get(f"/api/v1/jobs/{job_id}").status_code == 410       # Ergebnis nur einmal
+    assert client.get("/api/v1/jobs/unknown").status_code == 404
+
+
+def test_full_job_queue_answers_503_with_retry_after(client, monkeypatch):
+    stalled = JobQueue(workers=1, max_queue=1)
+    monkeypatch.setattr(stalled, "start", lambda: None)                   # keine Worker, die Warteschlange bleibt voll
+    monkeypatch.setattr(routes, "job_queue", stalled)
+    assert client.post("/api/v1/jobs", json=censor_job()).status_code == 202
+    rejected = client.post("/api/v1/jobs", json=censor_job())
+    assert rejected.status_code == 503
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+
+def test_job_result_is_collected_only_once_by_concurrent_polls(monkeypatch):
+    def slow_to_dict(job):
+        time.sleep(0.01)                            # Fenster zwischen Prüfen und Freigeben
+        return {"job_id": job.id, "status": job.status, "result": job.result}
+
+    monkeypatch.setattr(Job, "to_dict", slow_to_dict)
+    job = Job("detect", None, ())
+    job.status, job.result = "done", {"objects": []}
+    collected = JobQueue()
+    with ThreadPoolExecutor(max_workers=8) as threads:
+        results = list(threads.map(lambda _: collected.collect(job), range(8)))
+    assert sum(result is not None for result in results) == 1
+
+
+def test_session_image_serves_original_and_censored_in_full_resolution(client):
+    upload = client.post("/api/v1/sessions", content_type="multipart/form-data",
+                         data={"image": (io.BytesIO(png_bytes(160, 120)), "test.png", "image/png")})
+    assert upload.status_code == 201
+    session_id = upload.get_json()["session_id"]
+    original = np.asarray(Image.open(io.BytesIO(png_bytes(160, 120))))
+    assert client.get(f"/api/v1/sessions/{session_id}/image?view=censored").status_code == 404    # noch nicht zensiert
+
+    response = client.get(f"/api/v1/sessions/{session_id}/image")
+    assert response.status_code == 200 and response.mimetype == "image/png"
+    assert np.array_equal(np.asarray(Image.open(io.BytesIO(response.data))), original)
+
+    boxes = [[40, 40, 15, 12], [120, 80, 20, 20]]
+    client.post(f"/api/v1/sessions/{session_id}/censor", json={"boxes": boxes, "mode": "pixel", "response": "patches"})
+    response = client.get(f"/api/v1/sessions/{session_id}/image?view=censored")
+    assert response.status_code == 200 and response.headers["X-Censored-Regions"] == "2"
+    assert np.array_equal(np.asarray(Image.open(io.BytesIO(response.data))), censor(original, boxes, "pixel"))
+    assert client.get(f"/api/v1/sessions/{session_id}/image?view=other").status_code == 400
+
+
+def test_start_warm_up_starts_one_thread_for_concurrent_requests(monkeypatch):
+    started = []
+
+    class SlowEvent(threading.Event):
+        def is_set(self):
+            flag = super().is_set()
+            time.sleep(0.01)                            # Fenster zwischen Prüfen und Setzen
+            return flag
+
+    monkeypatch.setattr(app_module, "_warm_up_started", SlowEvent())
+    monkeypatch.setattr(app_module, "warm_up_models", lambda: started.append(1))
+    with ThreadPoolExecutor(max_workers=8) as threads:
+        list(threads.map(lambda _: app_module.start_warm_up(), range(8)))
+    time.sleep(0.05)                                    # Warm-up-Threads laufen lassen
+    assert len(started) == 1
+
+
+def test_get_pool_creates_one_pool_for_concurrent_callers(monkeypatch):
+    created = []
+
+    class CountingPool:
+        def __init__(self, **kwargs):
+            created.append(self)
+            time.sleep(0.01)                            # Fenster, in dem ein zweiter Thread ohne Lock auch anlegen würde
+
+    monkeypatch.setattr(batch, "_pool", None)
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", CountingPool)
+    with ThreadPoolExecutor(max_workers=8) as threads:
+        pools = list(threads.map(lambda _: batch.get_pool(), range(8)))
+    assert len(created) == 1 and all(pool is created[0] for pool in pools)
@@ -0,0 +1,70 @@
+# test_cache.py
+# DetectionCache: Treffer, Fehlschläge und LRU-Verdrängung im Speicher, die SQLite-Stufe über einen Neustart hinweg
+# und der Schlüssel aus Pixel-Hash plus Erkennungs-Parametern.
+#
+# Aufruf aus backend/:
+#   python -m pytest tests/test_cache.py
+import numpy as np
+import pytest
+
+from engine.cache import DetectionCache
+
+
+def image(seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (32, 48, 3), dtype=np.uint8)
+
+
+def entry(index: int) -> dict:
+    """Gleiche Form wie in engine.detector: rohe face_locations und Landmarks"""
+    return {"face_locations": [[index, index + 10, index + 10, index]], "face_landmarks": []}
+
+
+def test_miss_then_hit():
+    cache = DetectionCache()
+    key = DetectionCache.key(image(), scale=1.0)
+    assert cache.get(key) is None
+    cache.put(key, entry(1))
+    assert cache.get(key) == entry(1)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_evicts_the_least_recently_used_entry():
+    cache = DetectionCache(max_entries=2)
+    for index in range(2):
+        cache.put(f"k{index}", entry(index))
+    cache.get("k0")                                 # k0 zuletzt benutzt -> k1 ist der älteste Eintrag
+    cache.put("k2", entry(2))
+    assert cache.get("k1") is None
+    assert cache.get("k0") == entry(0) and cache.get("k2") == entry(2)
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_disk_stage_survives_a_restart(tmp_path):
+    path = str(tmp_path / "detections.sqlite")
+    DetectionCache(path=path).put("key", entry(3))
+    restarted = DetectionCache(max_entries=1, path=path)
+    assert restarted.get("key") == entry(3)
+    assert restarted.stats()["disk_hits"] == 1
+    restarted.put("other", entry(4))                # verdrängt "key" aus dem Speicher, die Datei hat ihn noch
+    assert restarted.get("key") == entry(3)
+    assert restarted.stats()["disk_hits"] == 2
+
+
+def test_key_depends_on_pixels_shape_and_options():
+    pixels = image()
+    key = DetectionCache.key(pixels, scale=1.0, tile_size=None)
+    assert DetectionCache.key(pixels.copy(), tile_size=None, scale=1.0) == key       # Reihenfolge egal
+    changed = pixels.copy()
+    changed[0, 0, 0] ^= 1
+    assert DetectionCache.key(changed, scale=1.0, tile_size=None) != key
+    assert DetectionCache.key(pixels.reshape(48, 32, 3), scale=1.0, tile_size=None) != key
+    assert DetectionCache.key(pixels, scale=0.5, tile_size=None) != key
+    assert DetectionCache.key(pixels, scale=1.0, tile_size=512) != key
+
+
+@pytest.mark.parametrize("layout", ["contiguous", "strided"])
+def test_key_ignores_memory_layout(layout):
+    pixels = image()
+    view = pixels if layout == "contiguous" else np.asfortranarray(pixels)
+    assert DetectionCache.key(view, scale=1.0) == DetectionCache.key(pixels, scale=1.0)
@@ -0,0 +1,264 @@
+# test_censor.py
+# Jede Box muss ihre Pixel verändern, auch sehr kleine (ferne Gesichter) und solche am Bildrand. Überlappende Boxen
+# werden zu Regionen zusammengefasst, auch bei einem dichten Haufen ohne quadratischen Aufwand. censor_update ergibt
+# pixelgenau dasselbe wie ein neuer censor()-Aufruf. Der Weichzeichner liegt nah an einem echten Gauß-Filter.
+#
+# Aufruf aus backend/:
+#   python -m pytest tests/test_censor.py
+import math
+import time
+
+import numpy as np
+import pytest
+
+from engine.censor import censor, censor_patches, censor_update, gaussian_blur, _eye_bar
+from engine.regions import RegionSet
+from tests.benchmark import crowd_boxes, bounding_box
+
+HEIGHT, WIDTH = 120, 160
+
+
+@pytest.fixture(scope="module")
+def noise():
+    """Rauschen statt glatter Flächen, sonst wäre der Mittelwert eines Blocks zufällig gleich seinen Pixeln"""
+    return np.random.default_rng(0).integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+
+def boxes():
+    """(x_center, y_center, half_w, half_h): kleine bis mittlere Boxen, innen und über den Bildrand"""
+    for half in (1, 2, 3, 5, 7, 10, 20):
+        for x, y in ((WIDTH // 2, HEIGHT // 2), (0, HEIGHT // 2), (WIDTH - 1, 0), (WIDTH // 3, HEIGHT - 2)):
+            yield (x, y, half, half)
+    yield (50, 40, 1, 6)                            # schmal und hoch
+    yield (90, 70, 9, 1)                            # breit und flach
+
+
+@pytest.mark.parametrize("mode", ["pixel", "blur"])
+@pytest.mark.parametrize("box", list(boxes()), ids=str)
+def test_every_box_changes_its_pixels(noise, mode, box):
+    censored = censor(noise, [box], mode)
+    x, y, half_w, half_h = box
+    left, right = max(0, x - half_w), min(WIDTH, x + half_w)
+    up, down = max(0, y - half_h), min(HEIGHT, y + half_h)
+    inside = np.any(censored[up:down, left:right] != noise[up:down, left:right], axis=-1)
+    assert inside.all(), f"{inside.size - inside.sum()} of {inside.size} pixels unchanged"
+
+
+def exact_gaussian(image: np.ndarray, sigma: float) -> np.ndarray:
+    """Referenz: Gauß-Kern bis 4 sigma in float64, am Rand wird der letzte Pixelwert wiederholt"""
+    radius = int(math.ceil(4 * sigma))
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-offsets ** 2 / (2 * sigma ** 2))
+    kernel /= kernel.sum()
+    blurred = image.astype(np.float64)
+    for axis in (0, 1):
+        pad = [(0, 0)] * blurred.ndim
+        pad[axis] = (radius, radius)
+        padded = np.pad(blurred, pad, mode="edge")
+        length = blurred.shape[axis]
+        blurred = sum(weight * np.take(padded, range(k, k + length), axis=axis) for k, weight in enumerate(kernel))
+    return blurred
+
+
+@pytest.mark.parametrize("sigma, mean_limit, max_limit", [
+    (2.0, 1.0, 6),                                  # Standard-Stärke kleiner Boxen
+    (3.0, 1.0, 6),
+    (8.0, 1.5, 40),                                 # verkleinert gerechnet, einzelne Rauschpixel weichen stärker ab
+])
+def test_gaussian_blur_is_close_to_an_exact_gaussian(noise, sigma, mean_limit, max_limit):
+    error = np.abs(gaussian_blur(noise, sigma) - exact_gaussian(noise, sigma))
+    assert error.mean() < mean_limit and error.max() < max_limit
+
+
+@pytest.mark.parametrize("sigma", [2.0, 3.5])
+@pytest.mark.parametrize("box", [(80, 60, 20, 15), (5, 60, 20, 15), (150, 115, 25, 20)], ids=str)
+def test_blurred_region_matches_blurring_the_whole_image(noise, sigma, box):
+    """Mit dem Rand von 3 sigma sieht der Filter in der Box dieselben Nachbarn wie im ganzen Bild, auch am Bildrand"""
+    censored = censor(noise, [box], "blur", blur_sigma=sigma)
+    x, y, half_w, half_h = box
+    left, right = max(0, x - half_w), min(WIDTH, x + half_w)
+    up, down = max(0, y - half_h), min(HEIGHT, y + half_h)
+    inside = np.zeros((HEIGHT, WIDTH), dtype=bool)
+    inside[up:down, left:right] = True
+    assert np.array_equal(censored[inside], gaussian_blur(noise, sigma)[inside])
+    assert np.array_equal(censored[~inside], noise[~inside])
+
+
+@pytest.mark.parametrize("mode", ["pixel", "blur", "eyeBar"])
+def test_overlapping_boxes_give_the_same_result_in_any_order(noise, mode):
+    rng = np.random.default_rng(7)
+    if mode == "eyeBar":
+        boxes = [[[40 + 6 * i, 50 + 2 * i, 6, 3], [62 + 6 * i, 52 + 2 * i, 6, 3]] for i in range(6)]
+    else:
+        boxes = [[60 + 7 * i, 50 + 4 * (i % 3), 12, 10] for i in range(8)] + [[20, 20, 15, 15], [30, 28, 10, 12]]
+    expected = censor(noise, boxes, mode)
+    for _ in range(5):
+        shuffled = [boxes[i] for i in rng.permutation(len(boxes))]
+        assert np.array_equal(censor(noise, shuffled, mode), expected)
+
+
+def polygon_bar(pair, shape) -> np.ndarray:
+    """Augenbalken wie vor der Maske: gedrehte Gitterpunkte einzeln runden, jeweils ±1 Pixel in x (Referenz)"""
+    (cx, cy), width, height, angle = _eye_bar(pair)
+    c, s = math.cos(angle), math.sin(angle)
+    bar = np.zeros(shape[:2], dtype=bool)
+    for iy in range(int(-height / 2), int(height / 2) + 1):
+        for ix in range(int(-width / 2), int(width / 2) + 1):
+            x, y = round(ix * c - iy * s + cx), round(ix * s + iy * c + cy)
+            bar[y, x - 1:x + 2] = True
+    return bar
+
+
+EYE_PAIRS = [
+    [[100, 100, 8, 5], [160, 100, 8, 5]],           # waagerecht
+    [[100, 90, 8, 5], [160, 110, 9, 4]],            # rechtes Auge tiefer
+    [[100, 110, 6, 5], [150, 80, 8, 6]],            # rechtes Auge höher
+    [[50, 50, 3, 2], [70, 52, 3, 2]],               # kleines, fernes Gesicht
+]
+
+
+@pytest.mark.parametrize("pair", EYE_PAIRS, ids=str)
+def test_eye_bar_matches_rotated_polygon(pair):
+    white = np.full((200, 300, 3), 255, dtype=np.uint8)
+    bar = censor(white, [pair], "eyeBar")[:, :, 0] == 0
+    reference = polygon_bar(pair, white.shape)
+    assert np.count_nonzero(bar & reference) / np.count_nonzero(bar | reference) > 0.9
+    assert np.count_nonzero(bar & reference) / np.count_nonzero(reference) > 0.95
+    # beide Augen liegen ganz unter dem Balken
+    for x, y, half_w, half_h in pair:
+        assert bar[y - half_h:y + half_h + 1, x - half_w:x + half_w + 1].all()
+
+
+@pytest.mark.parametrize("pair", EYE_PAIRS[1:3], ids=str)
+def test_eye_bar_follows_the_tilt(pair):
+    """Gespiegeltes Augenpaar (linkes Auge bleibt zuerst) ergibt den gespiegelten Balken"""
+    white = np.full((200, 300, 3), 255, dtype=np.uint8)
+    width = white.shape[1]
+    mirrored = [[width - 1 - pair[1][0], *pair[1][1:]], [width - 1 - pair[0][0], *pair[0][1:]]]
+    bar = censor(white, [pair], "eyeBar")[:, :, 0] == 0
+    mirrored_bar = censor(white, [mirrored], "eyeBar")[:, ::-1, 0] == 0
+    assert np.count_nonzero(bar & mirrored_bar) / np.count_nonzero(bar | mirrored_bar) > 0.95
+
+
+def fixpoint_groups(rects):
+    """Referenz für RegionSet: Gruppen zusammenlegen, solange sich ihre umschließenden Rechtecke überlappen"""
+    groups = [([i], rect) for i, rect in enumerate(rects)]
+    merged = True
+    while merged:
+        merged = False
+        for a in range(len(groups)):
+            for b in range(a + 1, len(groups)):
+                (first, p), (second, q) = groups[a], groups[b]
+                if p[0] < q[2] and q[0] < p[2] and p[1] < q[3] and q[1] < p[3]:
+                    groups[a] = (first + second, (min(p[0], q[0]), min(p[1], q[1]), max(p[2], q[2]), max(p[3], q[3])))
+                    del groups[b]
+                    merged = True
+                    break
+            if merged:
+                break
+    return sorted(sorted(members) for members, _ in groups)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_region_set_matches_pairwise_merging(seed):
+    rng = np.random.default_rng(seed)
+    count, extent = int(rng.integers(2, 150)), int(rng.integers(50, 400))
+    xs, ys = rng.integers(0, extent, count), rng.integers(0, extent, count)
+    widths, heights = rng.integers(1, 60, count), rng.integers(1, 60, count)
+    rects = [(int(x), int(y), int(x + w), int(y + h)) for x, y, w, h in zip(xs, ys, widths, heights)]
+    assert sorted(region.indices for region in RegionSet(rects)) == fixpoint_groups(rects)
+
+
+def best_ms(func, repeat: int = 5) -> float:
+    func()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    return min(times)
+
+
+def test_dense_crowd_costs_about_its_union_area():
+    """2000 stark überlappende Boxen: in der Größenordnung einer einzigen Box über dieselbe Fläche (früher: n²)"""
+    image = np.random.default_rng(0).integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+    boxes = crowd_boxes(1920, 1080, 2000)
+    dense = best_ms(lambda: censor(image, boxes, "pixel"))
+    union = best_ms(lambda: censor(image, [bounding_box(boxes)], "pixel"))
+    assert dense < 6 * union + 20, f"{dense:.1f} ms for 2000 boxes vs {union:.1f} ms for their union"
+
+
+@pytest.mark.parametrize("mode", ["pixel", "blur", "eyeBar"])
+def test_patches_on_the_original_give_the_censored_image(noise, mode):
+    rng = np.random.default_rng(8)
+    boxes = [eye_pair(rng) if mode == "eyeBar" else face_box(rng) for _ in range(10)]
+    composed = noise.copy()
+    for left, up, patch in censor_patches(noise, boxes, mode):
+        composed[up:up + patch.shape[0], left:left + patch.shape[1]] = patch
+    assert np.array_equal(composed, censor(noise, boxes, mode))
+
+
+def face_box(rng):
+    return [int(rng.integers(0, WIDTH)), int(rng.integers(0, HEIGHT)), int(rng.integers(2, 25)), int(rng.integers(2, 25))]
+
+
+def eye_pair(rng):
+    x, y = int(rng.integers(10, WIDTH - 40)), int(rng.integers(10, HEIGHT - 10))
+    return [[x, y, int(rng.integers(2, 8)), int(rng.integers(2, 5))],
+            [x + int(rng.integers(12, 30)), y + int(rng.integers(-6, 7)), int(rng.integers(2, 8)), int(rng.integers(2, 5))]]
+
+
+def moved(box, mode):
+    if mode == "eyeBar":
+        return [[box[0][0] + 3, box[0][1] + 1, *box[0][2:]], box[1]]
+    return [box[0] + 3, box[1] + 1, *box[2:]]
+
+
+CHANGES = {
+    "added": lambda boxes, rng, new, mode: boxes + [new(rng), new(rng)],
+    "removed": lambda boxes, rng, new, mode: boxes[1:-1],
+    "moved": lambda boxes, rng, new, mode: boxes[:2] + [moved(boxes[2], mode)] + boxes[3:],
+}
+
+
+@pytest.mark.parametrize("mode", ["pixel", "blur", "eyeBar"])
+@pytest.mark.parametrize("change", list(CHANGES))
+def test_censor_update_matches_fresh_censor(noise, mode, change):
+    rng = np.random.default_rng(3)
+    new = eye_pair if mode == "eyeBar" else face_box
+    old_boxes = [new(rng) for _ in range(12)]
+    new_boxes = CHANGES[change](old_boxes, rng, new, mode)
+    target = censor(noise, old_boxes, mode)
+    rects = censor_update(noise, target, old_boxes, new_boxes, mode)
+    expected = censor(noise, new_boxes, mode)
+    assert np.array_equal(target, expected)
+    # außerhalb der gemeldeten Rechtecke hat sich nichts geändert
+    untouched = np.ones(noise.shape[:2], dtype=bool)
+    for left, up, right, down in rects:
+        untouched[up:down, left:right] = False
+    assert np.array_equal(expected[untouched], censor(noise, old_boxes, mode)[untouched])
+
+
+@pytest.mark.parametrize("mode", ["pixel", "blur", "eyeBar"])
+def test_censor_update_over_many_edits(noise, mode):
+    """Viele zufällige Schritte hintereinander auf demselben Bild, auch mit umsortierten Boxen"""
+    rng = np.random.default_rng(4)
+    new = eye_pair if mode == "eyeBar" else face_box
+    boxes = [new(rng) for _ in range(8)]
+    target = censor(noise, boxes, mode)
+    for _ in range(15):
+        edited = list(boxes)
+        for _ in range(int(rng.integers(1, 4))):
+            operation = rng.random()
+            if operation < 0.4 and edited:
+                edited.pop(int(rng.integers(len(edited))))
+            elif operation < 0.8:
+                edited.append(new(rng))
+            elif edited:
+                index = int(rng.integers(len(edited)))
+                edited[index] = moved(edited[index], mode)
+        if rng.random() < 0.3:
+            edited = [edited[i] for i in rng.permutation(len(edited))]
+        censor_update(noise, target, boxes, edited, mode)
+        assert np.array_equal(target, censor(noise, edited, mode))
+        boxes = edited
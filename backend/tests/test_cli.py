@@ -0,0 +1,34 @@
+# test_cli.py
+# Ungültige Zahlen-Optionen der CLI brechen mit einer klaren argparse-Meldung ab (Exit-Code 2), bevor ein Bild
+# gelesen wird, genau wie die API mit 400 antwortet.
+#
+# Aufruf aus backend/:
+#   python -m pytest tests/test_cli.py
+import sys
+
+import pytest
+
+from cli import main as cli
+
+
+@pytest.mark.parametrize("option, value, message", [
+    ("--max-side", "0", "argument --max-side: must be positive, got 0"),
+    ("--max-side", "-5", "argument --max-side: must be positive, got -5"),
+    ("--max-side", "big", "argument --max-side: must be a whole number, got 'big'"),
+    ("--min-face-size", "0", "argument --min-face-size: must be positive, got 0"),
+    ("--min-face-size", "1.5", "argument --min-face-size: must be a whole number, got '1.5'"),
+    ("--quality", "0", "argument --quality: must be between 1 and 100, got 0"),
+    ("--quality", "101", "argument --quality: must be between 1 and 100, got 101"),
+    ("--quality", "high", "argument --quality: must be a whole number, got 'high'"),
+])
+def test_invalid_numbers_are_rejected(monkeypatch, capsys, tmp_path, option, value, message):
+    monkeypatch.setattr(sys, "argv", ["cli", str(tmp_path), option, value])
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main()
+    assert exit_info.value.code == 2
+    assert message in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("value, expected", [("1", 1), ("100", 100), ("85", 85)])
+def test_quality_accepts_the_full_range(value, expected):
+    assert cli.quality(value) == expected
@@ -0,0 +1,75 @@
+# test_frames.py
+# Keyframe-Auswahl von track_detections (Intervall, Szenenwechsel, Übernahme der Boxen) und die Speichergrenze
+# beim Schreiben von APNG/ TIFF/ WebP.
+#
+# Aufruf aus backend/:
+#   python -m pytest tests/test_frames.py
+import numpy as np
+import pytest
+from PIL import Image
+
+from engine.frames import track_detections, save_frames, check_buffered, FrameBufferError
+
+
+def solid(value: int, size: int = 64) -> np.ndarray:
+    return np.full((size, size, 3), value, dtype=np.uint8)
+
+
+def run(frames, keyframe_interval=10, scene_threshold=20.0):
+    """track_detections mit einer Erkennung, die nur mitzählt: Boxen = Nummer des Aufrufs"""
+    calls = []
+
+    def detect_fn(frame):
+        calls.append(frame)
+        return [len(calls)]
+
+    results = list(track_detections(((frame, {}) for frame in frames), detect_fn, keyframe_interval, scene_threshold))
+    return [is_key for _, _, _, is_key in results], [boxes for _, _, boxes, _ in results], len(calls)
+
+
+def test_keyframes_every_interval():
+    keys, boxes, calls = run([solid(100)] * 12, keyframe_interval=5)
+    assert keys == [True, False, False, False, False] * 2 + [True, False]
+    assert calls == 3
+    # zwischen den Keyframes werden die Boxen des letzten Keyframes übernommen
+    assert boxes == [[1]] * 5 + [[2]] * 5 + [[3]] * 2
+
+
+def test_scene_change_starts_new_keyframe():
+    frames = [solid(100)] * 3 + [solid(200)] * 3
+    keys, boxes, calls = run(frames, keyframe_interval=10)
+    assert keys == [True, False, False, True, False, False]
+    assert boxes == [[1]] * 3 + [[2]] * 3
+    assert calls == 2
+
+
+def test_small_changes_stay_below_threshold():
+    frames = [solid(100 + i) for i in range(6)]            # langsamer Verlauf, jeder Schritt unter der Schwelle
+    keys, _, _ = run(frames, keyframe_interval=10, scene_threshold=20.0)
+    assert keys == [True] + [False] * 5
+
+
+def test_interval_one_detects_every_frame():
+    keys, _, calls = run([solid(100)] * 4, keyframe_interval=1)
+    assert keys == [True] * 4 and calls == 4
+
+
+def frames_of(count: int, size: int = 64):
+    return ((Image.fromarray(solid(10 * i, size)), {"duration": 40}) for i in range(count))
+
+
+def test_save_frames_refuses_above_buffer_limit(tmp_path):
+    frame_bytes = 64 * 64 * 4
+    with pytest.raises(FrameBufferError):
+        save_frames(frames_of(10), str(tmp_path / "out.png"), "PNG", max_bytes=5 * frame_bytes)
+    save_frames(frames_of(10), str(tmp_path / "out.gif"), "GIF", max_bytes=5 * frame_bytes)   # GIF wird gestreamt
+    assert Image.open(tmp_path / "out.gif").n_frames == 10
+
+
+def test_check_buffered_estimates_from_header(tmp_path):
+    path = tmp_path / "anim.png"
+    save_frames(frames_of(10), str(path), "PNG")
+    image = Image.open(path)
+    check_buffered(image, max_bytes=10 * 64 * 64 * 4)
+    with pytest.raises(FrameBufferError):
+        check_buffered(image, max_bytes=9 * 64 * 64 * 4)
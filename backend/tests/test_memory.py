@@ -0,0 +1,100 @@
+# test_memory.py
+# Speicherbedarf pro Request, gemessen mit tracemalloc in "vollen Kopien des Bildes" (Höhe x Breite x Kanäle Bytes).
+# tracemalloc sieht numpy-Arrays und Python-Bytes, aber nicht den Speicher, den Pillow intern für das decodierte
+# Bild anlegt. Gezählt wird also genau das, was unser Code zusätzlich kopiert.
+#
+# Aufruf aus backend/:
+#   python -m pytest tests/test_memory.py
+import io
+import json
+import logging
+import tracemalloc
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from engine.image_adapter import piltonp, nptopil
+
+# Höchstens so viele volle Kopien des Bildes pro Request: das Array aus piltonp (1) plus Kleinkram
+# (Streifen beim Kopieren, Boxen-Ausschnitte, kodierte Bytes)
+FRAME_COPY_BUDGET = 1.5
+
+WIDTH, HEIGHT = 3000, 2000
+CHANNELS = {"RGB": 3, "RGBA": 4, "L": 1}
+
+
+def synthetic(mode: str) -> Image.Image:
+    """Glatter Verlauf, damit die PNG-Datei klein bleibt und nicht selbst als Kopie zählt"""
+    yy, xx = np.mgrid[0:HEIGHT, 0:WIDTH]
+    gray = ((xx + yy) // 16 % 256).astype(np.uint8)
+    array = gray if mode == "L" else np.dstack([gray] * CHANNELS[mode])
+    return Image.fromarray(array)
+
+
+def png_bytes(mode: str) -> bytes:
+    buffer = io.BytesIO()
+    synthetic(mode).save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def frame_copies(func, frame_bytes: int) -> float:
+    """Spitzenwert des zusätzlich belegten Speichers während func(), geteilt durch die Größe eines Bildes"""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return (peak - baseline) / frame_bytes
+
+
+@pytest.fixture(scope="module")
+def client():
+    logging.disable(logging.INFO)           # Request-Logging würde mitgemessen
+    from api.app import app
+    yield app.test_client()
+    logging.disable(logging.NOTSET)
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L"])
+def test_piltonp_keeps_mode_and_copies_once(mode):
+    image = synthetic(mode)
+    image.load()
+    array = piltonp(image)
+    assert array.shape == (HEIGHT, WIDTH) + ((CHANNELS[mode],) if CHANNELS[mode] > 1 else ())
+    assert array.flags.writeable
+    assert np.array_equal(array, np.asarray(image))
+    assert frame_copies(lambda: piltonp(image), array.nbytes) < 1.2
+
+
+@pytest.mark.parametrize("mode", ["RGBA", "L"])
+def test_nptopil_shares_memory(mode):
+    array = np.asarray(synthetic(mode)).copy()
+    assert frame_copies(lambda: nptopil(array), array.nbytes) < 0.1
+    assert nptopil(array).mode == mode
+
+
+def test_piltonp_converts_palette_with_transparency_to_rgba():
+    image = synthetic("RGB").convert("P")
+    image.info["transparency"] = 0
+    assert piltonp(image).shape == (HEIGHT, WIDTH, 4)
+
+
+@pytest.mark.parametrize("censor_mode", ["pixel", "blur", "eyeBar"])
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L"])
+def test_anonymize_frame_copy_budget(client, mode, censor_mode):
+    body = png_bytes(mode)
+    boxes = json.dumps([{"x": 900, "y": 700, "w": 30, "h": 20}, {"x": 1000, "y": 710, "w": 30, "h": 20},
+                        {"x": 2000, "y": 1200, "w": 150, "h": 150}])
+
+    def request():
+        response = client.post(f"/api/v1/anonymize?mode={censor_mode}&png_compress_level=1",
+                               data={"image": (io.BytesIO(body), "test.png", "image/png"), "boxes": boxes})
+        assert response.status_code == 200
+        request.result = response.data
+
+    copies = frame_copies(request, WIDTH * HEIGHT * CHANNELS[mode])
+    assert Image.open(io.BytesIO(request.result)).mode == mode      # RGBA/ Graustufen bleiben erhalten
+    assert copies <= FRAME_COPY_BUDGET, f"{copies:.2f} full-frame copies per request"